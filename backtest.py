@@ -0,0 +1,198 @@
+import logging
+from typing import Dict, Optional
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from indicators import calculate_indicators, IndicatorCache
+from mtf_logic import MTFAnalyzer
+from strategy import StrategyEvaluator
+from risk import RiskManager
+from swing_index import SwingIndex, index_ns
+
+def timeframe_delta(timeframe: str) -> pd.Timedelta:
+    return pd.Timedelta(seconds=ccxt.Exchange.parse_timeframe(timeframe))
+
+class Backtester:
+    """
+    Vectorized historical backtest of the confluence strategy.
+
+    Every 15m bar is evaluated at its close. Higher timeframes contribute their last candle that had
+    closed by then, and a swing point only counts once the two bars confirming it have closed, so no
+    value from the future leaks into a decision. Scoring and SL/TP reuse the vectorized rules of
+    StrategyEvaluator and RiskManager.
+    """
+    def __init__(self, config: Dict):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.tfs = config['timeframes']
+        self.min_score = config['strategy']['min_confluence_score']
+        self.cooldown = pd.Timedelta(hours=config['strategy'].get('signal_cooldown_hours', 0))
+        self.max_hold_bars = config.get('backtest', {}).get('max_hold_bars', 96)
+        self.swing_width = config['indicators'].get('swing', {}).get('width', 2)
+
+        self.mtf_analyzer = MTFAnalyzer(None, config)
+        self.strategy_evaluator = StrategyEvaluator(config)
+        self.risk_manager = RiskManager(config)
+
+    def prepare(self, frames: Dict[str, pd.DataFrame], cache: Optional[IndicatorCache] = None,
+                label: str = '') -> Dict[str, pd.DataFrame]:
+        """
+        Computes indicators for every timeframe on copies of the raw OHLCV frames (only the planned
+        columns when indicators.compute is 'planned').
+        `label` (usually the symbol) namespaces the frames in the indicator cache.
+        """
+        return {tf: calculate_indicators(df.copy(), self.config, cache=cache,
+                                         cache_key=self.dataset_key(label, tf, df),
+                                         timeframe=tf, plan=self.mtf_analyzer.plan)
+                for tf, df in frames.items()}
+
+    @staticmethod
+    def dataset_key(label: str, timeframe: str, df: pd.DataFrame) -> str:
+        """
+        Identifies an OHLCV frame for the indicator cache.
+        """
+        if df.empty:
+            return f"{label}:{timeframe}:empty"
+        return f"{label}:{timeframe}:{df.index[0].value}:{df.index[-1].value}:{len(df)}"
+
+    def _asof(self, df: pd.DataFrame, available_at: pd.Index, decision_times: pd.Index) -> pd.DataFrame:
+        """
+        Returns, for each decision time, the last row of `df` whose availability time is <= it.
+        """
+        pos = np.searchsorted(available_at.values, decision_times.values, side='right') - 1
+        out = df.iloc[np.clip(pos, 0, None)].copy()
+        out.iloc[pos < 0] = np.nan
+        out.index = decision_times
+        return out
+
+    def _swing_levels(self, bias_df: pd.DataFrame, decision_times: pd.Index) -> Dict[str, np.ndarray]:
+        """
+        Last confirmed swing high/low (and their times) as of each decision time. A swing becomes
+        known when the bar confirming it closes.
+        """
+        index = SwingIndex.from_frame(bias_df, self.swing_width)
+        bar = timeframe_delta(self.tfs['bias']).value
+        levels = {}
+        for kind in ('high', 'low'):
+            swings = index.arrays(kind)
+            frame = pd.DataFrame({'price': swings['price'], 'time': swings['time']})
+            aligned = self._asof(frame, pd.Index(swings['confirmed'] + bar), pd.Index(index_ns(decision_times)))
+            levels[f"swing_{kind}"] = aligned['price'].to_numpy()
+            levels[f"swing_{kind}_time"] = aligned['time'].to_numpy()
+        return levels
+
+    def run(self, frames: Dict[str, pd.DataFrame], prepared: bool = False) -> Dict:
+        """
+        Runs the backtest on OHLCV frames keyed by timeframe and returns the trade list and stats.
+        """
+        data = frames if prepared else self.prepare(frames)
+        entry_tf = self.tfs['entry']
+        entry = data[entry_tf]
+        decision_times = entry.index + timeframe_delta(entry_tf)
+
+        latest = {}
+        for tf in set(self.tfs.values()):
+            df = data[tf]
+            aligned = entry if tf == entry_tf else self._asof(df, df.index + timeframe_delta(tf), decision_times)
+            latest[tf] = {col: aligned[col].to_numpy() for col in df.columns}
+        prev_entry = {col: np.roll(values, 1) for col, values in latest[entry_tf].items()}
+        for values in prev_entry.values():
+            values[0] = np.nan
+
+        bias_tf = self.tfs['bias']
+        bias_candles = pd.DataFrame({col: latest[bias_tf][col] for col in
+                                     ('close', self.mtf_analyzer.ema_slow_col, self.mtf_analyzer.smma_col)})
+        bias = self.mtf_analyzer.bias_array(bias_candles)
+        score = self.strategy_evaluator.score_arrays(bias, latest, prev_entry)
+
+        swings = self._swing_levels(data[bias_tf], decision_times)
+        entry_price = latest[entry_tf]['close']
+        levels = self.risk_manager.calculate_sl_tp_arrays(
+            bias, entry_price, swings['swing_high'], swings['swing_low'],
+            swings['swing_high_time'] > swings['swing_low_time'], latest[entry_tf][self.risk_manager.atr_col])
+
+        candidates = np.flatnonzero((score >= self.min_score) & levels['valid'])
+        signals = self._apply_cooldown(candidates, bias, decision_times)
+        trades = self._resolve(signals, bias, entry, entry_price, levels, decision_times, score)
+        return {'trades': trades, 'stats': self.summarize(trades)}
+
+    def _apply_cooldown(self, candidates: np.ndarray, bias: np.ndarray, times: pd.Index) -> np.ndarray:
+        """
+        Mirrors the live signal journal: a direction stays silent for signal_cooldown_hours after a signal.
+        """
+        kept, last_time = [], {}
+        for i in candidates:
+            previous = last_time.get(bias[i])
+            if previous is None or times[i] >= previous + self.cooldown:
+                kept.append(i)
+                last_time[bias[i]] = times[i]
+        return np.asarray(kept, dtype=np.int64)
+
+    def _resolve(self, signals: np.ndarray, bias: np.ndarray, entry: pd.DataFrame, entry_price: np.ndarray,
+                 levels: Dict[str, np.ndarray], times: pd.Index, score: np.ndarray) -> pd.DataFrame:
+        """
+        Walks the forward price path of every signal at once. A bar touching both SL and TP1 counts
+        as a loss; trades still open after max_hold_bars exit at that bar's close.
+        """
+        signals = signals[signals < len(entry) - 1]
+        columns = ['time', 'direction', 'score', 'entry_price', 'sl_price', 'tp1_price', 'tp2_price',
+                   'rr_ratio', 'outcome', 'exit_time', 'exit_price', 'bars_held', 'r_multiple']
+        if not len(signals):
+            return pd.DataFrame(columns=columns)
+
+        high, low, close = (entry[c].to_numpy() for c in ('high', 'low', 'close'))
+        n = len(close)
+        path = signals[:, None] + 1 + np.arange(self.max_hold_bars)[None, :]
+        in_range = path < n
+        path = np.minimum(path, n - 1)
+
+        direction = bias[signals].astype(np.float64)
+        sl, tp1 = levels['sl_price'][signals], levels['tp1_price'][signals]
+        is_long = (direction == 1)[:, None]
+        hit_sl = in_range & np.where(is_long, low[path] <= sl[:, None], high[path] >= sl[:, None])
+        hit_tp = in_range & np.where(is_long, high[path] >= tp1[:, None], low[path] <= tp1[:, None])
+
+        never = self.max_hold_bars + 1
+        first_sl = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), never)
+        first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), never)
+        last_bar = in_range.sum(axis=1) - 1
+
+        outcome = np.where(first_sl <= first_tp, 'sl', 'tp')
+        outcome = np.where((first_sl == never) & (first_tp == never), 'timeout', outcome)
+        exit_step = np.where(outcome == 'sl', first_sl, np.where(outcome == 'tp', first_tp, last_bar))
+        exit_idx = path[np.arange(len(signals)), np.clip(exit_step, 0, None)]
+        exit_price = np.where(outcome == 'sl', sl, np.where(outcome == 'tp', tp1, close[exit_idx]))
+
+        risk = np.abs(entry_price[signals] - sl)
+        r_multiple = direction * (exit_price - entry_price[signals]) / risk
+        return pd.DataFrame({
+            'time': times[signals], 'direction': np.where(direction == 1, 'LONG', 'SHORT'),
+            'score': score[signals], 'entry_price': entry_price[signals], 'sl_price': sl, 'tp1_price': tp1,
+            'tp2_price': levels['tp2_price'][signals], 'rr_ratio': levels['rr_ratio'][signals],
+            'outcome': outcome, 'exit_time': times[exit_idx], 'exit_price': exit_price,
+            'bars_held': exit_idx - signals, 'r_multiple': r_multiple,
+        }, columns=columns)
+
+    @staticmethod
+    def summarize(trades: pd.DataFrame) -> Dict:
+        """
+        Win rate, expectancy (mean R) and the R-multiple distribution of a trade list.
+        """
+        if trades.empty:
+            return {'trades': 0}
+        r = trades['r_multiple'].to_numpy(dtype=np.float64)
+        equity = np.cumsum(r)
+        counts, edges = np.histogram(r, bins=np.arange(-1.5, max(r.max(), 1.0) + 0.5, 0.5))
+        return {
+            'trades': int(len(r)),
+            'win_rate': float((r > 0).mean()),
+            'expectancy_r': float(r.mean()),
+            'total_r': float(r.sum()),
+            'max_drawdown_r': float(np.max(np.maximum.accumulate(equity) - equity, initial=0.0)),
+            'avg_bars_held': float(trades['bars_held'].mean()),
+            'outcomes': trades['outcome'].value_counts().to_dict(),
+            'r_percentiles': {str(q): float(np.percentile(r, q)) for q in (5, 25, 50, 75, 95)},
+            'r_histogram': {f"{edge:+.1f}": int(count) for edge, count in zip(edges[:-1], counts)},
+        }
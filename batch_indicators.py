@@ -0,0 +1,245 @@
+import sys
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from indicators import fibonacci_levels, fractal_mask
+from indicator_plan import column_node, node_dependencies
+
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+def stack_frames(frames: Dict[str, pd.DataFrame], bars: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Stacks the OHLCV frames of many symbols into {column: symbols x bars matrix}, rows in the order
+    of `frames`. Each symbol's own bars are right-aligned, so column -1 is every symbol's latest
+    (in-progress) candle and shorter histories are NaN-padded on the left. Windows therefore span the
+    same bars as calculate_indicators on the symbol's frame. Only the last `bars` are kept if given.
+    """
+    width = max((len(df) for df in frames.values()), default=0)
+    width = min(width, bars) if bars is not None else width
+    arrays = {col: np.full((len(frames), width), np.nan) for col in OHLCV_COLUMNS}
+    for row, df in enumerate(frames.values()):
+        n = min(len(df), width)
+        if not n:
+            continue
+        for col in OHLCV_COLUMNS:
+            arrays[col][row, width - n:] = df[col].to_numpy(dtype=np.float64)[-n:]
+    return arrays
+
+def ema(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    pandas_ta EMA per row: SMA seed over the first `length` valid values of the row, then
+    alpha = 2 / (length + 1). NaN inputs (leading padding, a late-starting MACD line) are skipped.
+    """
+    alpha = 2.0 / (length + 1)
+    out = np.full(x.shape, np.nan)
+    value = np.full(x.shape[0], np.nan)
+    seed_sum = np.zeros(x.shape[0])
+    seen = np.zeros(x.shape[0], dtype=np.int64)
+    for t in range(x.shape[1]):
+        col = x[:, t]
+        valid = ~np.isnan(col)
+        seeded = seen >= length
+        step = valid & seeded
+        value[step] = alpha * col[step] + (1.0 - alpha) * value[step]
+        seeding = valid & ~seeded
+        seed_sum[seeding] += col[seeding]
+        seen[valid] += 1
+        done = seeding & (seen == length)
+        value[done] = seed_sum[done] / length
+        out[:, t] = value
+    return out
+
+def smma(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    Smoothed moving average per row: SMA seed, then (prev * (length - 1) + x) / length.
+    """
+    out = np.full(x.shape, np.nan)
+    value = np.full(x.shape[0], np.nan)
+    seed_sum = np.zeros(x.shape[0])
+    seen = np.zeros(x.shape[0], dtype=np.int64)
+    for t in range(x.shape[1]):
+        col = x[:, t]
+        valid = ~np.isnan(col)
+        seeded = seen >= length
+        step = valid & seeded
+        value[step] = (value[step] * (length - 1) + col[step]) / length
+        seeding = valid & ~seeded
+        seed_sum[seeding] += col[seeding]
+        seen[valid] += 1
+        done = seeding & (seen == length)
+        value[done] = seed_sum[done] / length
+        out[:, t] = np.where(valid, value, np.nan)
+    return out
+
+def rma(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    pandas_ta RMA per row (ewm(alpha=1/length, min_periods=length).mean(), adjust=True).
+    """
+    decay = 1.0 - 1.0 / length
+    out = np.full(x.shape, np.nan)
+    num = np.zeros(x.shape[0])
+    den = np.zeros(x.shape[0])
+    seen = np.zeros(x.shape[0], dtype=np.int64)
+    for t in range(x.shape[1]):
+        col = x[:, t]
+        valid = ~np.isnan(col)
+        num[valid] = col[valid] + decay * num[valid]
+        den[valid] = 1.0 + decay * den[valid]
+        seen[valid] += 1
+        ready = seen >= length
+        out[ready, t] = num[ready] / den[ready]
+    return out
+
+def sma(x: np.ndarray, length: int) -> np.ndarray:
+    """
+    Rolling mean over the last `length` bars per row; NaN while the window holds any NaN.
+    """
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= length:
+        out[:, length - 1:] = sliding_window_view(x, length, axis=1).mean(axis=-1)
+    return out
+
+def macd(close: np.ndarray, fast: int, slow: int, signal: int,
+         emas: Optional[Dict[int, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    emas = emas or {}
+    fast_ma = emas[fast] if fast in emas else ema(close, fast)
+    slow_ma = emas[slow] if slow in emas else ema(close, slow)
+    line = fast_ma - slow_ma
+    signal_ma = ema(line, signal)
+    suffix = f"{fast}_{slow}_{signal}"
+    return {f"MACD_{suffix}": line, f"MACDh_{suffix}": line - signal_ma, f"MACDs_{suffix}": signal_ma}
+
+def stoch(high: np.ndarray, low: np.ndarray, close: np.ndarray, k: int, d: int, smooth_k: int) -> Dict[str, np.ndarray]:
+    """
+    pandas_ta stoch per row: raw %K over a `k` bar window, smoothed by SMA(smooth_k); %D = SMA(d) of %K.
+    """
+    highest = np.full(close.shape, np.nan)
+    lowest = np.full(close.shape, np.nan)
+    if close.shape[1] >= k:
+        highest[:, k - 1:] = sliding_window_view(high, k, axis=1).max(axis=-1)
+        lowest[:, k - 1:] = sliding_window_view(low, k, axis=1).min(axis=-1)
+    price_range = highest - lowest
+    price_range[price_range == 0] = sys.float_info.epsilon
+    stoch_k = sma(100.0 * (close - lowest) / price_range, smooth_k)
+    suffix = f"{k}_{d}_{smooth_k}"
+    return {f"STOCHk_{suffix}": stoch_k, f"STOCHd_{suffix}": sma(stoch_k, d)}
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    """
+    pandas_ta ATR (RMA of the true range) per row; the first bar of each row has no true range.
+    """
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    true_range[np.isnan(prev_close) | np.isnan(close)] = np.nan
+    return rma(true_range, length)
+
+def swings(high: np.ndarray, low: np.ndarray, width: int) -> Dict[str, np.ndarray]:
+    return {f"swing_{kind}": np.where(fractal_mask(values, width, kind), values, np.nan)
+            for kind, values in (('high', high), ('low', low))}
+
+
+def batch_indicators(arrays: Dict[str, np.ndarray], columns: Iterable[str], swing_width: int = 2) -> Dict[str, np.ndarray]:
+    """
+    Computes `columns` (calculate_indicators names, e.g. IndicatorPlan.columns(tf)) for every row of
+    the symbols x bars matrices in `arrays` in one vectorized pass per indicator. EMAs shared with
+    MACD are computed once. Returns {column: symbols x bars matrix}; OHLCV columns are passed through.
+    """
+    columns = set(columns)
+    high, low, close = arrays['high'], arrays['low'], arrays['close']
+    nodes: List[Tuple] = []
+    for column in sorted(columns):
+        node = column_node(column, swing_width)
+        if node is not None:
+            nodes += [n for n in node_dependencies(node) + [node] if n not in nodes]
+
+    emas: Dict[int, np.ndarray] = {}
+    out: Dict[str, np.ndarray] = {}
+    for node in nodes:
+        kind, params = node[0], node[1:]
+        if kind == 'ema':
+            emas[params[0]] = out[f"EMA_{params[0]}"] = ema(close, params[0])
+        elif kind == 'smma':
+            out[f"SMMA_{params[0]}"] = smma(close, params[0])
+        elif kind == 'atr':
+            out[f"ATRr_{params[0]}"] = atr(high, low, close, params[0])
+        elif kind == 'macd':
+            out.update(macd(close, *params, emas=emas))
+        elif kind == 'stoch':
+            out.update(stoch(high, low, close, *params))
+        elif kind == 'swings':
+            out.update(swings(high, low, params[0]))
+        else:
+            raise ValueError(f"Indicator '{kind}' has no batch kernel.")
+    return {col: out[col] if col in out else arrays[col] for col in columns}
+
+def batch_fibonacci_levels(results: Dict[str, np.ndarray]) -> List[Dict]:
+    """
+    get_fibonacci_levels for every row of batch results carrying swing_high/swing_low. Bar positions
+    stand in for the swing times, which only decide the trend direction.
+    """
+    last = {}
+    for kind in ('high', 'low'):
+        valid = ~np.isnan(results[f"swing_{kind}"])
+        last[kind] = (valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1), valid.any(axis=1))
+    levels = []
+    for row in range(len(last['high'][0])):
+        (high_pos, has_high), (low_pos, has_low) = (tuple(a[row] for a in last[k]) for k in ('high', 'low'))
+        if not (has_high and has_low):
+            levels.append({'error': 'Not enough swing points to determine Fibonacci levels.'})
+            continue
+        levels.append(fibonacci_levels(float(results['swing_high'][row, high_pos]), int(high_pos),
+                                       float(results['swing_low'][row, low_pos]), int(low_pos)))
+    return levels
+
+
+class BatchIndicatorEngine:
+    """
+    Cross-symbol indicator pass for one timeframe: stacks the symbols' frames into symbols x bars
+    matrices, runs batch_indicators on them and hands the columns back either as per-symbol
+    DataFrames (same layout as calculate_indicators) or as the latest rows of every symbol.
+    """
+    def __init__(self, config: Dict, columns: Optional[Set[str]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.swing_width = config['indicators'].get('swing', {}).get('width', 2)
+        if columns is None:
+            p = config['indicators']
+            columns = {f"EMA_{p[name]['length']}" for name in ('ema_fast', 'ema_slow', 'ema_trend_short', 'ema_trend_long')}
+            columns |= {f"SMMA_{p['smma']['length']}", f"ATRr_{p['atr']['length']}", 'swing_high', 'swing_low'}
+            m, st = p['macd'], p['stochastic']
+            columns |= {f"MACD{x}_{m['fast']}_{m['slow']}_{m['signal']}" for x in ('', 'h', 's')}
+            columns |= {f"STOCH{x}_{st['k']}_{st['d']}_{st['smooth_k']}" for x in ('k', 'd')}
+        self.columns = set(columns) | set(OHLCV_COLUMNS)
+
+    def compute(self, frames: Dict[str, pd.DataFrame], bars: Optional[int] = None) -> Dict[str, np.ndarray]:
+        return self.compute_stacked(stack_frames(frames, bars))
+
+    def compute_stacked(self, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        compute() for OHLCV already laid out like stack_frames output (e.g. shared memory rows).
+        """
+        return batch_indicators(arrays, self.columns, self.swing_width)
+
+    @staticmethod
+    def to_frames(frames: Dict[str, pd.DataFrame], results: Dict[str, np.ndarray]) -> Dict[str, pd.DataFrame]:
+        """
+        Splits batch results back into one DataFrame per symbol, on the index of its input frame.
+        """
+        out = {}
+        width = next(iter(results.values())).shape[1]
+        for row, (symbol, df) in enumerate(frames.items()):
+            n = min(len(df), width)
+            out[symbol] = pd.DataFrame({col: values[row, width - n:] for col, values in results.items()},
+                                       index=df.index[len(df) - n:])
+        return out
+
+    @staticmethod
+    def latest(results: Dict[str, np.ndarray], offset: int = 2) -> Dict[str, np.ndarray]:
+        """
+        Column values of every symbol at bar -`offset` (2 = the last closed candle), as one array per column.
+        """
+        return {col: values[:, -offset] for col, values in results.items()}
@@ -0,0 +1,349 @@
+import os
+import sys
+import copy
+import json
+import asyncio
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from batch_indicators import BatchIndicatorEngine
+from data_client import DataClient
+from indicators import calculate_indicators, get_fibonacci_levels
+from mtf_logic import MTFAnalyzer
+from notifier import TelegramNotifier
+from outbox import NotificationOutbox
+from resample import base_bars_needed, derive_frames
+from risk import RiskManager
+from scanner import MarketScanner
+from sharded_scan import ShardedScanExecutor
+from signal_journal import SignalJournal
+from snapshot import load_snapshot, save_snapshot
+from strategy import StrategyEvaluator
+from synthetic import FakeExchange, synthetic_ohlcv
+import main as bot
+
+# Fields compared between runs; larger is worse for all of them
+COMPARE_FIELDS = ('median_ms', 'per_symbol_ms', 'peak_kb_per_symbol')
+
+def time_call(fn: Callable, repeat: int) -> Dict:
+    """
+    Runs `fn` `repeat` times (after one warm-up call) and returns timing statistics in ms.
+    """
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    values = np.asarray(samples)
+    return {'runs': repeat, 'mean_ms': float(values.mean()), 'median_ms': float(np.median(values)),
+            'p95_ms': float(np.percentile(values, 95)), 'min_ms': float(values.min())}
+
+def offline_config(config: Dict, workdir: str) -> Dict:
+    """
+    Copy of config that never talks to Telegram and keeps its files in `workdir`.
+    """
+    config = copy.deepcopy(config)
+    config['telegram']['enabled'] = False
+    config['telegram']['outbox_file'] = os.path.join(workdir, 'outbox.jsonl')
+    config['strategy']['journal_file'] = os.path.join(workdir, 'journal.db')
+    config['operation']['snapshot_file'] = os.path.join(workdir, 'snapshot.pkl.gz')
+    return config
+
+def bench_startup(repeat: int) -> Dict[str, Dict]:
+    """
+    Wall time of fresh interpreters: a bare one, and one importing main (what every --once run pays
+    before it can analyze anything).
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    def spawn(code: str) -> Callable:
+        return lambda: subprocess.run([sys.executable, '-c', code], cwd=cwd, check=True)
+
+    bare = time_call(spawn('pass'), repeat)
+    imports = time_call(spawn('import main'), repeat)
+    return {'startup.interpreter': bare,
+            'startup.import_main': dict(imports, import_ms=imports['median_ms'] - bare['median_ms'])}
+
+def bench_components(config: Dict, repeat: int, seed: int) -> Dict[str, Dict]:
+    """
+    Times the per-symbol building blocks on one synthetic symbol.
+    """
+    tfs = config['timeframes']
+    lookback = config['strategy']['data_lookback_bars']
+    base_tf = config.get('data', {}).get('base_timeframe', tfs['entry'])
+    base = synthetic_ohlcv(base_bars_needed(base_tf, tfs.values(), lookback) + 1, base_tf, seed=seed)
+    frames = derive_frames(base, base_tf, tfs.values(), lookback)
+
+    results = {}
+    analyzer = MTFAnalyzer(None, config)
+    for tf in dict.fromkeys(tfs.values()):
+        results[f"calculate_indicators[{tf}]"] = time_call(
+            lambda: calculate_indicators(frames[tf].copy(), config, timeframe=tf, plan=analyzer.plan), repeat)
+
+    analysis = analyzer.analyze_frames('BENCH/USDT', {tf: df.copy() for tf, df in frames.items()})
+    bias_df = analysis['data'][tfs['bias']]
+    results['get_fibonacci_levels'] = time_call(lambda: get_fibonacci_levels(bias_df), repeat)
+
+    evaluator = StrategyEvaluator(config)
+    results['StrategyEvaluator.evaluate'] = time_call(lambda: evaluator.evaluate(analysis), repeat)
+
+    # SL/TP is timed on a signal in the bias direction whether or not the score passed
+    risk_manager = RiskManager(config)
+    signal = {'symbol': 'BENCH/USDT', 'direction': 'SHORT' if analysis['bias_8h'] == 'BEARISH' else 'LONG',
+              'entry_price': analysis['current_price'], 'score': 0.0, 'confluence_points': [],
+              'fib_levels': analysis['fib_levels_8h']}
+    entry_df = analysis['data'][tfs['entry']]
+    results['RiskManager.calculate_sl_tp'] = time_call(lambda: risk_manager.calculate_sl_tp(signal, entry_df), repeat)
+    return results
+
+def bench_batch(config: Dict, n_symbols: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    """
+    Per-symbol calculate_indicators loop vs one BatchIndicatorEngine pass over `n_symbols` synthetic
+    symbols, per timeframe, with the analyzer's planned columns.
+    """
+    tfs = config['timeframes']
+    lookback = config['strategy']['data_lookback_bars']
+    base_tf = config.get('data', {}).get('base_timeframe', tfs['entry'])
+    bars = base_bars_needed(base_tf, tfs.values(), lookback) + 1
+    per_symbol = [derive_frames(synthetic_ohlcv(bars, base_tf, seed=seed + i), base_tf, tfs.values(), lookback)
+                  for i in range(n_symbols)]
+    plan = MTFAnalyzer(None, config).plan
+
+    results = {}
+    for tf in dict.fromkeys(tfs.values()):
+        frames = {f"SYN{i:04d}/USDT": f[tf] for i, f in enumerate(per_symbol)}
+        engine = BatchIndicatorEngine(config, plan.columns(tf) if plan is not None else None)
+        loop = time_call(lambda: [calculate_indicators(df.copy(), config, timeframe=tf, plan=plan)
+                                  for df in frames.values()], repeat)
+        batch = time_call(lambda: engine.compute(frames), repeat)
+        for name, stats in ((f"calculate_indicators.loop[{tf},{n_symbols}]", loop),
+                            (f"batch_indicators[{tf},{n_symbols}]", batch)):
+            results[name] = dict(stats, per_symbol_ms=stats['median_ms'] / n_symbols)
+    return results
+
+def scan_frames(config: Dict, n_symbols: int, seed: int) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    {symbol: {timeframe: frame}} for `n_symbols` synthetic symbols, as a scan would have fetched them.
+    """
+    tfs = config['timeframes']
+    lookback = config['strategy']['data_lookback_bars']
+    base_tf = config.get('data', {}).get('base_timeframe', tfs['entry'])
+    bars = base_bars_needed(base_tf, tfs.values(), lookback) + 1
+    return {f"SYN{i:04d}/USDT": derive_frames(synthetic_ohlcv(bars, base_tf, seed=seed + i), base_tf,
+                                              tfs.values(), lookback)
+            for i in range(n_symbols)}
+
+def bench_sharded(config: Dict, n_symbols: int, workers: List[int], repeat: int, seed: int) -> Dict[str, Dict]:
+    """
+    In-process MarketScanner.evaluate_frames vs ShardedScanExecutor with each worker count over
+    `n_symbols` synthetic symbols (fetch excluded). Speedup is relative to the in-process run.
+    """
+    frames = scan_frames(config, n_symbols, seed)
+    local_config = copy.deepcopy(config)
+    local_config.setdefault('scanner', {})['workers'] = 0
+
+    results = {}
+    scanner = MarketScanner(None, local_config)
+    in_process = time_call(lambda: scanner.evaluate_frames(frames), repeat)
+    results[f"scan.in_process[{n_symbols}]"] = in_process
+    for n in workers:
+        executor = ShardedScanExecutor(local_config, n)
+        try:
+            asyncio.run(executor.evaluate(frames))  # starts the pool and attaches the blocks
+            stats = time_call(lambda: asyncio.run(executor.evaluate(frames)), repeat)
+        finally:
+            executor.close()
+        results[f"scan.sharded[{n_symbols},{n}w]"] = dict(stats, speedup=in_process['median_ms'] / stats['median_ms'])
+    return results
+
+def bench_profiles(config: Dict, n_symbols: int, n_profiles: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    """
+    MarketScanner.evaluate_frames with the plain config vs `n_profiles` strategy profiles (thresholds
+    spread around the configured ones) over the same symbols; overhead is the relative extra time.
+    """
+    frames = scan_frames(config, n_symbols, seed)
+    single = copy.deepcopy(config)
+    single['profiles'] = {}
+    single.setdefault('scanner', {})['workers'] = 0
+    multi = copy.deepcopy(single)
+    strategy_cfg = config['strategy']
+    multi['profiles'] = {f"p{i}": {'overrides': {
+        'strategy.min_confluence_score': strategy_cfg['min_confluence_score'] + i - n_profiles // 2,
+        'strategy.min_rr_ratio': strategy_cfg['min_rr_ratio'] * (1 + 0.25 * i)}} for i in range(n_profiles)}
+
+    results = {}
+    for name, profile_config in ((f"scan.profiles[{n_symbols},1p]", single), (f"scan.profiles[{n_symbols},{n_profiles}p]", multi)):
+        scanner = MarketScanner(None, profile_config)
+        results[name] = time_call(lambda: scanner.evaluate_frames(frames), repeat)
+    baseline = results[f"scan.profiles[{n_symbols},1p]"]['median_ms']
+    results[f"scan.profiles[{n_symbols},{n_profiles}p]"]['overhead'] = \
+        results[f"scan.profiles[{n_symbols},{n_profiles}p]"]['median_ms'] / baseline - 1.0
+    return results
+
+def bench_cycles(config: Dict, n_symbols: int, warm_cycles: int, seed: int, regime: str) -> Dict[str, Dict]:
+    """
+    Runs full run_bot cycles over `n_symbols` against the fake exchange: one cold cycle (empty store),
+    `warm_cycles` cycles one entry bar apart, then one more warm cycle under tracemalloc for memory.
+    """
+    tfs = config['timeframes']
+    lookback = config['strategy']['data_lookback_bars']
+    data_cfg = config.get('data', {})
+    base_tf = data_cfg.get('base_timeframe', tfs['entry']) if data_cfg.get('derive_timeframes') else tfs['entry']
+    history = base_bars_needed(base_tf, tfs.values(), lookback) + 10
+    symbols = [f"SYN{i:04d}/USDT" for i in range(n_symbols)]
+
+    exchange = FakeExchange(symbols, history, future=warm_cycles + 5, base_timeframe=base_tf, regime=regime, seed=seed)
+    data_client = DataClient(config['exchange'], exchange=exchange)
+    store = bot.build_store(config)
+    streaming = bot.build_streaming(config, store)
+    outbox = NotificationOutbox(config, TelegramNotifier(config))
+    journal = SignalJournal(config)
+    components = bot.BotComponents(config, store, streaming, outbox, journal, data_client)
+
+    def cycle():
+        started = time.perf_counter()
+        for symbol in symbols:
+            bot.run_bot(symbol, config, components=components)
+        return (time.perf_counter() - started) * 1000
+
+    cold_ms = cycle()
+    cold_requests = exchange.calls
+    warm = []
+    for _ in range(warm_cycles):
+        exchange.advance()
+        warm.append(cycle())
+    warm_requests = exchange.calls - cold_requests
+
+    exchange.advance()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    cycle()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # A --once run: fresh components restored from the previous run's snapshot, then one cycle
+    snapshot_path = config['operation']['snapshot_file']
+    save_snapshot(snapshot_path, config, store, streaming, components.mtf_analyzer.swings)
+    exchange.advance()
+    started = time.perf_counter()
+    store = bot.build_store(config)
+    streaming = bot.build_streaming(config, store)
+    components = bot.BotComponents(config, store, streaming, outbox, journal, data_client)
+    load_snapshot(snapshot_path, config, store, streaming, components.mtf_analyzer.swings)
+    restore_ms = (time.perf_counter() - started) * 1000
+    calls_before_once = exchange.calls
+    once_ms = restore_ms + cycle()
+    once_requests = exchange.calls - calls_before_once
+    journal.close()
+
+    warm = np.asarray(warm) if warm else np.asarray([cold_ms])
+    return {
+        f"run_bot.cold[{n_symbols}]": {'symbols': n_symbols, 'total_ms': cold_ms, 'per_symbol_ms': cold_ms / n_symbols,
+                                       'requests': cold_requests},
+        f"run_bot.warm[{n_symbols}]": {'symbols': n_symbols, 'cycles': len(warm), 'median_ms': float(np.median(warm)),
+                                       'per_symbol_ms': float(np.median(warm)) / n_symbols,
+                                       'requests_per_cycle': warm_requests / warm_cycles if warm_cycles else 0.0},
+        f"run_bot.once[{n_symbols}]": {'symbols': n_symbols, 'total_ms': once_ms, 'restore_ms': restore_ms,
+                                       'per_symbol_ms': once_ms / n_symbols, 'requests': once_requests,
+                                       'snapshot_kb': os.path.getsize(snapshot_path) / 1024},
+        f"memory[{n_symbols}]": {'peak_kb_per_symbol': (peak - before) / 1024 / n_symbols,
+                                 'retained_kb_per_symbol': (current - before) / 1024 / n_symbols},
+    }
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'created': datetime.now(timezone.utc).isoformat(), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Prints current vs baseline for every shared metric and returns the names that regressed by more
+    than `threshold` (e.g. 0.10 = 10% slower or larger).
+    """
+    regressions = []
+    for name, stats in current['results'].items():
+        old = baseline['results'].get(name)
+        if not old:
+            continue
+        for field in COMPARE_FIELDS:
+            if field in stats and old.get(field):
+                ratio = stats[field] / old[field]
+                flag = 'REGRESSION' if ratio > 1 + threshold else ''
+                print(f"{name:40s} {field:20s} {old[field]:12.3f} -> {stats[field]:12.3f}  x{ratio:5.2f} {flag}")
+                if flag:
+                    regressions.append(f"{name}.{field}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the analysis pipeline (no network).")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--symbols', default='1,50,500', help="Comma-separated symbol counts for run_bot cycles.")
+    parser.add_argument('--warm-cycles', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=50, help="Repetitions per component timing.")
+    parser.add_argument('--regime', default='mixed', help="trending | ranging | gapped | mixed")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--profiles', type=int, default=4, help="Strategy profiles in the multi-profile benchmark.")
+    parser.add_argument('--workers', default=f"1,{os.cpu_count() or 1}",
+                        help="Comma-separated worker counts for the sharded scan benchmark (empty to skip).")
+    parser.add_argument('--output', default=None, help="Result file (default benchmark_results/<timestamp>.json).")
+    parser.add_argument('--compare', default=None, help="Earlier result file to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown reported as a regression.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s [%(levelname)s] [%(name)s] %(message)s")
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = offline_config(config, workdir)
+        results = bench_startup(max(3, args.repeat // 10))
+        results.update(bench_components(config, args.repeat, args.seed))
+        for n in (int(x) for x in args.symbols.split(',') if x.strip()):
+            print(f"Running run_bot cycles over {n} symbols...", flush=True)
+            results.update(bench_batch(config, n, max(1, args.repeat // 10), args.seed))
+            results.update(bench_profiles(config, n, args.profiles, max(1, args.repeat // 10), args.seed))
+            workers = sorted({int(x) for x in args.workers.split(',') if x.strip()})
+            if workers:
+                results.update(bench_sharded(config, n, workers, max(1, args.repeat // 10), args.seed))
+            results.update(bench_cycles(config, n, args.warm_cycles, args.seed, args.regime))
+
+    report = {'environment': environment(),
+              'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+              'data': config.get('data', {}), 'results': results}
+    output = args.output or os.path.join('benchmark_results',
+                                         datetime.now(timezone.utc).strftime('bench_%Y%m%dT%H%M%SZ.json'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, stats in results.items():
+        print(f"{name:40s} " + "  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items()))
+    print(f"Results written to {output}.")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,106 @@
 import logging
-import ccxt
 import pandas as pd
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+
+from exchange_pool import EXCHANGE_POOL, ExchangePool, markets_cache
+from metrics import METRICS
+from scheduler import RequestScheduler, ohlcv_request_weight
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+def ohlcv_to_dataframe(ohlcv: List[List]) -> pd.DataFrame:
+    """
+    Converts a raw CCXT OHLCV list into a DataFrame indexed by timestamp.
+    """
+    df = pd.DataFrame(ohlcv, columns=OHLCV_COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df.set_index('timestamp', inplace=True)
+    return df
+
+def merge_ohlcv_page(rows: List[List], page: List[List]) -> int:
+    """
+    Appends the rows of `page` that are newer than the last row in `rows`. Returns how many were added.
+    """
+    last_ts = rows[-1][0] if rows else None
+    fresh = [r for r in page if last_ts is None or r[0] > last_ts]
+    rows.extend(fresh)
+    return len(fresh)
+
+def response_bytes(exchange) -> Optional[int]:
+    """
+    Size of the last HTTP response body, when the exchange keeps it (CCXT does by default). With
+    concurrent async requests this is the most recent response, so treat it as an estimate.
+    """
+    body = getattr(exchange, 'last_http_response', None)
+    return len(body) if isinstance(body, (str, bytes)) else None
 
 class DataClient:
     """
     Handles all communication with the cryptocurrency exchange via CCXT.
     """
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, exchange=None, pool: Optional[ExchangePool] = None):
+        """
+        The CCXT instance comes from the process-wide exchange pool (one keep-alive session and one
+        markets load per exchange); `exchange` replaces it (e.g. the offline fake exchange).
+        """
         self.logger = logging.getLogger(__name__)
-        exchange_id = config.get('id', 'binance')
-        exchange_class = getattr(ccxt, exchange_id)
-        
-        self.exchange = exchange_class({
-            'rateLimit': config.get('rate_limit_aware', True),
-            'options': {
-                'defaultType': config.get('market_type', 'spot'),
-            },
-        })
+        self.exchange = exchange if exchange is not None else (pool or EXCHANGE_POOL).get(config)
+        self.page_limit = config.get('ohlcv_page_limit', 1000)
         self.logger.info(f"DataClient initialized for exchange: {self.exchange.id}")
 
-    def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int) -> Optional[pd.DataFrame]:
+    def fetch_ohlcv_raw(self, symbol: str, timeframe: str, limit: int, since: Optional[int] = None) -> Optional[List[List]]:
         """
-        Fetches OHLCV data for a given symbol and timeframe.
+        Fetches raw OHLCV rows, optionally starting at `since` (ms). Used by the incremental store.
         """
         try:
-            self.logger.debug(f"Fetching {limit} bars of {symbol} on {timeframe} timeframe...")
+            self.logger.debug(f"Fetching {limit} bars of {symbol} on {timeframe} timeframe (since={since})...")
             if not self.exchange.has['fetchOHLCV']:
                 self.logger.error(f"Exchange {self.exchange.id} does not support fetchOHLCV.")
                 return None
 
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            
+            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+            METRICS.record_request('fetch_ohlcv', ohlcv_request_weight(limit), response_bytes(self.exchange))
+
             if not ohlcv:
                 self.logger.warning(f"No OHLCV data returned for {symbol} on {timeframe}.")
                 return None
-
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('timestamp', inplace=True)
-            
-            self.logger.debug(f"Successfully fetched {len(df)} bars for {symbol} on {timeframe}.")
-            return df
+            return ohlcv
 
         except Exception as e:
             self.logger.error(f"An unexpected error occurred in fetch_ohlcv: {e}", exc_info=True)
-        
+
         return None
 
+    def fetch_ohlcv_history(self, symbol: str, timeframe: str, bars: int) -> Optional[List[List]]:
+        """
+        Fetches the latest `bars` raw OHLCV rows, paging forward with `since` when more bars are
+        needed than the exchange returns per request.
+        """
+        if bars <= self.page_limit:
+            return self.fetch_ohlcv_raw(symbol, timeframe, bars)
+
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        now = self.exchange.milliseconds()
+        since, rows = now - bars * tf_ms, []
+        while True:
+            page = self.fetch_ohlcv_raw(symbol, timeframe, self.page_limit, since=since)
+            if not page or not merge_ohlcv_page(rows, page) or rows[-1][0] >= now - tf_ms:
+                break
+            since = rows[-1][0] + 1
+        return rows[-bars:] or None
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int) -> Optional[pd.DataFrame]:
+        """
+        Fetches OHLCV data for a given symbol and timeframe.
+        """
+        ohlcv = self.fetch_ohlcv_raw(symbol, timeframe, limit)
+        if ohlcv is None:
+            return None
+
+        df = ohlcv_to_dataframe(ohlcv)
+        self.logger.debug(f"Successfully fetched {len(df)} bars for {symbol} on {timeframe}.")
+        return df
+
     def get_current_price(self, symbol: str) -> Optional[float]:
         """
         Fetches the current ticker price for a symbol.
@@ -58,3 +111,119 @@ class DataClient:
         except Exception as e:
             self.logger.error(f"Could not fetch current price for {symbol}: {e}")
             return None
+
+
+
+class AsyncDataClient:
+    """
+    Asyncio counterpart of DataClient built on ccxt.async_support, used by the multi-symbol scanner.
+    """
+    def __init__(self, config: Dict, scheduler: Optional[RequestScheduler] = None):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.scheduler = scheduler
+        # Imported here: ccxt.async_support loads every async exchange class, which single-pair runs never use
+        import ccxt.async_support as ccxt_async
+        exchange_id = config.get('id', 'binance')
+        exchange_class = getattr(ccxt_async, exchange_id)
+
+        self.market_type = config.get('market_type', 'spot')
+        self.exchange = exchange_class({
+            # The scheduler does the throttling when present; CCXT's limiter would serialize requests
+            'enableRateLimit': config.get('rate_limit_aware', True) and scheduler is None,
+            'options': {
+                'defaultType': self.market_type,
+            },
+        })
+        self.page_limit = config.get('ohlcv_page_limit', 1000)
+        self.markets_cache = markets_cache(config)
+        self.logger.info(f"AsyncDataClient initialized for exchange: {self.exchange.id}")
+
+    async def fetch_ohlcv_raw(self, symbol: str, timeframe: str, limit: int, since: Optional[int] = None,
+                              strict: bool = False) -> Optional[List[List]]:
+        """
+        Fetches raw OHLCV rows without blocking the event loop, optionally starting at `since` (ms).
+        With `strict`, errors are raised and an empty page comes back as [] instead of None, so
+        callers can tell "no bars there" from "request failed" (the history downloader retries).
+        """
+        try:
+            self.logger.debug(f"Fetching {limit} bars of {symbol} on {timeframe} timeframe (since={since})...")
+
+            async def request():
+                rows = await self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+                METRICS.record_request('fetch_ohlcv', ohlcv_request_weight(limit), response_bytes(self.exchange))
+                return rows
+
+            if self.scheduler is not None:
+                ohlcv = await self.scheduler.submit(
+                    ('ohlcv', symbol, timeframe, since, limit), self.scheduler.ohlcv_weight(limit),
+                    self.scheduler.priority_for(timeframe), request)
+            else:
+                ohlcv = await request()
+
+            if strict:
+                return ohlcv or []
+            if not ohlcv:
+                self.logger.warning(f"No OHLCV data returned for {symbol} on {timeframe}.")
+                return None
+            return ohlcv
+
+        except Exception as e:
+            if strict:
+                raise
+            self.logger.error(f"Async fetch_ohlcv failed for {symbol} on {timeframe}: {e}")
+
+        return None
+
+    async def fetch_ohlcv_history(self, symbol: str, timeframe: str, bars: int) -> Optional[List[List]]:
+        """
+        Async counterpart of DataClient.fetch_ohlcv_history.
+        """
+        if bars <= self.page_limit:
+            return await self.fetch_ohlcv_raw(symbol, timeframe, bars)
+
+        tf_ms = self.exchange.parse_timeframe(timeframe) * 1000
+        now = self.exchange.milliseconds()
+        since, rows = now - bars * tf_ms, []
+        while True:
+            page = await self.fetch_ohlcv_raw(symbol, timeframe, self.page_limit, since=since)
+            if not page or not merge_ohlcv_page(rows, page) or rows[-1][0] >= now - tf_ms:
+                break
+            since = rows[-1][0] + 1
+        return rows[-bars:] or None
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int) -> Optional[pd.DataFrame]:
+        """
+        Fetches OHLCV data for a given symbol and timeframe without blocking the event loop.
+        """
+        ohlcv = await self.fetch_ohlcv_raw(symbol, timeframe, limit)
+        return ohlcv_to_dataframe(ohlcv) if ohlcv is not None else None
+
+    async def fetch_top_symbols(self, top_n: int, quote: str = 'USDT') -> List[str]:
+        """
+        Returns the top N active markets for the configured market type, ranked by 24h quote volume.
+        """
+        markets = await self.markets_cache.ensure_async(self.exchange, self.market_type)
+        wanted_type = 'swap' if self.market_type == 'future' else self.market_type
+
+        candidates = [
+            m['symbol'] for m in markets.values()
+            if m.get('active', True) and m.get('quote') == quote and m.get('type') == wanted_type
+        ]
+        if not candidates:
+            self.logger.warning(f"No active {wanted_type} markets quoted in {quote} on {self.exchange.id}.")
+            return []
+
+        if self.scheduler is not None:
+            tickers = await self.scheduler.submit(('tickers', quote, wanted_type), self.scheduler.tickers_weight, 0,
+                                                  lambda: self.exchange.fetch_tickers(candidates))
+        else:
+            tickers = await self.exchange.fetch_tickers(candidates)
+        ranked = sorted(candidates, key=lambda s: (tickers.get(s) or {}).get('quoteVolume') or 0.0, reverse=True)
+        return ranked[:top_n]
+
+    async def close(self):
+        """
+        Closes the underlying HTTP session.
+        """
+        await self.exchange.close()
@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from feeds import KlineFeed, wall_ms
+from mtf_logic import MTFAnalyzer
+from ohlcv_store import OHLCVStore
+from streaming_indicators import StreamingIndicatorCache
+from profiles import ProfileEvaluator
+
+class EventDrivenRunner:
+    """
+    Reacts to kline-close events instead of sleeping a fixed interval.
+
+    Each closed candle is pushed into the OHLCV store and only the timeframes it closes are
+    recomputed; the others keep their cached indicator frames. A close of the entry timeframe
+    triggers evaluate -> calculate_sl_tp for every strategy profile straight away. Latency from candle close to the end of
+    evaluation is recorded per event.
+    """
+    def __init__(self, config: Dict, feed: KlineFeed, store: OHLCVStore, on_signal: Callable[[Dict], None],
+                 streaming: Optional[StreamingIndicatorCache] = None, data_client=None):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.feed = feed
+        self.store = store
+        self.on_signal = on_signal
+        self.data_client = data_client
+        self.tfs = config['timeframes']
+
+        self.mtf_analyzer = MTFAnalyzer(data_client, config, store=store, streaming=streaming)
+        self.profiles = ProfileEvaluator(config)
+
+        self.base_tf = self.mtf_analyzer.base_tf
+        self.stream_tfs = [self.base_tf] if self.base_tf else list(dict.fromkeys(self.tfs.values()))
+        self._data: Dict[str, Dict[str, pd.DataFrame]] = {}
+        self.latencies_ms = deque(maxlen=config.get('events', {}).get('latency_window', 1000))
+
+    def seed(self, symbol: str, timeframe: str, ohlcv: List[List]):
+        """
+        Loads history for a stream without REST calls (e.g. from a recording).
+        """
+        self.store.push(symbol, timeframe, ohlcv)
+
+    def bootstrap(self, symbols: List[str]):
+        """
+        Fetches history over REST for streams that were not seeded.
+        """
+        for symbol in symbols:
+            for tf in self.stream_tfs:
+                if self.store.frame(symbol, tf) is None:
+                    self.store.update(self.data_client, symbol, tf)
+
+    def _frames(self, symbol: str, timeframes: List[str]) -> Optional[Dict[str, pd.DataFrame]]:
+        if self.base_tf:
+            base = self.store.frame(symbol, self.base_tf)
+            return None if base is None else self.mtf_analyzer.derive(base, timeframes)
+        frames = {tf: self.store.frame(symbol, tf) for tf in timeframes}
+        return None if any(df is None for df in frames.values()) else frames
+
+    def _closed_timeframes(self, event: Dict) -> List[str]:
+        """
+        Timeframes whose candle closed with this event (with derived frames, a base close can also
+        close every higher timeframe whose bucket ends at the same instant).
+        """
+        if not self.base_tf:
+            return [event['timeframe']]
+        return [tf for tf in dict.fromkeys(self.tfs.values())
+                if event['close_time'] % (ccxt.Exchange.parse_timeframe(tf) * 1000) == 0]
+
+    def handle(self, event: Dict) -> List[Dict]:
+        """
+        Processes one kline event and returns the final signals (one per profile at most).
+        """
+        symbol, timeframe, row = event['symbol'], event['timeframe'], event['ohlcv']
+        self.store.push(symbol, timeframe, [row])
+        if not event['closed']:
+            return []
+
+        # Open the next candle flat at the close; in-progress updates replace it as they arrive
+        close = row[4]
+        self.store.push(symbol, timeframe, [[event['close_time'], close, close, close, close, 0.0]])
+
+        cached = self._data.get(symbol)
+        dirty = self._closed_timeframes(event) if cached else list(dict.fromkeys(self.tfs.values()))
+        frames = self._frames(symbol, dirty)
+        if frames is None:
+            return []
+        data = dict(cached or {})
+        for tf, df in frames.items():
+            data[tf] = self.mtf_analyzer.compute_frame(symbol, tf, df)
+        self._data[symbol] = data
+        if self.tfs['entry'] not in dirty:
+            return []
+
+        analysis = self.mtf_analyzer.build_analysis(symbol, data)
+        final_signals = self.profiles.evaluate(analysis, data[self.tfs['entry']])
+
+        latency = wall_ms() - event['close_wall_ms']
+        self.latencies_ms.append(latency)
+        detected = event.get('detected_wall_ms')
+        self.logger.debug(f"{symbol} {timeframe} close evaluated {latency} ms after close"
+                          + (f" (feed noticed it after {detected - event['close_time']} ms)." if detected else "."))
+        for final_signal in final_signals:
+            final_signal['latency_ms'] = latency
+            self.on_signal(final_signal)
+        return final_signals
+
+    def latency_stats(self) -> Dict:
+        """
+        Close-to-evaluation latency percentiles (ms) over the recent window.
+        """
+        if not self.latencies_ms:
+            return {'events': 0}
+        values = np.asarray(self.latencies_ms, dtype=np.float64)
+        return {'events': len(values), 'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)), 'max_ms': float(values.max())}
+
+    async def run(self, symbols: List[str]):
+        """
+        Subscribes to the feed and processes events until it ends.
+        """
+        if self.data_client is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.bootstrap, symbols)
+        await self.feed.subscribe([(s, tf) for s in symbols for tf in self.stream_tfs])
+        self.logger.info(f"Event-driven mode listening on {len(symbols)} symbols, timeframes {self.stream_tfs}.")
+
+        started = time.perf_counter()
+        try:
+            async for event in self.feed.events():
+                try:
+                    self.handle(event)
+                except Exception as e:
+                    self.logger.error(f"Failed to handle {event['symbol']} {event['timeframe']} event: {e}",
+                                      exc_info=True)
+        finally:
+            await self.feed.close()
+        self.logger.info(f"Feed ended after {time.perf_counter() - started:.2f}s. Latency: {self.latency_stats()}")
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import ccxt
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from metrics import METRICS
+
+def _counting_pool(base):
+    class CountingPool(base):
+        """
+        Connection pool that records every new TCP/TLS connection (i.e. every handshake).
+        """
+        def _new_conn(self):
+            METRICS.record_connection(self.host)
+            return super()._new_conn()
+    return CountingPool
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose urllib3 pools report new connections to METRICS, so keep-alive reuse is measurable.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _counting_pool(HTTPConnectionPool),
+                                                   'https': _counting_pool(HTTPSConnectionPool)}
+
+
+class MarketsCache:
+    """
+    load_markets() results stored on disk per (exchange, market type) and reused until `ttl_seconds`
+    old, so a restart does not download the full market list again.
+    """
+    def __init__(self, directory: Optional[str], ttl_seconds: float):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.loads = 0
+
+    def _path(self, exchange_id: str, market_type: str) -> str:
+        return os.path.join(self.directory, f"{exchange_id}_{market_type}.json")
+
+    def restore(self, exchange, market_type: str) -> bool:
+        """
+        Sets the exchange's markets from a fresh cache file. Returns False when there is none.
+        """
+        if not self.directory:
+            return False
+        path = self._path(exchange.id, market_type)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                return False
+            with open(path, 'r') as f:
+                cached = json.load(f)
+            exchange.set_markets(cached['markets'], cached.get('currencies'))
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self.logger.warning(f"Ignoring markets cache {path}: {e}")
+            return False
+        self.hits += 1
+        return True
+
+    def save(self, exchange, market_type: str):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(exchange.id, market_type)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'markets': exchange.markets, 'currencies': exchange.currencies}, f)
+        os.replace(tmp_path, path)
+
+    def ensure(self, exchange, market_type: str) -> Dict:
+        """
+        Restores the markets from disk or loads them from the exchange and stores them.
+        """
+        if not self.restore(exchange, market_type):
+            exchange.load_markets()
+            self.loads += 1
+            self.save(exchange, market_type)
+        return exchange.markets
+
+    async def ensure_async(self, exchange, market_type: str) -> Dict:
+        """
+        ensure() for ccxt.async_support exchanges.
+        """
+        if not self.restore(exchange, market_type):
+            await exchange.load_markets()
+            self.loads += 1
+            self.save(exchange, market_type)
+        return exchange.markets
+
+
+def markets_cache(config: Dict) -> MarketsCache:
+    """
+    MarketsCache built from the exchange section of the config.
+    """
+    return MarketsCache(config.get('markets_cache_dir', 'markets_cache'),
+                        config.get('markets_cache_ttl_hours', 24) * 3600)
+
+
+class ExchangePool:
+    """
+    One long-lived CCXT exchange per (exchange id, market type), shared by every DataClient of the
+    process. Each exchange gets a pooled keep-alive HTTP session and its markets from MarketsCache.
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._exchanges: Dict[Tuple[str, str], ccxt.Exchange] = {}
+        self._markets: Dict[Tuple[str, str], MarketsCache] = {}
+
+    def get(self, config: Dict) -> ccxt.Exchange:
+        exchange_id = config.get('id', 'binance')
+        market_type = config.get('market_type', 'spot')
+        key = (exchange_id, market_type)
+        with self._lock:
+            exchange = self._exchanges.get(key)
+            if exchange is not None:
+                return exchange
+
+            pool_size = config.get('http_pool_size', 10)
+            session = requests.Session()
+            adapter = CountingHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            exchange = getattr(ccxt, exchange_id)({
+                'enableRateLimit': config.get('rate_limit_aware', True),
+                'session': session,
+                'options': {
+                    'defaultType': market_type,
+                },
+            })
+            cache = markets_cache(config)
+            try:
+                cache.ensure(exchange, market_type)
+            except Exception as e:
+                # CCXT loads the markets itself on the first request
+                self.logger.warning(f"Could not preload {exchange_id} markets: {e}")
+            self._exchanges[key], self._markets[key] = exchange, cache
+            self.logger.info(f"Created shared {exchange_id} ({market_type}) exchange client.")
+            return exchange
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'exchanges': len(self._exchanges),
+                    'markets_loads': sum(c.loads for c in self._markets.values()),
+                    'markets_cache_hits': sum(c.hits for c in self._markets.values())}
+
+    def close(self):
+        with self._lock:
+            for exchange in self._exchanges.values():
+                exchange.session.close()
+            self._exchanges.clear()
+            self._markets.clear()
+
+
+EXCHANGE_POOL = ExchangePool()
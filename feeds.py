@@ -0,0 +1,170 @@
+import time
+import json
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import ccxt
+import pandas as pd
+
+def wall_ms() -> int:
+    return int(time.time() * 1000)
+
+def kline_event(symbol: str, timeframe: str, row: List, closed: bool, close_wall_ms: Optional[int] = None,
+                detected_wall_ms: Optional[int] = None) -> Dict:
+    """
+    Builds a kline event. `row` is a CCXT OHLCV row and `close_wall_ms` the wall-clock instant that
+    latency is measured from (defaults to the candle's close time; only a replay, whose candles are
+    historical, sets it). `detected_wall_ms` is when the feed noticed the close, if it tracks that.
+    """
+    close_time = int(row[0]) + ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    return {
+        'symbol': symbol, 'timeframe': timeframe, 'ohlcv': [int(row[0])] + [float(v) for v in row[1:6]],
+        'closed': closed, 'close_time': close_time,
+        'close_wall_ms': close_wall_ms if close_wall_ms is not None else close_time,
+        'detected_wall_ms': detected_wall_ms,
+    }
+
+
+class KlineFeed(ABC):
+    """
+    Interface for streaming kline sources. events() yields kline events (see kline_event) for the
+    subscribed streams, both in-progress updates and a final `closed` event per candle.
+    """
+    @abstractmethod
+    async def subscribe(self, streams: List[Tuple[str, str]]):
+        ...
+
+    @abstractmethod
+    def events(self) -> AsyncIterator[Dict]:
+        ...
+
+    async def close(self):
+        pass
+
+
+class CcxtProKlineFeed(KlineFeed):
+    """
+    Exchange WebSocket feed through ccxt.pro watch_ohlcv. A candle is reported closed as soon as the
+    first update of the next candle arrives.
+    """
+    def __init__(self, config: Dict):
+        import ccxt.pro as ccxt_pro
+
+        self.logger = logging.getLogger(__name__)
+        exchange_class = getattr(ccxt_pro, config.get('id', 'binance'))
+        self.exchange = exchange_class({'options': {'defaultType': config.get('market_type', 'spot')}})
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def subscribe(self, streams: List[Tuple[str, str]]):
+        for symbol, timeframe in streams:
+            self._tasks.append(asyncio.create_task(self._watch(symbol, timeframe)))
+
+    async def _watch(self, symbol: str, timeframe: str):
+        last_row = None
+        while True:
+            try:
+                candles = await self.exchange.watch_ohlcv(symbol, timeframe)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"watch_ohlcv failed for {symbol} {timeframe}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for row in candles:
+                if last_row is not None and row[0] > last_row[0]:
+                    await self._queue.put(kline_event(symbol, timeframe, last_row, closed=True, detected_wall_ms=wall_ms()))
+                if last_row is None or row[0] >= last_row[0]:
+                    last_row = row
+            await self._queue.put(kline_event(symbol, timeframe, last_row, closed=False))
+
+    async def events(self) -> AsyncIterator[Dict]:
+        while True:
+            yield await self._queue.get()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.exchange.close()
+
+
+class ReplayFeedServer:
+    """
+    Local stand-in for an exchange kline stream. Serves recorded candles over TCP as JSON lines in
+    close-time order, compressed in time by `speed` (0 = as fast as possible), so the event-driven
+    pipeline can be exercised offline.
+    """
+    def __init__(self, frames: Dict[Tuple[str, str], pd.DataFrame], host: str = '127.0.0.1', port: int = 8765,
+                 speed: float = 0.0):
+        self.logger = logging.getLogger(__name__)
+        self.frames = frames
+        self.host, self.port, self.speed = host, port, speed
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _schedule(self) -> List[Dict]:
+        events = []
+        for (symbol, timeframe), df in self.frames.items():
+            ts = df.index.values.astype('datetime64[ms]').astype('int64')
+            values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy()
+            events.extend(kline_event(symbol, timeframe, [t, *v], closed=True) for t, v in zip(ts, values))
+        # At a shared close instant, higher timeframes go first so the entry close sees them updated
+        events.sort(key=lambda e: (e['close_time'], -ccxt.Exchange.parse_timeframe(e['timeframe'])))
+        return events
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        events = self._schedule()
+        self.logger.info(f"Replay client connected; streaming {len(events)} closed candles.")
+        previous = None
+        try:
+            for event in events:
+                if self.speed and previous is not None and event['close_time'] > previous:
+                    await asyncio.sleep((event['close_time'] - previous) / 1000 / self.speed)
+                previous = event['close_time']
+                event['close_wall_ms'] = wall_ms()
+                writer.write((json.dumps(event) + '\n').encode())
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            self.logger.info("Replay client disconnected.")
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Replay feed server listening on {self.host}:{self.port}.")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class SocketKlineFeed(KlineFeed):
+    """
+    Client for ReplayFeedServer (or anything speaking the same JSON-lines protocol).
+    """
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self._streams = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def subscribe(self, streams: List[Tuple[str, str]]):
+        self._streams = {tuple(s) for s in streams}
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def events(self) -> AsyncIterator[Dict]:
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                return
+            event = json.loads(line)
+            if (event['symbol'], event['timeframe']) in self._streams:
+                yield event
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
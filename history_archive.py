@@ -0,0 +1,342 @@
+import os
+import time
+import struct
+import asyncio
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import ccxt
+import numpy as np
+import pandas as pd
+import yaml
+
+from data_client import AsyncDataClient
+from ohlcv_store import PRICE_COLUMNS
+from utils import setup_logging
+
+# File layout: FILE_MAGIC, then chunks of [int64 rows][int64 ts x rows][float64 column x rows per PRICE_COLUMNS]
+FILE_MAGIC = b'OHLCVCOL'
+CHUNK_HEADER = struct.Struct('<q')
+ROW_BYTES = 8 * (1 + len(PRICE_COLUMNS))
+
+TimeLike = Union[int, str, pd.Timestamp, None]
+
+def to_ms(value: TimeLike) -> Optional[int]:
+    """
+    Epoch milliseconds for an int (already ms), a date string or a Timestamp; naive times are UTC.
+    """
+    if value is None or isinstance(value, (int, np.integer)):
+        return None if value is None else int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return int(ts.value // 1_000_000)
+
+
+class ArchiveReader:
+    """
+    Read-only memory map of one archive file. Opening it reads only the chunk headers and each
+    chunk's first/last timestamp (the sparse timestamp index); slice() binary-searches that index and
+    the timestamp column, then copies just the requested rows, so years of history never have to be
+    loaded to look at a week of it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        size = os.path.getsize(path)
+        self._map = np.memmap(path, dtype=np.uint8, mode='r') if size > len(FILE_MAGIC) else None
+        if self._map is not None and bytes(self._map[:len(FILE_MAGIC)]) != FILE_MAGIC:
+            raise ValueError(f"{path} is not an OHLCV archive file.")
+        self.chunks: List[Tuple[int, int]] = []  # (offset of the ts column, rows)
+        if self._map is not None:
+            offset = len(FILE_MAGIC)
+            while offset + CHUNK_HEADER.size <= size:
+                rows = CHUNK_HEADER.unpack_from(self._map, offset)[0]
+                end = offset + CHUNK_HEADER.size + rows * ROW_BYTES
+                if rows <= 0 or end > size:
+                    break  # torn tail of an interrupted append; the writer truncates it
+                self.chunks.append((offset + CHUNK_HEADER.size, rows))
+                offset = end
+        self.first_ts = np.array([self._column(i, 0)[0] for i in range(len(self.chunks))], dtype=np.int64)
+        self.last_ts = np.array([self._column(i, 0)[-1] for i in range(len(self.chunks))], dtype=np.int64)
+
+    def _column(self, chunk: int, column: int) -> np.ndarray:
+        # column 0 is the timestamp column, 1.. follow PRICE_COLUMNS
+        offset, rows = self.chunks[chunk]
+        return np.frombuffer(self._map, dtype=np.int64 if column == 0 else np.float64, count=rows,
+                             offset=offset + column * rows * 8)
+
+    def __len__(self) -> int:
+        return sum(rows for _, rows in self.chunks)
+
+    @property
+    def first_timestamp(self) -> Optional[int]:
+        return int(self.first_ts[0]) if len(self.chunks) else None
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.last_ts[-1]) if len(self.chunks) else None
+
+    def slice_arrays(self, start: TimeLike = None, end: TimeLike = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ms timestamps, rows x PRICE_COLUMNS values) of the bars with start <= timestamp < end.
+        """
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        first = 0 if start_ms is None else int(np.searchsorted(self.last_ts, start_ms, side='left'))
+        last = len(self.chunks) if end_ms is None else int(np.searchsorted(self.first_ts, end_ms, side='left'))
+        ts_parts, value_parts = [], []
+        for chunk in range(first, last):
+            ts = self._column(chunk, 0)
+            lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side='left'))
+            hi = len(ts) if end_ms is None else int(np.searchsorted(ts, end_ms, side='left'))
+            if hi <= lo:
+                continue
+            ts_parts.append(ts[lo:hi])
+            value_parts.append(np.column_stack([self._column(chunk, c)[lo:hi] for c in range(1, 1 + len(PRICE_COLUMNS))]))
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(PRICE_COLUMNS)))
+        return np.concatenate(ts_parts), np.concatenate(value_parts)
+
+    def slice(self, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """
+        The bars with start <= timestamp < end as a DataFrame laid out like ohlcv_to_dataframe().
+        """
+        ts, values = self.slice_arrays(start, end)
+        index = pd.DatetimeIndex(pd.to_datetime(ts, unit='ms'), name='timestamp')
+        return pd.DataFrame(values, index=index, columns=PRICE_COLUMNS)
+
+    def close(self):
+        self._map = None
+
+
+class HistoryArchive:
+    """
+    Append-only columnar OHLCV history: one file per (symbol, timeframe) under `directory`. Every
+    append adds one chunk of closed bars newer than the last stored bar, so a file only ever grows
+    at the end; an append cut short by a crash is detected and truncated the next time the file is
+    opened for writing.
+    """
+    def __init__(self, directory: str):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self._locks: Dict[str, threading.Lock] = {}
+        self._last: Dict[str, Optional[int]] = {}
+
+    def path(self, symbol: str, timeframe: str) -> str:
+        name = symbol.replace('/', '-').replace(':', '_')
+        return os.path.join(self.directory, f"{name}_{timeframe}.ohlcv")
+
+    def reader(self, symbol: str, timeframe: str) -> Optional[ArchiveReader]:
+        path = self.path(symbol, timeframe)
+        return ArchiveReader(path) if os.path.exists(path) else None
+
+    def slice(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None) -> Optional[pd.DataFrame]:
+        reader = self.reader(symbol, timeframe)
+        if reader is None:
+            return None
+        try:
+            return reader.slice(start, end)
+        finally:
+            reader.close()
+
+    def frames(self, symbol: str, timeframes, start: TimeLike = None, end: TimeLike = None) -> Dict[str, pd.DataFrame]:
+        """
+        {timeframe: frame} for one symbol over [start, end), e.g. for Backtester.prepare / ParameterSweep.
+        Timeframes missing from the archive are left out.
+        """
+        frames = {}
+        for tf in dict.fromkeys(timeframes):
+            df = self.slice(symbol, tf, start, end)
+            if df is not None:
+                frames[tf] = df
+        return frames
+
+    def _recover(self, path: str) -> Optional[int]:
+        """
+        Truncates a torn trailing chunk and returns the last stored timestamp.
+        """
+        if not os.path.exists(path):
+            return None
+        reader = ArchiveReader(path)
+        valid = len(FILE_MAGIC) + sum(CHUNK_HEADER.size + rows * ROW_BYTES for _, rows in reader.chunks)
+        last = reader.last_timestamp
+        reader.close()
+        size = os.path.getsize(path)
+        if size != valid:
+            self.logger.warning(f"Truncating an interrupted append at the end of {path}.")
+            with open(path, 'r+b') as f:
+                f.truncate(valid if size >= len(FILE_MAGIC) else 0)
+        return last
+
+    def last_timestamp(self, symbol: str, timeframe: str) -> Optional[int]:
+        path = self.path(symbol, timeframe)
+        with self._locks.setdefault(path, threading.Lock()):
+            if path not in self._last:
+                self._last[path] = self._recover(path)
+            return self._last[path]
+
+    def append(self, symbol: str, timeframe: str, rows: List[List]) -> int:
+        """
+        Appends raw CCXT rows (ascending) that are newer than the last stored bar as one chunk.
+        Returns the number of rows written.
+        """
+        last = self.last_timestamp(symbol, timeframe)
+        path = self.path(symbol, timeframe)
+        if not rows:
+            return 0
+        data = np.asarray(rows, dtype=np.float64)
+        ts = data[:, 0].astype(np.int64)
+        keep = ts > last if last is not None else np.ones(len(ts), dtype=bool)
+        data, ts = data[keep], ts[keep]
+        if not len(ts):
+            return 0
+
+        with self._locks[path]:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(FILE_MAGIC)
+                f.write(CHUNK_HEADER.pack(len(ts)) + ts.tobytes() + np.ascontiguousarray(data[:, 1:].T).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._last[path] = int(ts[-1])
+        return len(ts)
+
+
+class HistoryDownloader:
+    """
+    Bulk-downloads history into a HistoryArchive by paging fetch_ohlcv with `since`.
+
+    Each (symbol, timeframe) series starts with one probe page, which also skips the time before the
+    market was listed, then fans its remaining page windows out concurrently. All series share one
+    limit on pages in flight, and requests go through the client's RequestScheduler (or CCXT's rate
+    limiter) like every other request of the bot. Pages are appended strictly in order, so an
+    interrupted download keeps everything up to the first missing page and a rerun continues from
+    the last stored bar. Only closed bars are stored.
+    """
+    def __init__(self, config: Dict, client: AsyncDataClient, archive: HistoryArchive):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.archive = archive
+        hist = config.get('history', {})
+        self.page_limit = hist.get('page_limit', config['exchange'].get('ohlcv_page_limit', 1000))
+        self.max_concurrent_pages = hist.get('max_concurrent_pages', 8)
+        self.page_retries = hist.get('page_retries', 5)
+        self.retry_base = hist.get('retry_base_seconds', 1.0)
+        self._pages: Optional[asyncio.Semaphore] = None
+
+    async def _request(self, symbol: str, timeframe: str, since: int) -> List[List]:
+        async with self._pages:
+            for attempt in range(self.page_retries + 1):
+                try:
+                    return await self.client.fetch_ohlcv_raw(symbol, timeframe, self.page_limit, since=since, strict=True)
+                except Exception as e:
+                    if attempt == self.page_retries:
+                        raise
+                    delay = self.retry_base * 2 ** attempt
+                    self.logger.warning(f"Page {symbol} {timeframe} since={since} failed ({e}); retrying in {delay:.1f}s.")
+                    await asyncio.sleep(delay)
+
+    async def _page(self, symbol: str, timeframe: str, since: int, until: int, tf_ms: int) -> List[List]:
+        """
+        Rows with since <= timestamp < until, retried with exponential backoff. Keeps requesting
+        while the exchange stops short of `until` (it returns fewer bars per call than page_limit).
+        """
+        rows = []
+        while since < until:
+            page = await self._request(symbol, timeframe, since)
+            rows += [r for r in page if since <= r[0] < until]
+            if not page or page[-1][0] + tf_ms >= until:
+                break
+            since = page[-1][0] + tf_ms
+        return rows
+
+    async def download_series(self, symbol: str, timeframe: str, start: TimeLike, end: TimeLike = None) -> Dict:
+        """
+        Downloads the closed bars of one series over [start, end) that are not archived yet.
+        """
+        tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        now = int(time.time() * 1000)
+        end_ms = min(to_ms(end) or now, now // tf_ms * tf_ms)  # bars starting before this have closed
+        last = self.archive.last_timestamp(symbol, timeframe)
+        since = to_ms(start) if last is None else max(to_ms(start), last + tf_ms)
+        report = {'symbol': symbol, 'timeframe': timeframe, 'rows': 0, 'pages': 0, 'complete': True}
+        if since >= end_ms:
+            return report
+
+        window = self.page_limit * tf_ms
+        tasks = []
+        try:
+            probe = [r for r in await self._request(symbol, timeframe, since) if since <= r[0] < end_ms]
+            report['pages'] += 1
+            if not probe:
+                return report
+            report['rows'] += self.archive.append(symbol, timeframe, probe)
+            since = probe[-1][0] + tf_ms
+            tasks = [asyncio.ensure_future(self._page(symbol, timeframe, lo, min(lo + window, end_ms), tf_ms))
+                     for lo in range(since, end_ms, window)]
+            # Consumed in order while they run concurrently: a later page is only written after all earlier ones
+            for task in tasks:
+                report['rows'] += self.archive.append(symbol, timeframe, await task)
+                report['pages'] += 1
+        except Exception as e:
+            self.logger.error(f"Downloading {symbol} {timeframe} stopped after {report['rows']} new bars: {e}. "
+                              f"Run again to resume.")
+            report['complete'] = False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return report
+
+    async def download(self, symbols: List[str], timeframes: List[str], start: TimeLike, end: TimeLike = None) -> List[Dict]:
+        """
+        Downloads every (symbol, timeframe) series concurrently and returns one report per series.
+        """
+        self._pages = asyncio.Semaphore(self.max_concurrent_pages)
+        started = time.perf_counter()
+        reports = await asyncio.gather(*(self.download_series(s, tf, start, end) for s in symbols for tf in timeframes))
+        rows = sum(r['rows'] for r in reports)
+        incomplete = [f"{r['symbol']} {r['timeframe']}" for r in reports if not r['complete']]
+        self.logger.info(f"Downloaded {rows} bars in {sum(r['pages'] for r in reports)} pages for {len(reports)} "
+                         f"series in {time.perf_counter() - started:.1f}s"
+                         + (f"; incomplete: {', '.join(incomplete)}" if incomplete else "."))
+        return reports
+
+
+async def run_download(config: Dict, symbols: List[str], timeframes: List[str], start: TimeLike, end: TimeLike = None) -> List[Dict]:
+    from scheduler import RequestScheduler
+
+    scheduler = RequestScheduler(config) if config.get('scheduler', {}).get('enabled', False) else None
+    client = AsyncDataClient(config['exchange'], scheduler=scheduler)
+    archive = HistoryArchive(config.get('history', {}).get('directory', 'history'))
+    try:
+        return await HistoryDownloader(config, client, archive).download(symbols, timeframes, start, end)
+    finally:
+        if scheduler is not None:
+            await scheduler.close()
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download OHLCV history into the columnar archive (resumable).")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--symbols', required=True, help="Comma-separated pairs, e.g. BTC/USDT,ETH/USDT.")
+    parser.add_argument('--timeframes', default=None, help="Comma-separated timeframes (default: the configured ones).")
+    parser.add_argument('--since', default=None, help="Start date, e.g. 2021-01-01 (default: history.since).")
+    parser.add_argument('--until', default=None, help="End date, exclusive (default: now).")
+    args = parser.parse_args()
+
+    setup_logging()
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+    timeframes = ([t.strip() for t in args.timeframes.split(',') if t.strip()] if args.timeframes
+                  else list(dict.fromkeys(config['timeframes'].values())))
+    since = args.since or config.get('history', {}).get('since', '2021-01-01')
+    asyncio.run(run_download(config, symbols, timeframes, since, args.until))
+
+
+if __name__ == "__main__":
+    main()
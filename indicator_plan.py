@@ -0,0 +1,152 @@
+import re
+import logging
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from indicators import IndicatorCache, add_swing_points, pandas_ta
+
+PRICE_COLUMNS = {'open', 'high', 'low', 'close', 'volume'}
+
+# Output column name -> node that produces it. Groups: node kind followed by its integer params.
+COLUMN_PATTERNS = [
+    (re.compile(r'^EMA_(\d+)$'), 'ema'),
+    (re.compile(r'^SMMA_(\d+)$'), 'smma'),
+    (re.compile(r'^ATRr_(\d+)$'), 'atr'),
+    (re.compile(r'^MACD[hs]?_(\d+)_(\d+)_(\d+)$'), 'macd'),
+    (re.compile(r'^STOCH[kd]_(\d+)_(\d+)_(\d+)$'), 'stoch'),
+    (re.compile(r'^STOCHRSI[kd]_(\d+)_(\d+)_(\d+)_(\d+)$'), 'stochrsi'),
+]
+
+Node = Tuple
+
+def column_node(column: str, swing_width: int = 2) -> Optional[Node]:
+    """
+    The indicator node producing `column`, or None for raw OHLCV columns.
+    """
+    if column in PRICE_COLUMNS:
+        return None
+    if column in ('swing_high', 'swing_low'):
+        return ('swings', swing_width)
+    for pattern, kind in COLUMN_PATTERNS:
+        match = pattern.match(column)
+        if match:
+            return (kind,) + tuple(int(g) for g in match.groups())
+    raise ValueError(f"No indicator produces column '{column}'.")
+
+def node_dependencies(node: Node) -> List[Node]:
+    """
+    Intermediate nodes a node is computed from; MACD reuses the EMA nodes of its fast/slow lengths.
+    """
+    if node[0] == 'macd':
+        return [('ema', node[1]), ('ema', node[2])]
+    return []
+
+def _ema(df: pd.DataFrame, inputs: Dict, length: int):
+    return pandas_ta().ema(df['close'], length=length)
+
+def _smma(df: pd.DataFrame, inputs: Dict, length: int):
+    return pandas_ta().smma(df['close'], length=length)
+
+def _atr(df: pd.DataFrame, inputs: Dict, length: int):
+    return pandas_ta().atr(df['high'], df['low'], df['close'], length=length)
+
+def _stoch(df: pd.DataFrame, inputs: Dict, k: int, d: int, smooth_k: int):
+    return pandas_ta().stoch(df['high'], df['low'], df['close'], k=k, d=d, smooth_k=smooth_k)
+
+def _stochrsi(df: pd.DataFrame, inputs: Dict, length: int, rsi_length: int, k: int, d: int):
+    return pandas_ta().stochrsi(df['close'], length=length, rsi_length=rsi_length, k=k, d=d)
+
+def _macd(df: pd.DataFrame, inputs: Dict, fast: int, slow: int, signal: int):
+    # Same steps as pandas_ta.macd, on the shared EMA outputs
+    macd = pd.Series(inputs[('ema', fast)][f"EMA_{fast}"] - inputs[('ema', slow)][f"EMA_{slow}"], index=df.index)
+    signal_ma = pandas_ta().ema(macd.loc[macd.first_valid_index():], length=signal)
+    suffix = f"{fast}_{slow}_{signal}"
+    return pd.DataFrame({f"MACD_{suffix}": macd, f"MACDh_{suffix}": macd - signal_ma,
+                         f"MACDs_{suffix}": signal_ma}, index=df.index)
+
+def _swings(df: pd.DataFrame, inputs: Dict, width: int):
+    return add_swing_points(df[['high', 'low']].copy(), width)[['swing_high', 'swing_low']]
+
+NODE_COMPUTE: Dict[str, Callable] = {
+    'ema': _ema, 'smma': _smma, 'atr': _atr, 'stoch': _stoch, 'stochrsi': _stochrsi,
+    'macd': _macd, 'swings': _swings,
+}
+
+
+class IndicatorPlan:
+    """
+    Per-timeframe indicator compute plan derived from the columns each consumer reads.
+
+    Consumers (StrategyEvaluator, RiskManager, MTFAnalyzer) expose required_columns() returning
+    {timeframe role: set of columns}. The plan maps every column to the node producing it, adds the
+    nodes it depends on (so an EMA shared by MACD and a rule is computed once) and evaluates the
+    nodes in dependency order. Only the requested columns are added to the frame.
+    """
+    def __init__(self, config: Dict, requirements: Dict[str, Set[str]]):
+        self.logger = logging.getLogger(__name__)
+        self.swing_width = config['indicators'].get('swing', {}).get('width', 2)
+        self.requirements = {tf: set(cols) for tf, cols in requirements.items()}
+        self._order: Dict[str, List[Node]] = {tf: self._resolve(cols) for tf, cols in self.requirements.items()}
+        for tf, nodes in self._order.items():
+            self.logger.debug(f"Indicator plan for {tf}: {nodes}")
+
+    @classmethod
+    def from_consumers(cls, config: Dict, consumers: Iterable) -> 'IndicatorPlan':
+        """
+        Merges the required_columns() of every consumer, mapping timeframe roles to timeframes.
+        """
+        tfs = config['timeframes']
+        requirements: Dict[str, Set[str]] = {tf: set() for tf in tfs.values()}
+        for consumer in consumers:
+            for role, columns in consumer.required_columns().items():
+                requirements[tfs[role]] |= set(columns)
+        return cls(config, requirements)
+
+    def _resolve(self, columns: Set[str]) -> List[Node]:
+        order: List[Node] = []
+
+        def visit(node: Node):
+            if node in order:
+                return
+            for dep in node_dependencies(node):
+                visit(dep)
+            order.append(node)
+
+        for column in sorted(columns):
+            node = column_node(column, self.swing_width)
+            if node is not None:
+                visit(node)
+        return order
+
+    def columns(self, timeframe: str) -> Set[str]:
+        return self.requirements.get(timeframe, set())
+
+    def nodes(self, timeframe: str) -> List[Node]:
+        return self._order.get(timeframe, [])
+
+    def compute(self, df: pd.DataFrame, timeframe: str, cache: Optional[IndicatorCache] = None,
+                cache_key: str = '') -> pd.DataFrame:
+        """
+        Adds the planned columns for `timeframe` to `df`. With a cache, every node is looked up by
+        (cache_key, node) first, as in calculate_indicators.
+        """
+        wanted = self.columns(timeframe)
+        outputs: Dict[Node, Dict] = {}
+        for node in self.nodes(timeframe):
+            kind, params = node[0], node[1:]
+            compute = partial(NODE_COMPUTE[kind], df, outputs, *params)
+            if cache is not None:
+                outputs[node] = cache.get_or_compute(cache_key, f"plan:{kind}", {'params': list(params)}, compute)
+                continue
+            result = compute()
+            if isinstance(result, pd.Series):
+                result = result.to_frame()
+            outputs[node] = {col: result[col].to_numpy() for col in result.columns}
+
+        for columns in outputs.values():
+            for col, values in columns.items():
+                if col in wanted:
+                    df[col] = values
+        return df
@@ -1,54 +1,140 @@
+import os
+import json
+import hashlib
 import pandas as pd
-import pandas_ta as ta
-from typing import Dict
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
 
-def calculate_indicators(df: pd.DataFrame, config: Dict) -> pd.DataFrame:
+def pandas_ta():
     """
-    Calculates all required technical indicators and appends them to the DataFrame.
+    Imports pandas_ta on first use (registering the DataFrame.ta accessor). It is slow to import and
+    the streaming indicator path never needs it.
     """
-    p = config['indicators'] 
+    import pandas_ta as ta
+    return ta
 
-    df.ta.macd(fast=p['macd']['fast'], slow=p['macd']['slow'], signal=p['macd']['signal'], append=True)
-    df.ta.stochrsi(length=p['stoch_rsi']['length'], rsi_length=p['stoch_rsi']['length'], 
-                   k=p['stoch_rsi']['smooth_k'], d=p['stoch_rsi']['smooth_d'], append=True)
-    df.ta.stoch(k=p['stochastic']['k'], d=p['stochastic']['d'], smooth_k=p['stochastic']['smooth_k'], append=True)
-    df.ta.smma(length=p['smma']['length'], append=True)
-    df.ta.ema(length=p['ema_fast']['length'], append=True)
-    df.ta.ema(length=p['ema_slow']['length'], append=True)
-    df.ta.ema(length=p['ema_trend_short']['length'], append=True)
-    df.ta.ema(length=p['ema_trend_long']['length'], append=True)
-    df.ta.atr(length=p['atr']['length'], append=True)
+def indicator_specs(config: Dict) -> List[Tuple[str, Dict]]:
+    """
+    The pandas_ta calls made by calculate_indicators, as (method, kwargs) pairs.
+    """
+    p = config['indicators']
+    return [
+        ('macd', {'fast': p['macd']['fast'], 'slow': p['macd']['slow'], 'signal': p['macd']['signal']}),
+        ('stochrsi', {'length': p['stoch_rsi']['length'], 'rsi_length': p['stoch_rsi']['length'],
+                      'k': p['stoch_rsi']['smooth_k'], 'd': p['stoch_rsi']['smooth_d']}),
+        ('stoch', {'k': p['stochastic']['k'], 'd': p['stochastic']['d'], 'smooth_k': p['stochastic']['smooth_k']}),
+        ('smma', {'length': p['smma']['length']}),
+        ('ema', {'length': p['ema_fast']['length']}),
+        ('ema', {'length': p['ema_slow']['length']}),
+        ('ema', {'length': p['ema_trend_short']['length']}),
+        ('ema', {'length': p['ema_trend_long']['length']}),
+        ('atr', {'length': p['atr']['length']}),
+    ]
 
-    # Simplified fractal-based swing detection for Fibonacci
-    df['swing_high'] = df['high'][(df['high'].shift(2) < df['high']) &
-                                  (df['high'].shift(1) < df['high']) &
-                                  (df['high'].shift(-1) < df['high']) &
-                                  (df['high'].shift(-2) < df['high'])]
-    
-    df['swing_low'] = df['low'][(df['low'].shift(2) > df['low']) &
-                                (df['low'].shift(1) > df['low']) &
-                                (df['low'].shift(-1) > df['low']) &
-                                (df['low'].shift(-2) > df['low'])]
-    return df
+class IndicatorCache:
+    """
+    Memoizes indicator outputs by (dataset key, indicator, params). When a directory is given, entries
+    are also stored as .npz files there so several worker processes can share them.
+    """
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._memory: Dict[str, Dict[str, np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
 
-def get_fibonacci_levels(df: pd.DataFrame) -> Dict:
+    @staticmethod
+    def _key(dataset: str, method: str, params: Dict) -> str:
+        return f"{dataset}|{method}|{json.dumps(params, sort_keys=True)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest()[:20] + '.npz')
+
+    def get_or_compute(self, dataset: str, method: str, params: Dict,
+                       compute: Callable[[], pd.DataFrame]) -> Dict[str, np.ndarray]:
+        key = self._key(dataset, method, params)
+        columns = self._memory.get(key)
+        if columns is None and self.directory and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as stored:
+                columns = {name: stored[name] for name in stored.files}
+            self._memory[key] = columns
+
+        if columns is not None:
+            self.hits += 1
+            return columns
+
+        self.misses += 1
+        result = compute()
+        if isinstance(result, pd.Series):
+            result = result.to_frame()
+        columns = {col: result[col].to_numpy() for col in result.columns}
+        self._memory[key] = columns
+
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, **columns)
+            os.replace(tmp_path, path)
+        return columns
+
+def calculate_indicators(df: pd.DataFrame, config: Dict, cache: Optional[IndicatorCache] = None,
+                         cache_key: str = '', timeframe: Optional[str] = None, plan=None) -> pd.DataFrame:
     """
-    Identifies the most recent swing high and low to calculate Fibonacci levels.
+    Calculates all required technical indicators and appends them to the DataFrame.
+    With a cache, each indicator is looked up by (cache_key, indicator, params) first; cache_key must
+    identify the OHLCV data (e.g. timeframe and date range).
+    With an IndicatorPlan (indicator_plan.py), only the columns planned for `timeframe` are computed.
     """
-    last_swing_high_price = df['swing_high'].dropna().iloc[-1] if not df['swing_high'].dropna().empty else None
-    last_swing_high_time = df['swing_high'].dropna().index[-1] if not df['swing_high'].dropna().empty else None
-    
-    last_swing_low_price = df['swing_low'].dropna().iloc[-1] if not df['swing_low'].dropna().empty else None
-    last_swing_low_time = df['swing_low'].dropna().index[-1] if not df['swing_low'].dropna().empty else None
+    if plan is not None:
+        return plan.compute(df, timeframe, cache=cache, cache_key=cache_key)
+    pandas_ta()
+    for method, params in indicator_specs(config):
+        if cache is None:
+            getattr(df.ta, method)(**params, append=True)
+            continue
+        columns = cache.get_or_compute(cache_key, method, params, lambda: getattr(df.ta, method)(**params))
+        for col, values in columns.items():
+            df[col] = values
 
-    if not all([last_swing_high_price, last_swing_low_price]):
-        return {'error': 'Not enough swing points to determine Fibonacci levels.'}
+    return add_swing_points(df, config['indicators'].get('swing', {}).get('width', 2))
 
-    if last_swing_high_time > last_swing_low_time:
-        high_point, low_point, trend = last_swing_high_price, last_swing_low_price, 'up'
-    else:
-        high_point, low_point, trend = last_swing_high_price, last_swing_low_price, 'down'
+def fractal_mask(values: np.ndarray, width: int, kind: str) -> np.ndarray:
+    """
+    Marks bars whose value is strictly above (kind='high') or below (kind='low') the `width` bars on
+    each side. Bars without `width` neighbours on both sides are never marked. Works along the last
+    axis, so a symbols x bars matrix is handled row by row.
+    """
+    n = values.shape[-1]
+    mask = np.zeros(values.shape, dtype=bool)
+    if n < 2 * width + 1:
+        return mask
+    center = values[..., width:n - width]
+    ok = np.ones(center.shape, dtype=bool)
+    for k in range(1, width + 1):
+        left, right = values[..., width - k:n - width - k], values[..., width + k:n - width + k]
+        if kind == 'high':
+            ok &= (center > left) & (center > right)
+        else:
+            ok &= (center < left) & (center < right)
+    mask[..., width:n - width] = ok
+    return mask
 
+def add_swing_points(df: pd.DataFrame, width: int = 2) -> pd.DataFrame:
+    """
+    Adds the swing_high/swing_low columns used for Fibonacci levels.
+    """
+    # Simplified fractal-based swing detection for Fibonacci
+    for kind in ('high', 'low'):
+        values = df[kind].to_numpy(dtype=np.float64)
+        df[f'swing_{kind}'] = np.where(fractal_mask(values, width, kind), values, np.nan)
+    return df
+
+def fibonacci_levels(high_point: float, high_time, low_point: float, low_time) -> Dict:
+    """
+    Fibonacci levels between a swing high and low; the trend is up when the high is the later swing.
+    """
+    trend = 'up' if high_time > low_time else 'down'
     diff = high_point - low_point
     
     levels = {
@@ -64,3 +150,16 @@ def get_fibonacci_levels(df: pd.DataFrame) -> Dict:
         'high': high_point, 'low': low_point, 'trend': trend
     }
     return levels
+
+def get_fibonacci_levels(df: pd.DataFrame) -> Dict:
+    """
+    Identifies the most recent swing high and low to calculate Fibonacci levels.
+    """
+    last_swing_high_time = df['swing_high'].last_valid_index()
+    last_swing_low_time = df['swing_low'].last_valid_index()
+
+    if last_swing_high_time is None or last_swing_low_time is None:
+        return {'error': 'Not enough swing points to determine Fibonacci levels.'}
+
+    return fibonacci_levels(df.at[last_swing_high_time, 'swing_high'], last_swing_high_time,
+                            df.at[last_swing_low_time, 'swing_low'], last_swing_low_time)
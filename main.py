@@ -1,72 +1,257 @@
 import os
 import time
+import asyncio
 import logging
 import argparse
 from datetime import datetime
+from typing import Dict, List, Optional
 
 import yaml
 from dotenv import load_dotenv
 
-from data_client import DataClient
+from data_client import DataClient, AsyncDataClient
+from exchange_pool import EXCHANGE_POOL
 from mtf_logic import MTFAnalyzer
-from strategy import StrategyEvaluator
-from risk import RiskManager
+from ohlcv_store import OHLCVStore
+from resample import base_bars_needed
+from streaming_indicators import StreamingIndicatorCache
+from profiles import ProfileEvaluator, SignalRouter
 from notifier import TelegramNotifier
+from outbox import NotificationOutbox
+from signal_journal import SignalJournal
+from snapshot import load_snapshot, save_snapshot
+from metrics import METRICS, CycleProfiler, MetricsServer, log_cycle_summary
 from utils import setup_logging
 
-def run_bot(pair_symbol: str, config: dict):
+def build_store(config: dict):
+    """
+    Returns a rolling OHLCV store when incremental fetching is enabled, otherwise None.
+    """
+    data_cfg = config.get('data', {})
+    if not data_cfg.get('incremental_store', False):
+        return None
+    lookback = config['strategy']['data_lookback_bars']
+    if data_cfg.get('derive_timeframes', False):
+        base_tf = data_cfg.get('base_timeframe', config['timeframes']['entry'])
+        return OHLCVStore(base_bars_needed(base_tf, config['timeframes'].values(), lookback))
+    return OHLCVStore(lookback)
+
+
+def build_streaming(config: dict, store):
+    """
+    Returns a streaming indicator cache when enabled. It needs the store's continuous frames.
+    """
+    if store is None or not config.get('data', {}).get('streaming_indicators', False):
+        return None
+    return StreamingIndicatorCache(config)
+
+
+def build_outbox(config: dict) -> NotificationOutbox:
+    """
+    Creates the notification outbox and starts its sender (as a task inside an event loop, otherwise
+    in a background thread).
+    """
+    outbox = NotificationOutbox(config, TelegramNotifier(config))
+    outbox.start()
+    return outbox
+
+
+def build_instrumentation(config: dict) -> CycleProfiler:
+    """
+    Starts the metrics endpoint when enabled and returns the on-demand cycle profiler.
+    """
+    profiler = CycleProfiler(config)
+    if config.get('metrics', {}).get('enabled', False):
+        MetricsServer(config, METRICS, profiler).start()
+    return profiler
+
+
+class BotComponents:
+    """
+    Everything run_bot needs, built once and reused across cycles and symbols. The data client's
+    exchange comes from the shared exchange pool, so its keep-alive connections and markets survive
+    between cycles, and the analyzer keeps its swing indexes. All strategy profiles share the analysis;
+    the router keeps their cooldowns and notification chats apart.
+    """
+    def __init__(self, config: dict, store: OHLCVStore = None, streaming: StreamingIndicatorCache = None,
+                 outbox: NotificationOutbox = None, journal: SignalJournal = None, data_client: DataClient = None,
+                 router: SignalRouter = None):
+        self.data_client = data_client or DataClient(config['exchange'])
+        self.mtf_analyzer = MTFAnalyzer(self.data_client, config, store=store, streaming=streaming)
+        self.profiles = ProfileEvaluator(config)
+        # A router passed in (e.g. the replay trace sink) replaces the outbox and journals
+        self.outbox = outbox or (build_outbox(config) if router is None else None)
+        self.router = router or SignalRouter(config, self.outbox, journal)
+
+
+def run_bot(pair_symbol: str, config: dict, store: OHLCVStore = None, streaming: StreamingIndicatorCache = None,
+            outbox: NotificationOutbox = None, journal: SignalJournal = None, data_client: DataClient = None,
+            components: BotComponents = None) -> Optional[List[Dict]]:
     """
     Main function to run the trading bot logic for a given pair.
+    Passing the same store (and streaming cache) across runs makes each cycle fetch only the newest
+    bars and update indicators in O(1) per bar. Passing `components` reuses them instead of building
+    them from the other arguments.
+    Signals are handed to the outbox and delivered in the background. Returns the final signals
+    ([] when there was no setup or signal), or None when the data could not be fetched or the
+    analysis failed.
     """
     logger = logging.getLogger(__name__)
     logger.info(f"🚀 Starting analysis for symbol: {pair_symbol}")
 
     try:
         # 1. Initialize Components
-        data_client = DataClient(config['exchange'])
-        mtf_analyzer = MTFAnalyzer(data_client, config)
-        strategy_evaluator = StrategyEvaluator(config)
-        risk_manager = RiskManager(config)
-        notifier = TelegramNotifier(config)
+        components = components or BotComponents(config, store, streaming, outbox, journal, data_client)
+        mtf_analyzer = components.mtf_analyzer
+        profiles = components.profiles
+        router = components.router
 
         # 2. Perform Multi-Timeframe Analysis
         analysis_result = mtf_analyzer.analyze(pair_symbol)
+        if analysis_result is None:
+            return None
 
-        if not analysis_result or not analysis_result.get('is_valid', False):
+        if not analysis_result.get('is_valid', False):
             logger.info(f"Analysis for {pair_symbol} did not yield a valid setup. Skipping.")
-            return
+            return []
 
-        # 3. Evaluate Strategy and Score Confluence
-        trade_signal = strategy_evaluator.evaluate(analysis_result)
+        # 3. Evaluate Strategy and Score Confluence, then Risk/Reward, for every profile
+        entry_df = analysis_result['data'][config['timeframes']['entry']]
+        final_signals = profiles.evaluate(analysis_result, entry_df)
 
-        if not trade_signal:
+        if not final_signals:
             logger.info(f"No valid trade signal generated for {pair_symbol} based on current strategy rules.")
-            return
+            return []
 
-        # 4. Calculate Risk/Reward
-        entry_df = analysis_result['data'][config['timeframes']['entry']]
-        final_signal = risk_manager.calculate_sl_tp(trade_signal, entry_df)
-
-        if not final_signal:
-            logger.warning(f"Signal for {pair_symbol} discarded due to invalid R:R or SL/TP calculation.")
-            return
-            
-        # 5. Send Notification
-        if notifier.is_cooldown_active(pair_symbol, final_signal['direction']):
-            logger.info(f"Signal for {pair_symbol} is on cooldown. Skipping notification.")
-        else:
-            logger.info(f"✅ Valid signal found for {pair_symbol}! Sending notification...")
-            notifier.send_signal(final_signal)
-            notifier.update_cooldown(pair_symbol, final_signal['direction'])
+        # 4. Send Notifications
+        with METRICS.stage('notify'):
+            for final_signal in final_signals:
+                router.dispatch(final_signal)
+        return final_signals
 
     except Exception as e:
         logger.error(f"An unexpected error occurred during the analysis for {pair_symbol}: {e}", exc_info=True)
+        return None
+
+
+async def run_scanner(symbols, top_n, config: dict):
+    """
+    Scan-mode loop: evaluates every symbol concurrently once per run interval.
+    """
+    from scanner import MarketScanner
+    from scheduler import RequestScheduler
+
+    logger = logging.getLogger(__name__)
+    run_interval_seconds = config['operation'].get('run_interval_minutes', 15) * 60
+    scheduler = RequestScheduler(config) if config.get('scheduler', {}).get('enabled', False) else None
+    data_client = AsyncDataClient(config['exchange'], scheduler=scheduler)
+    store = build_store(config)
+    outbox = build_outbox(config)
+    router = SignalRouter(config, outbox)
+    scanner = MarketScanner(data_client, config, store=store, streaming=build_streaming(config, store),
+                            router=router)
+    profiler = build_instrumentation(config)
+
+    try:
+        while True:
+            try:
+                universe = await scanner.resolve_symbols(symbols, top_n)
+                logger.info(f"🚀 Starting scan of {len(universe)} symbols.")
+                with profiler.cycle('scan'):
+                    report = await scanner.scan(universe)
+
+                with METRICS.stage('notify'):
+                    for final_signal in report['signals']:
+                        router.dispatch(final_signal)
+                log_cycle_summary(config)
+
+                if scheduler is not None:
+                    logger.info(f"Request scheduler: {scheduler.stats()}")
+                if report['elapsed_seconds'] > run_interval_seconds:
+                    logger.warning(f"Scan took {report['elapsed_seconds']:.2f}s, longer than the "
+                                   f"{run_interval_seconds / 60} minute run interval.")
+            except Exception as e:
+                logger.critical(f"A critical error occurred in the scan loop: {e}", exc_info=True)
+
+            logger.info(f"Scan complete. Waiting for {run_interval_seconds / 60} minutes until the next run.")
+            await asyncio.sleep(run_interval_seconds)
+    finally:
+        await outbox.close()
+        if scheduler is not None:
+            await scheduler.close()
+        await data_client.close()
+        scanner.close()
+        router.close()
+
+
+async def run_event_driven(symbols, config: dict):
+    """
+    Event-driven loop: evaluates each symbol as soon as its entry candle closes.
+    """
+    from feeds import CcxtProKlineFeed, SocketKlineFeed
+    from event_pipeline import EventDrivenRunner
+
+    logger = logging.getLogger(__name__)
+    events_cfg = config.get('events', {})
+    if events_cfg.get('feed', 'exchange') == 'replay':
+        feed = SocketKlineFeed(events_cfg.get('replay_host', '127.0.0.1'), events_cfg.get('replay_port', 8765))
+    else:
+        feed = CcxtProKlineFeed(config['exchange'])
+
+    store = build_store(config) or OHLCVStore(config['strategy']['data_lookback_bars'])
+    outbox = build_outbox(config)
+    build_instrumentation(config)
+    router = SignalRouter(config, outbox)
+
+    def on_signal(final_signal):
+        if router.dispatch(final_signal):
+            logger.info(f"Signal for {final_signal['symbol']} queued {final_signal['latency_ms']} ms after close.")
+
+    runner = EventDrivenRunner(config, feed, store, on_signal, streaming=build_streaming(config, store),
+                               data_client=DataClient(config['exchange']))
+    try:
+        await runner.run(symbols)
+    finally:
+        await outbox.close()
+        router.close()
+
+
+def run_once(symbols, config: dict, started: float):
+    """
+    One-shot mode for cron/serverless: restores the OHLCV buffers, indicator engines and swing indexes
+    from the snapshot of the previous run, analyzes each symbol once, writes the snapshot back and
+    waits (bounded) for the notifications to go out. Anything unsent stays in the outbox file.
+    """
+    logger = logging.getLogger(__name__)
+    op_cfg = config['operation']
+    snapshot_path = op_cfg.get('snapshot_file', 'bot_snapshot.pkl.gz')
+
+    store = build_store(config)
+    streaming = build_streaming(config, store)
+    outbox = NotificationOutbox(config, TelegramNotifier(config))
+    components = BotComponents(config, store, streaming, outbox, SignalJournal(config))
+    restored = load_snapshot(snapshot_path, config, store, streaming, components.mtf_analyzer.swings)
+    logger.info(f"Ready to analyze after {time.perf_counter() - started:.3f}s "
+                f"({'warm' if restored else 'cold'} start).")
+
+    try:
+        for symbol in symbols:
+            run_bot(symbol, config, components=components)
+        save_snapshot(snapshot_path, config, store, streaming, components.mtf_analyzer.swings)
+        pending = asyncio.run(outbox.flush(op_cfg.get('once_flush_timeout_seconds', 20)))
+        if pending:
+            logger.warning(f"{pending} notification(s) still pending; they will be sent by the next run.")
+        logger.info(f"One-shot run finished in {time.perf_counter() - started:.2f}s "
+                    f"({store.requests_made if store else 'n/a'} OHLCV requests).")
+    finally:
+        components.router.close()
 
 
 def main():
     """
     Entry point of the script.
     """
+    started = time.perf_counter()
     load_dotenv()
     setup_logging()
     logger = logging.getLogger(__name__)
@@ -77,6 +262,14 @@ def main():
     parser = argparse.ArgumentParser(description="MTF Crypto Trading Bot")
     parser.add_argument('--pair', type=str, default=config['exchange']['default_symbol'],
                         help=f"The trading pair to analyze (e.g., BTC/USDT). Default: {config['exchange']['default_symbol']}")
+    parser.add_argument('--symbols', type=str, default=None,
+                        help="Comma-separated list of pairs to scan concurrently (e.g., BTC/USDT,ETH/USDT).")
+    parser.add_argument('--top', type=int, default=None,
+                        help="Scan the top N markets by 24h quote volume instead of a single pair.")
+    parser.add_argument('--events', action='store_true',
+                        help="Event-driven mode: evaluate on each kline close from a streaming feed.")
+    parser.add_argument('--once', action='store_true',
+                        help="Analyze --pair (or each of --symbols) once, save a state snapshot and exit.")
     args = parser.parse_args()
 
     if config['telegram']['enabled']:
@@ -84,15 +277,41 @@ def main():
             logger.error("TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID must be set in .env file.")
             return
             
+    if args.once:
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols else [args.pair]
+        run_once(symbols, config, started)
+        return
+
+    if args.events:
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols else [args.pair]
+        logger.info("Bot started in event-driven mode.")
+        asyncio.run(run_event_driven(symbols, config))
+        return
+
+    if args.symbols or args.top:
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols else None
+        logger.info("Bot started in scan mode.")
+        asyncio.run(run_scanner(symbols, args.top, config))
+        return
+
     run_interval_seconds = config['operation'].get('run_interval_minutes', 15) * 60
     logger.info(f"Bot started. Running analysis every {run_interval_seconds / 60} minutes.")
-    
+    store = build_store(config)
+    profiler = build_instrumentation(config)
+    components = BotComponents(config, store, build_streaming(config, store), build_outbox(config), SignalJournal(config))
+
     while True:
+        started = time.perf_counter()
         try:
-            run_bot(args.pair, config)
+            with profiler.cycle('run_bot'):
+                run_bot(args.pair, config, components=components)
         except Exception as e:
             logger.critical(f"A critical error occurred in the main loop: {e}", exc_info=True)
-        
+        summary = log_cycle_summary(config)
+        logger.info(f"Cycle took {time.perf_counter() - started:.2f}s with "
+                    f"{int(summary['counters'].get('connections', 0))} new exchange connection(s); "
+                    f"exchange pool: {EXCHANGE_POOL.stats()}")
+
         logger.info(f"Analysis complete. Waiting for {run_interval_seconds / 60} minutes until the next run.")
         time.sleep(run_interval_seconds)
 
@@ -0,0 +1,270 @@
+import os
+import io
+import json
+import time
+import pstats
+import bisect
+import logging
+import cProfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 2.5e5, 1e6, 4e6)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram, one series per label set.
+    """
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        self.series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.series: Dict[Labels, float] = {}
+
+    def inc(self, value: float, labels: Labels):
+        self.series[labels] = self.series.get(labels, 0.0) + value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(labels)} {value}" for labels, value in sorted(self.series.items())]
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics: per-stage latency histograms plus exchange and signal counters.
+
+    Everything recorded since the last cycle_summary() call is also aggregated per stage, so the end
+    of each cycle can log what that cycle spent its time on.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram('bot_stage_seconds', 'Wall time per pipeline stage.', LATENCY_BUCKETS)
+        self.response_bytes = Histogram('bot_exchange_response_bytes', 'Exchange response size.', BYTES_BUCKETS)
+        self.requests = Counter('bot_exchange_requests_total', 'Exchange requests made.')
+        self.weight = Counter('bot_exchange_weight_total', 'Exchange request weight consumed.')
+        self.bytes = Counter('bot_exchange_bytes_total', 'Exchange response bytes downloaded.')
+        self.signals = Counter('bot_signals_total', 'Signals leaving each pipeline stage.')
+        self.connections = Counter('bot_exchange_connections_total', 'New HTTP connections (TCP/TLS handshakes) opened.')
+        self._cycle: Dict[str, list] = {}
+        self._cycle_counters: Dict[str, float] = {}
+        self._cycle_started = time.time()
+
+    @contextmanager
+    def stage(self, stage: str, **labels):
+        """
+        Times the enclosed block as one observation of `stage`.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            key = _labels(dict(labels, stage=stage))
+            with self._lock:
+                self.stage_seconds.observe(elapsed, key)
+                agg = self._cycle.setdefault(stage, [0, 0.0, 0.0])
+                agg[0] += 1
+                agg[1] += elapsed
+                agg[2] = max(agg[2], elapsed)
+
+    def record_request(self, endpoint: str, weight: float, nbytes: Optional[int] = None):
+        key = _labels({'endpoint': endpoint})
+        with self._lock:
+            self.requests.inc(1, key)
+            self.weight.inc(weight, key)
+            self._bump('requests', 1)
+            self._bump('weight', weight)
+            if nbytes is not None:
+                self.bytes.inc(nbytes, key)
+                self.response_bytes.observe(nbytes, key)
+                self._bump('bytes', nbytes)
+
+    def record_connection(self, host: str):
+        with self._lock:
+            self.connections.inc(1, _labels({'host': host}))
+            self._bump('connections', 1)
+
+    def record_signal(self, stage: str, count: int = 1):
+        with self._lock:
+            self.signals.inc(count, _labels({'stage': stage}))
+            self._bump(f"signals_{stage}", count)
+
+    def _bump(self, name: str, value: float):
+        self._cycle_counters[name] = self._cycle_counters.get(name, 0.0) + value
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            parts = [m.render() for m in (self.stage_seconds, self.response_bytes, self.requests, self.weight,
+                                          self.bytes, self.signals, self.connections)]
+        return '\n'.join(parts) + '\n'
+
+    def cycle_summary(self) -> Dict:
+        """
+        Per-stage totals and counters since the previous call, then starts a new cycle.
+        """
+        with self._lock:
+            summary = {
+                'cycle_seconds': round(time.time() - self._cycle_started, 3),
+                'stages': {stage: {'count': n, 'total_ms': round(total * 1000, 2),
+                                   'mean_ms': round(total * 1000 / n, 2), 'max_ms': round(peak * 1000, 2)}
+                           for stage, (n, total, peak) in sorted(self._cycle.items(), key=lambda kv: -kv[1][1])},
+                'counters': dict(self._cycle_counters),
+            }
+            self._cycle, self._cycle_counters, self._cycle_started = {}, {}, time.time()
+        return summary
+
+
+METRICS = MetricsRegistry()
+
+
+class CycleProfiler:
+    """
+    Profiles a single cycle on demand. The next cycle runs under cProfile when the trigger file
+    exists (it is removed) or after arm() is called, e.g. from GET /profile on the metrics server.
+    """
+    def __init__(self, config: Dict):
+        self.logger = logging.getLogger(__name__)
+        cfg = config.get('metrics', {})
+        self.trigger_file = cfg.get('profile_trigger_file', 'profile.trigger')
+        self.directory = cfg.get('profile_dir', 'profiles')
+        self.top = cfg.get('profile_top', 25)
+        self._armed = threading.Event()
+
+    def arm(self):
+        self._armed.set()
+
+    def _should_profile(self) -> bool:
+        if self.trigger_file and os.path.exists(self.trigger_file):
+            try:
+                os.remove(self.trigger_file)
+            except OSError:
+                pass
+            return True
+        if self._armed.is_set():
+            self._armed.clear()
+            return True
+        return False
+
+    @contextmanager
+    def cycle(self, label: str = 'cycle'):
+        if not self._should_profile():
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{label}_{time.strftime('%Y%m%dT%H%M%S')}.prof")
+            profiler.dump_stats(path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+            self.logger.info(f"Profiled {label}; stats saved to {path}.\n{out.getvalue()}")
+
+
+class MetricsServer:
+    """
+    Serves GET /metrics (Prometheus text format) and GET /profile (profile the next cycle) from a
+    daemon thread.
+    """
+    def __init__(self, config: Dict, registry: MetricsRegistry = METRICS, profiler: Optional[CycleProfiler] = None):
+        self.logger = logging.getLogger(__name__)
+        cfg = config.get('metrics', {})
+        self.host = cfg.get('host', '127.0.0.1')
+        self.port = cfg.get('port', 9108)
+        self.registry = registry
+        self.profiler = profiler
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        registry, profiler = self.registry, self.profiler
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics'):
+                    body, ctype = registry.render().encode(), 'text/plain; version=0.0.4'
+                elif self.path.startswith('/profile') and profiler is not None:
+                    profiler.arm()
+                    body, ctype = b'Next cycle will be profiled.\n', 'text/plain'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', ctype)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"Could not start metrics server on {self.host}:{self.port}: {e}")
+            return
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        self.logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def log_cycle_summary(config: Dict, registry: MetricsRegistry = METRICS) -> Dict:
+    """
+    Logs the end-of-cycle summary and appends it to metrics.summary_file when configured.
+    """
+    summary = registry.cycle_summary()
+    logging.getLogger(__name__).info(f"Cycle metrics: {json.dumps(summary)}")
+    path = config.get('metrics', {}).get('summary_file')
+    if path:
+        with open(path, 'a') as f:
+            f.write(json.dumps(dict(summary, time=time.time())) + '\n')
+    return summary
@@ -1,66 +1,170 @@
+import logging
+from typing import Dict, Optional, Set
+
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
-from typing import Dict
 
-def calculate_indicators(df: pd.DataFrame, config: Dict) -> pd.DataFrame:
-    """
-    Calculates all required technical indicators and appends them to the DataFrame.
-    """
-    p = config['indicators'] 
-
-    df.ta.macd(fast=p['macd']['fast'], slow=p['macd']['slow'], signal=p['macd']['signal'], append=True)
-    df.ta.stochrsi(length=p['stoch_rsi']['length'], rsi_length=p['stoch_rsi']['length'], 
-                   k=p['stoch_rsi']['smooth_k'], d=p['stoch_rsi']['smooth_d'], append=True)
-    df.ta.stoch(k=p['stochastic']['k'], d=p['stochastic']['d'], smooth_k=p['stochastic']['smooth_k'], append=True)
-    df.ta.smma(length=p['smma']['length'], append=True)
-    df.ta.ema(length=p['ema_fast']['length'], append=True)
-    df.ta.ema(length=p['ema_slow']['length'], append=True)
-    df.ta.ema(length=p['ema_trend_short']['length'], append=True)
-    df.ta.ema(length=p['ema_trend_long']['length'], append=True)
-    df.ta.atr(length=p['atr']['length'], append=True)
-
-    # Simplified fractal-based swing detection for Fibonacci
-    df['swing_high'] = df['high'][(df['high'].shift(2) < df['high']) &
-                                  (df['high'].shift(1) < df['high']) &
-                                  (df['high'].shift(-1) < df['high']) &
-                                  (df['high'].shift(-2) < df['high'])]
-    
-    df['swing_low'] = df['low'][(df['low'].shift(2) > df['low']) &
-                                (df['low'].shift(1) > df['low']) &
-                                (df['low'].shift(-1) > df['low']) &
-                                (df['low'].shift(-2) > df['low'])]
-    return df
-
-def get_fibonacci_levels(df: pd.DataFrame) -> Dict:
+from data_client import DataClient
+from metrics import METRICS
+from indicators import calculate_indicators, get_fibonacci_levels
+from indicator_plan import IndicatorPlan
+from ohlcv_store import OHLCVStore
+from resample import derive_frames
+from risk import RiskManager
+from strategy import StrategyEvaluator
+from streaming_indicators import StreamingIndicatorCache
+from swing_index import SwingIndexCache
+
+class MTFAnalyzer:
     """
-    Identifies the most recent swing high and low to calculate Fibonacci levels.
+    Builds the multi-timeframe analysis snapshot consumed by StrategyEvaluator and RiskManager.
     """
-    last_swing_high_price = df['swing_high'].dropna().iloc[-1] if not df['swing_high'].dropna().empty else None
-    last_swing_high_time = df['swing_high'].dropna().index[-1] if not df['swing_high'].dropna().empty else None
-    
-    last_swing_low_price = df['swing_low'].dropna().iloc[-1] if not df['swing_low'].dropna().empty else None
-    last_swing_low_time = df['swing_low'].dropna().index[-1] if not df['swing_low'].dropna().empty else None
-
-    if not all([last_swing_high_price, last_swing_low_price]):
-        return {'error': 'Not enough swing points to determine Fibonacci levels.'}
-
-    if last_swing_high_time > last_swing_low_time:
-        high_point, low_point, trend = last_swing_high_price, last_swing_low_price, 'up'
-    else:
-        high_point, low_point, trend = last_swing_high_price, last_swing_low_price, 'down'
-
-    diff = high_point - low_point
-    
-    levels = {
-        'retracement': {
-            '0.382': high_point - 0.382 * diff,
-            '0.5': high_point - 0.5 * diff,
-            '0.618': high_point - 0.618 * diff,
-        },
-        'extension': {
-            '1.272': high_point + 0.272 * diff if trend == 'up' else low_point - 0.272 * diff,
-            '1.618': high_point + 0.618 * diff if trend == 'up' else low_point - 0.618 * diff,
-        },
-        'high': high_point, 'low': low_point, 'trend': trend
-    }
-    return levels
+    def __init__(self, data_client: Optional[DataClient], config: Dict, store: Optional[OHLCVStore] = None,
+                 streaming: Optional[StreamingIndicatorCache] = None):
+        self.logger = logging.getLogger(__name__)
+        self.data_client = data_client
+        self.store = store
+        self.streaming = streaming
+        # Swing points are tracked incrementally alongside the streaming indicators
+        self.swings = SwingIndexCache(config) if streaming is not None else None
+        self.config = config
+        self.tfs = config['timeframes']
+        self.lookback = config['strategy']['data_lookback_bars']
+
+        data_cfg = config.get('data', {})
+        self.base_tf = data_cfg.get('base_timeframe', self.tfs['entry']) if data_cfg.get('derive_timeframes') else None
+        if self.base_tf and store is None:
+            if data_client is not None:
+                self.logger.warning("derive_timeframes needs the incremental store; fetching each timeframe instead.")
+            self.base_tf = None
+
+        p = config['indicators']
+        self.ema_slow_col = f"EMA_{p['ema_slow']['length']}"
+        self.smma_col = f"SMMA_{p['smma']['length']}"
+
+        # 'planned' computes only the columns read by the bias, scoring and SL/TP rules; 'all' keeps
+        # the full calculate_indicators set
+        self.plan: Optional[IndicatorPlan] = None
+        if p.get('compute', 'all') == 'planned':
+            self.plan = IndicatorPlan.from_consumers(config, [self, StrategyEvaluator(config), RiskManager(config)])
+
+    def required_columns(self) -> Dict[str, Set[str]]:
+        """
+        Columns read by the bias rule, the Fibonacci levels and the current price, per timeframe role.
+        """
+        return {
+            'bias': {'close', self.ema_slow_col, self.smma_col, 'swing_high', 'swing_low'},
+            'entry': {'close'},
+        }
+
+    def fetch_frames(self, symbol: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Fetches raw OHLCV for every configured timeframe. Returns None if any fetch fails.
+        With a store attached, only bars newer than the last stored candle are requested.
+        With derive_timeframes, only the base timeframe is fetched and the others are resampled from it.
+        """
+        if self.base_tf:
+            with METRICS.stage('fetch', timeframe=self.base_tf):
+                base = self.store.update(self.data_client, symbol, self.base_tf)
+            if base is None:
+                self.logger.warning(f"Missing {self.base_tf} base data for {symbol}. Aborting analysis.")
+                return None
+            return self.derive(base)
+
+        frames = {}
+        for tf in self.tfs.values():
+            with METRICS.stage('fetch', timeframe=tf):
+                if self.store is not None:
+                    df = self.store.update(self.data_client, symbol, tf)
+                else:
+                    df = self.data_client.fetch_ohlcv(symbol, tf, self.lookback)
+            if df is None:
+                self.logger.warning(f"Missing {tf} data for {symbol}. Aborting analysis.")
+                return None
+            frames[tf] = df
+        return frames
+
+    def derive(self, base: pd.DataFrame, timeframes=None) -> Dict[str, pd.DataFrame]:
+        """
+        Builds every configured timeframe (or just `timeframes`) from the base timeframe series.
+        """
+        with METRICS.stage('resample'):
+            return derive_frames(base, self.base_tf, timeframes or self.tfs.values(), self.lookback)
+
+    def analyze(self, symbol: str) -> Optional[Dict]:
+        """
+        Fetches all timeframes for a symbol and returns the analysis snapshot.
+        """
+        frames = self.fetch_frames(symbol)
+        if frames is None:
+            return None
+        return self.analyze_frames(symbol, frames)
+
+    def analyze_frames(self, symbol: str, frames: Dict[str, pd.DataFrame]) -> Dict:
+        """
+        Runs the indicator pipeline on already fetched frames (keyed by timeframe).
+        The last row of each frame is the in-progress candle, so the last closed candle is iloc[-2].
+        With a streaming cache attached, indicators are updated incrementally instead of recomputed.
+        """
+        data = {}
+        for tf, df in frames.items():
+            if len(df) < 3:
+                self.logger.warning(f"Not enough {tf} bars for {symbol} ({len(df)}).")
+                return {'symbol': symbol, 'is_valid': False}
+            data[tf] = self.compute_frame(symbol, tf, df)
+        return self.build_analysis(symbol, data)
+
+    def compute_frame(self, symbol: str, timeframe: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds indicator and swing columns to one timeframe's frame. In streaming mode swing points go
+        into the swing index instead of columns.
+        """
+        with METRICS.stage('indicators', timeframe=timeframe):
+            if self.streaming is not None:
+                columns = self.plan.columns(timeframe) if self.plan is not None else None
+                if columns is None or 'swing_high' in columns or 'swing_low' in columns:
+                    self.swings.apply(symbol, timeframe, df)
+                return self.streaming.apply(symbol, timeframe, df, columns=columns)
+            return calculate_indicators(df, self.config, timeframe=timeframe, plan=self.plan)
+
+    def build_analysis(self, symbol: str, data: Dict[str, pd.DataFrame]) -> Dict:
+        """
+        Builds the analysis snapshot from frames that already carry their indicator columns.
+        """
+        latest = {tf: df.iloc[-2] for tf, df in data.items()}
+        bias = self._determine_bias(latest[self.tfs['bias']])
+        swing_index = self.swings.get(symbol, self.tfs['bias']) if self.swings is not None else None
+        fib_levels = swing_index.fibonacci_levels() if swing_index else get_fibonacci_levels(data[self.tfs['bias']])
+
+        return {
+            'symbol': symbol,
+            'is_valid': True,
+            'data': data,
+            'latest_candles': latest,
+            'bias_8h': bias,
+            'fib_levels_8h': fib_levels,
+            'current_price': float(data[self.tfs['entry']]['close'].iloc[-1]),
+        }
+
+    def _determine_bias(self, candle: pd.Series) -> str:
+        """
+        Bias is BULLISH/BEARISH when the close sits on the same side of both EMA slow and SMMA.
+        """
+        close, ema_slow, smma = candle['close'], candle[self.ema_slow_col], candle[self.smma_col]
+        if close > ema_slow and close > smma:
+            return 'BULLISH'
+        if close < ema_slow and close < smma:
+            return 'BEARISH'
+        return 'NEUTRAL'
+
+    def bias_array(self, candles) -> np.ndarray:
+        """
+        Vectorized _determine_bias over many bias-timeframe candles (a DataFrame or {column: array}):
+        +1 BULLISH, -1 BEARISH, 0 NEUTRAL.
+        """
+        close = np.asarray(candles['close'])
+        ema_slow, smma = np.asarray(candles[self.ema_slow_col]), np.asarray(candles[self.smma_col])
+        bias = np.zeros(len(close), dtype=np.int8)
+        bias[(close > ema_slow) & (close > smma)] = 1
+        bias[(close < ema_slow) & (close < smma)] = -1
+        return bias
@@ -1,8 +1,6 @@
 import os
 import logging
-from typing import Dict
-from datetime import datetime, timedelta
-import telegram
+from typing import Dict, Optional
 
 class TelegramNotifier:
     """
@@ -11,7 +9,6 @@ class TelegramNotifier:
     def __init__(self, config: Dict):
         self.logger = logging.getLogger(__name__)
         self.config = config.get('telegram', {})
-        self.strategy_config = config.get('strategy', {})
         self.enabled = self.config.get('enabled', False)
         
         if not self.enabled:
@@ -20,8 +17,6 @@ class TelegramNotifier:
             
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_CHAT_ID')
-        self.cooldown_hours = self.strategy_config.get('signal_cooldown_hours', 3)
-        self._last_signal_time = {} 
 
         if not self.token or not self.chat_id:
             self.logger.error("Telegram token or chat_id not set. Disabling notifier.")
@@ -29,37 +24,23 @@ class TelegramNotifier:
             return
         
         try:
+            import telegram
             self.bot = telegram.Bot(token=self.token)
             self.logger.info("TelegramNotifier initialized successfully.")
         except Exception as e:
             self.logger.error(f"Failed to initialize Telegram Bot: {e}")
             self.enabled = False
 
-    def is_cooldown_active(self, symbol: str, direction: str) -> bool:
-        key = f"{symbol}_{direction}"
-        last_time = self._last_signal_time.get(key)
-        if not last_time:
-            return False
-        
-        cooldown_period = timedelta(hours=self.cooldown_hours)
-        return datetime.now() < last_time + cooldown_period
-
-    def update_cooldown(self, symbol: str, direction: str):
-        key = f"{symbol}_{direction}"
-        self._last_signal_time[key] = datetime.now()
-        self.logger.info(f"Cooldown timer started for {key}.")
-
-    def send_signal(self, signal: Dict):
-        if not self.enabled:
-            return
-
+    def format_message(self, signal: Dict) -> str:
         direction_emoji = "🟢" if signal['direction'] == 'LONG' else "🔴"
         price = signal['entry_price']
         precision = 2 if price > 100 else 4 if price > 1 else 6
+        profile = f"**Profil**: `{signal['profile']}`\n" if signal.get('profile') else ""
 
-        message = (
+        return (
             f"📡 **Sinyal {signal['direction']}** {direction_emoji}\n\n"
             f"**Pair**: `{signal['symbol']}`\n"
+            f"{profile}"
             f"**TF**: `8H/4H/1H/15m` | **Skor**: `{signal['score']:.1f}/10`\n\n"
             f"**Entry**: `{signal['entry_price']:.{precision}f}`\n"
             f"**SL**: `{signal['sl_price']:.{precision}f}`\n"
@@ -71,12 +52,16 @@ class TelegramNotifier:
             f"**Timestamp (WIB)**: `{signal['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}`"
         )
 
-        try:
-            self.bot.send_message(
-                chat_id=self.chat_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            self.logger.info(f"Successfully sent signal for {signal['symbol']} to Telegram.")
-        except Exception as e:
-            self.logger.error(f"Failed to send Telegram message: {e}")
+    async def initialize(self):
+        if self.enabled:
+            await self.bot.initialize()
+
+    async def send_message(self, text: str, chat_id: Optional[str] = None):
+        """
+        Sends one message. Errors are raised to the caller (the outbox decides whether to retry).
+        """
+        await self.bot.send_message(
+            chat_id=chat_id or self.chat_id,
+            text=text,
+            parse_mode='Markdown'
+        )
@@ -0,0 +1,190 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+class OHLCVBuffer:
+    """
+    Fixed-capacity rolling OHLCV array for a single (symbol, timeframe).
+
+    Rows live in a block of 2x capacity so appends are amortized O(1); when the block is full the
+    newest `capacity` rows are moved into a fresh array. Rows that have been handed out (view/frame)
+    are never written again: when an ingest revises one of them (the previously in-progress candle),
+    the window moves to a fresh array too, so frames handed out earlier never change behind the
+    caller's back.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ts = np.empty(capacity * 2, dtype=np.int64)
+        self._values = np.empty((capacity * 2, len(PRICE_COLUMNS)), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        # End of the rows of the current array that views handed out may still point at
+        self._exported = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return int(self._ts[self._end - 1]) if len(self) else None
+
+    def ingest(self, ohlcv: List[List]) -> int:
+        """
+        Merges exchange rows into the buffer. Rows at or after the first incoming timestamp are
+        replaced (the previous in-progress candle gets its final values), newer rows are appended.
+        Returns the number of rows written.
+        """
+        if not ohlcv:
+            return 0
+        rows = np.asarray(ohlcv, dtype=np.float64)
+        ts = rows[:, 0].astype(np.int64)
+
+        # Drop anything older than what we already hold, then rewind to the first incoming bar
+        if len(self):
+            keep = ts >= self._ts[self._start]
+            rows, ts = rows[keep], ts[keep]
+            if not len(ts):
+                return 0
+            self._end = self._start + int(np.searchsorted(self._ts[self._start:self._end], ts[0]))
+
+        rows, ts = rows[-self.capacity:], ts[-self.capacity:]
+        n = len(ts)
+        if self._end < self._exported or self._end + n > len(self._ts):
+            self._compact(n)
+
+        self._ts[self._end:self._end + n] = ts
+        self._values[self._end:self._end + n] = rows[:, 1:]
+        self._end += n
+        if len(self) > self.capacity:
+            self._start = self._end - self.capacity
+        return n
+
+    def _compact(self, incoming: int):
+        keep = max(0, min(len(self), self.capacity - incoming))
+        ts = np.empty_like(self._ts)
+        values = np.empty_like(self._values)
+        ts[:keep] = self._ts[self._end - keep:self._end]
+        values[:keep] = self._values[self._end - keep:self._end]
+        self._ts, self._values = ts, values
+        self._start, self._end = 0, keep
+        self._exported = 0
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (timestamps, values) as zero-copy views of the current window.
+        """
+        self._exported = max(self._exported, self._end)
+        return self._ts[self._start:self._end], self._values[self._start:self._end]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Returns the window as a DataFrame whose price columns share memory with the buffer.
+        """
+        ts, values = self.view()
+        index = pd.DatetimeIndex(pd.to_datetime(ts, unit='ms'), name='timestamp')
+        return pd.DataFrame(values, index=index, columns=PRICE_COLUMNS, copy=False)
+
+
+class OHLCVStore:
+    """
+    Per-(symbol, timeframe) rolling OHLCV store that only fetches bars newer than the last closed one.
+    """
+    def __init__(self, capacity: int):
+        self.logger = logging.getLogger(__name__)
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], OHLCVBuffer] = {}
+        self.bars_fetched = 0
+        self.requests_made = 0
+
+    def _plan_fetch(self, symbol: str, timeframe: str, now_ms: int, page_limit: int) -> Tuple[Optional[int], int]:
+        """
+        Returns (since, limit) for the next request. An empty buffer, or one too stale to catch up in
+        a single page, gets a full reload.
+        """
+        buffer = self._buffers.get((symbol, timeframe))
+        if buffer is None or len(buffer) < 2:
+            return None, self.capacity
+
+        # The last stored row is the previously in-progress candle; refetch from there
+        last_ts = buffer.last_timestamp
+        tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        missing = (now_ms - last_ts) // tf_ms + 1
+        if missing >= self.capacity or missing + 1 > page_limit:
+            return None, self.capacity
+        return last_ts, int(missing) + 1
+
+    def _ingest(self, symbol: str, timeframe: str, since: Optional[int], ohlcv: Optional[List[List]]) -> Optional[pd.DataFrame]:
+        key = (symbol, timeframe)
+        self.requests_made += 1
+        if ohlcv is None:
+            return None
+
+        if since is None or key not in self._buffers:
+            self._buffers[key] = OHLCVBuffer(self.capacity)
+        self._buffers[key].ingest(ohlcv)
+        self.bars_fetched += len(ohlcv)
+        self.logger.debug(f"Store {symbol} {timeframe}: ingested {len(ohlcv)} bars (since={since}).")
+        return self.frame(symbol, timeframe)
+
+    def update(self, data_client, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """
+        Brings the buffer up to date through a DataClient and returns the current frame.
+        """
+        since, limit = self._plan_fetch(symbol, timeframe, data_client.exchange.milliseconds(), data_client.page_limit)
+        if since is None:
+            ohlcv = data_client.fetch_ohlcv_history(symbol, timeframe, limit)
+        else:
+            ohlcv = data_client.fetch_ohlcv_raw(symbol, timeframe, limit, since=since)
+        return self._ingest(symbol, timeframe, since, ohlcv)
+
+    async def update_async(self, data_client, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """
+        Same as update(), for an AsyncDataClient.
+        """
+        since, limit = self._plan_fetch(symbol, timeframe, data_client.exchange.milliseconds(), data_client.page_limit)
+        if since is None:
+            ohlcv = await data_client.fetch_ohlcv_history(symbol, timeframe, limit)
+        else:
+            ohlcv = await data_client.fetch_ohlcv_raw(symbol, timeframe, limit, since=since)
+        return self._ingest(symbol, timeframe, since, ohlcv)
+
+    def push(self, symbol: str, timeframe: str, ohlcv: List[List]) -> int:
+        """
+        Merges rows received from a streaming feed, without any REST request.
+        """
+        key = (symbol, timeframe)
+        if key not in self._buffers:
+            self._buffers[key] = OHLCVBuffer(self.capacity)
+        return self._buffers[key].ingest(ohlcv)
+
+    def state(self) -> Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]:
+        """
+        Copies of every buffer's (timestamps, values) window, for snapshots.
+        """
+        return {key: tuple(a.copy() for a in buffer.view()) for key, buffer in self._buffers.items()}
+
+    def load_state(self, state: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]):
+        """
+        Refills the buffers from state(); the next update() then only fetches the bars since.
+        """
+        for key, (ts, values) in state.items():
+            buffer = OHLCVBuffer(self.capacity)
+            n = min(len(ts), self.capacity)
+            buffer._ts[:n] = ts[len(ts) - n:]
+            buffer._values[:n] = values[len(ts) - n:]
+            buffer._end = n
+            self._buffers[key] = buffer
+
+    def frame(self, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
+        """
+        Returns the stored frame for a symbol/timeframe, or None if nothing is stored yet.
+        """
+        buffer = self._buffers.get((symbol, timeframe))
+        if buffer is None or not len(buffer):
+            return None
+        return buffer.frame()
@@ -0,0 +1,163 @@
+import os
+import json
+import math
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from backtest import Backtester
+from indicators import IndicatorCache
+from utils import apply_overrides
+
+# Per-process state set by the pool initializer, so frames are pickled once per worker, not per task
+_worker_state: Dict = {}
+
+def truncate_frames(frames: Dict[str, pd.DataFrame], budget: float) -> Dict[str, pd.DataFrame]:
+    """
+    Keeps the first `budget` fraction of the common history of all frames.
+    """
+    if budget >= 1.0:
+        return frames
+    start = min(df.index[0] for df in frames.values())
+    end = max(df.index[-1] for df in frames.values())
+    cutoff = start + (end - start) * budget
+    return {tf: df.loc[df.index <= cutoff] for tf, df in frames.items()}
+
+def _init_worker(config: Dict, frames: Dict[str, pd.DataFrame], cache_dir: Optional[str], label: str):
+    _worker_state.update(config=config, frames=frames, cache=IndicatorCache(cache_dir), label=label)
+
+def _evaluate(params: Dict, budget: float) -> Dict:
+    config = apply_overrides(_worker_state['config'], params)
+    backtester = Backtester(config)
+    data = backtester.prepare(truncate_frames(_worker_state['frames'], budget),
+                              cache=_worker_state['cache'], label=_worker_state['label'])
+    return {'params': params, 'budget': budget, 'stats': backtester.run(data, prepared=True)['stats']}
+
+
+class ParameterSweep:
+    """
+    Grid, random or successive-halving search over config.yaml settings, backtested in a process pool.
+
+    Indicator outputs are cached per (timeframe, indicator, params) on disk, so e.g. MACD variants
+    reuse the EMA 200 and ATR columns computed by any earlier candidate. Every finished evaluation is
+    appended to the results file straight away and skipped when the sweep is started again.
+    """
+    def __init__(self, config: Dict, frames: Dict[str, pd.DataFrame], label: str = ''):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.frames = frames
+        self.label = label
+
+        opt = config.get('optimizer', {})
+        self.space: Dict[str, List] = opt.get('space', {})
+        self.search = opt.get('search', 'grid')
+        self.n_random = opt.get('n_random', 50)
+        self.workers = opt.get('workers', os.cpu_count() or 1)
+        self.objective = opt.get('objective', 'expectancy_r')
+        self.min_trades = opt.get('min_trades', 20)
+        self.eta = opt.get('halving_eta', 3)
+        self.min_budget = opt.get('halving_min_budget', 0.25)
+        self.results_file = opt.get('results_file', 'optimizer_results.jsonl')
+        self.cache_dir = opt.get('cache_dir', '.indicator_cache')
+        self.seed = opt.get('seed', 42)
+
+    @staticmethod
+    def _record_key(params: Dict, budget: float) -> str:
+        return f"{json.dumps(params, sort_keys=True)}@{budget:.4f}"
+
+    def _is_valid(self, params: Dict) -> bool:
+        macd = apply_overrides(self.config, params)['indicators']['macd']
+        return macd['fast'] < macd['slow']
+
+    def candidates(self) -> List[Dict]:
+        """
+        Builds the candidate list: the full grid, or a seeded random sample of it.
+        """
+        keys = list(self.space)
+        grid = [dict(zip(keys, values)) for values in itertools.product(*(self.space[k] for k in keys))]
+        grid = [params for params in grid if self._is_valid(params)]
+        if self.search == 'grid' or len(grid) <= self.n_random:
+            return grid
+        return random.Random(self.seed).sample(grid, self.n_random)
+
+    def score(self, record: Dict) -> float:
+        stats = record['stats']
+        if stats.get('trades', 0) < self.min_trades:
+            return float('-inf')
+        value = stats.get(self.objective)
+        return float(value) if value is not None and not math.isnan(value) else float('-inf')
+
+    def _rank_key(self, record: Dict):
+        # Ties are broken by the params so reruns keep the same survivors on every halving rung
+        return self.score(record), json.dumps(record['params'], sort_keys=True)
+
+    def _load_done(self) -> Dict[str, Dict]:
+        done = {}
+        if os.path.exists(self.results_file):
+            with open(self.results_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        self.logger.warning("Ignoring a truncated line in the results file.")
+                        continue
+                    done[self._record_key(record['params'], record['budget'])] = record
+        return done
+
+    def _evaluate_all(self, candidates: List[Dict], budget: float, pool: ProcessPoolExecutor,
+                      done: Dict[str, Dict]) -> List[Dict]:
+        records = [done[k] for k in (self._record_key(p, budget) for p in candidates) if k in done]
+        pending = [p for p in candidates if self._record_key(p, budget) not in done]
+        self.logger.info(f"Budget {budget:.2f}: {len(records)} cached, {len(pending)} to evaluate.")
+
+        futures = [pool.submit(_evaluate, params, budget) for params in pending]
+        with open(self.results_file, 'a') as out:
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    self.logger.error(f"Candidate evaluation failed: {e}", exc_info=True)
+                    continue
+                out.write(json.dumps(record, default=str) + '\n')
+                out.flush()
+                done[self._record_key(record['params'], budget)] = record
+                records.append(record)
+        return records
+
+    def run(self) -> List[Dict]:
+        """
+        Runs the sweep and writes the ranked full-history results next to the results file.
+        """
+        candidates = self.candidates()
+        done = self._load_done()
+        self.logger.info(f"Starting {self.search} sweep over {len(candidates)} candidates with {self.workers} workers.")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.config, self.frames, self.cache_dir, self.label)) as pool:
+            if self.search == 'halving':
+                budget = self.min_budget
+                while budget < 1.0 and len(candidates) > 1:
+                    records = self._evaluate_all(candidates, budget, pool, done)
+                    records.sort(key=self._rank_key, reverse=True)
+                    keep = max(1, math.ceil(len(records) / self.eta))
+                    candidates = [r['params'] for r in records[:keep]]
+                    budget = min(1.0, budget * self.eta)
+            records = self._evaluate_all(candidates, 1.0, pool, done)
+
+        ranked = sorted(records, key=self._rank_key, reverse=True)
+        for rank, record in enumerate(ranked, start=1):
+            record['rank'] = rank
+            record['objective'] = self.score(record)
+
+        ranked_file = os.path.splitext(self.results_file)[0] + '_ranked.json'
+        with open(ranked_file, 'w') as f:
+            json.dump(ranked, f, indent=2, default=str)
+        self.logger.info(f"Sweep finished. Ranked results written to {ranked_file}.")
+        return ranked
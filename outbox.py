@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+from notifier import TelegramNotifier
+from scheduler import TokenBucket
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+class NotificationOutbox:
+    """
+    Non-blocking delivery of signal notifications.
+
+    enqueue() formats the signal, appends it to the outbox file and returns at once; a background
+    sender delivers it. The sender keeps to Telegram's per-chat and global message rates, merges
+    messages that pile up for one chat into a digest, and retries failures with exponential
+    backoff. Pending messages are reloaded from the outbox file on start, so a restart loses
+    nothing.
+    """
+    def __init__(self, config: Dict, notifier: TelegramNotifier):
+        self.logger = logging.getLogger(__name__)
+        self.notifier = notifier
+        tg = config.get('telegram', {})
+        self.path = tg.get('outbox_file', 'notification_outbox.jsonl')
+        self.chat_interval = tg.get('per_chat_interval_seconds', 1.0)
+        self.chat_per_minute = tg.get('per_chat_per_minute', 20)
+        self.bucket = TokenBucket(tg.get('global_per_second', 30), tg.get('global_per_second', 30))
+        self.digest_window = tg.get('digest_window_seconds', 1.0)
+        self.digest_max = tg.get('digest_max_messages', 5)
+        self.retry_base = tg.get('retry_base_seconds', 2.0)
+        self.retry_max = tg.get('retry_max_seconds', 300.0)
+        self.max_attempts = tg.get('max_attempts', 20)
+
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = self._load()
+        self._chat_sends: Dict[str, deque] = defaultdict(deque)
+        self._chat_hold: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.digests = 0
+        self.retries = 0
+        self.dropped = 0
+        if self._pending:
+            self.logger.info(f"Loaded {len(self._pending)} pending notifications from {self.path}.")
+
+    def _load(self) -> List[Dict]:
+        pending = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        pending.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        self.logger.warning("Ignoring a truncated line in the outbox file.")
+        return pending
+
+    def _rewrite(self):
+        # Called with the lock held
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for message in self._pending:
+                f.write(json.dumps(message, ensure_ascii=False) + '\n')
+        os.replace(tmp, self.path)
+
+    def enqueue(self, signal: Dict, chat_id: Optional[str] = None):
+        """
+        Queues a notification for the signal, to `chat_id` or the notifier's chat. Safe to call from
+        any thread; never waits on Telegram.
+        """
+        if not self.notifier.enabled:
+            return
+        now = time.time()
+        message = {'id': uuid.uuid4().hex, 'chat_id': chat_id or self.notifier.chat_id, 'symbol': signal['symbol'],
+                   'text': self.notifier.format_message(signal), 'created': now, 'next_attempt': now,
+                   'attempts': 0, 'solo': False}
+        with self._lock:
+            self._pending.append(message)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(message, ensure_ascii=False) + '\n')
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        """
+        Starts the sender as a task on the running event loop, or in a daemon thread when called
+        outside one (the single-pair loop).
+        """
+        if not self.notifier.enabled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            self._task = loop.create_task(self.run())
+        else:
+            threading.Thread(target=asyncio.run, args=(self.run(),), name='notification-outbox', daemon=True).start()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def flush(self, timeout: float) -> int:
+        """
+        Runs the sender until nothing is pending or `timeout` seconds have passed, for one-shot runs
+        that exit afterwards. Returns the number of notifications still pending; they stay in the
+        outbox file for the next run.
+        """
+        if not self.notifier.enabled:
+            return 0
+        task = asyncio.get_running_loop().create_task(self.run())
+        deadline = time.time() + timeout
+        try:
+            while time.time() < deadline:
+                with self._lock:
+                    if not self._pending:
+                        break
+                await asyncio.sleep(0.05)
+        finally:
+            task.cancel()
+        return self.stats()['pending']
+
+    def _chat_ready_at(self, chat_id: str, now: float) -> float:
+        sends = self._chat_sends[chat_id]
+        while sends and sends[0] < now - 60:
+            sends.popleft()
+        ready = self._chat_hold.get(chat_id, 0.0)
+        if sends:
+            ready = max(ready, sends[-1] + self.chat_interval)
+            if len(sends) >= self.chat_per_minute:
+                ready = max(ready, sends[0] + 60)
+        return ready
+
+    def _next_batch(self) -> Tuple[Optional[List[Dict]], Optional[float]]:
+        """
+        Returns (messages to send now, None) or (None, seconds until something may be sent).
+        """
+        now = time.time()
+        with self._lock:
+            by_chat = defaultdict(list)
+            for message in self._pending:
+                by_chat[message['chat_id']].append(message)
+
+            best, best_at = None, None
+            for chat_id, messages in by_chat.items():
+                due = [m for m in messages if m['next_attempt'] <= now]
+                if due:
+                    # Give a burst a moment to finish arriving so it goes out as one digest
+                    ready = max(self._chat_ready_at(chat_id, now), due[0]['created'] + self.digest_window)
+                else:
+                    ready = min(m['next_attempt'] for m in messages)
+                if best_at is None or ready < best_at:
+                    best, best_at = (due if ready <= now else None), ready
+
+            if best_at is None:
+                return None, None
+            if best is None or best_at > now:
+                return None, max(0.0, best_at - now)
+            wait = self.bucket.wait_time(1)
+            if wait > 0:
+                return None, wait
+
+            batch, length = [], 0
+            for message in best:
+                extra = len(message['text']) + (len(DIGEST_SEPARATOR) if batch else 0)
+                if batch and (message['solo'] or batch[0]['solo'] or len(batch) >= self.digest_max
+                              or length + extra > MAX_MESSAGE_LENGTH - 100):
+                    break
+                batch.append(message)
+                length += extra
+            return batch, None
+
+    @staticmethod
+    def _digest(batch: List[Dict]) -> str:
+        if len(batch) == 1:
+            return batch[0]['text']
+        return f"📬 **{len(batch)} sinyal baru**\n\n" + DIGEST_SEPARATOR.join(m['text'] for m in batch)
+
+    def _finish(self, batch: List[Dict]):
+        ids = {m['id'] for m in batch}
+        with self._lock:
+            self._pending = [m for m in self._pending if m['id'] not in ids]
+            self._rewrite()
+
+    def _reschedule(self, batch: List[Dict], error: Exception):
+        now = time.time()
+        with self._lock:
+            for message in batch:
+                message['attempts'] += 1
+                if message['attempts'] >= self.max_attempts:
+                    self.logger.error(f"Giving up on notification for {message['symbol']} after "
+                                      f"{message['attempts']} attempts: {error}")
+                    self.dropped += 1
+                    continue
+                backoff = min(self.retry_max, self.retry_base * 2 ** (message['attempts'] - 1))
+                message['next_attempt'] = now + backoff
+            self._pending = [m for m in self._pending if m['attempts'] < self.max_attempts]
+            self._rewrite()
+        self.retries += 1
+
+    async def _send(self, batch: List[Dict]):
+        from telegram.error import BadRequest, Forbidden, RetryAfter
+
+        chat_id = batch[0]['chat_id']
+        symbols = ', '.join(m['symbol'] for m in batch)
+        self.bucket.consume(1)
+        self._chat_sends[chat_id].append(time.time())
+        try:
+            await self.notifier.send_message(self._digest(batch), chat_id=chat_id)
+        except RetryAfter as e:
+            self.logger.warning(f"Telegram flood limit hit; holding chat {chat_id} for {e.retry_after}s.")
+            self._chat_hold[chat_id] = time.time() + float(e.retry_after)
+        except (BadRequest, Forbidden) as e:
+            if len(batch) > 1:
+                # Retry the messages one by one so a single bad message does not sink the digest
+                with self._lock:
+                    for message in batch:
+                        message['solo'] = True
+                    self._rewrite()
+            else:
+                self.logger.error(f"Telegram rejected the notification for {symbols}: {e}. Dropping it.")
+                self.dropped += 1
+                self._finish(batch)
+        except Exception as e:
+            self.logger.warning(f"Failed to send Telegram notification for {symbols}: {e}. Will retry.")
+            self._reschedule(batch, e)
+        else:
+            self._finish(batch)
+            self.sent += len(batch)
+            self.digests += int(len(batch) > 1)
+            self.logger.info(f"Successfully sent {len(batch)} notification(s) to Telegram: {symbols}.")
+
+    async def run(self):
+        """
+        Sender loop. Runs until cancelled.
+        """
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self.notifier.initialize()
+        except Exception as e:
+            self.logger.error(f"Failed to initialize Telegram Bot: {e}. Pending notifications stay queued.")
+
+        while True:
+            self._wakeup.clear()
+            batch, delay = self._next_batch()
+            if batch is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._send(batch)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'sent': self.sent, 'digests': self.digests,
+                'retries': self.retries, 'dropped': self.dropped}
@@ -0,0 +1,144 @@
+import os
+import copy
+import logging
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from metrics import METRICS
+from risk import RiskManager
+from signal_journal import SignalJournal
+from strategy import StrategyEvaluator
+from utils import apply_overrides
+
+# Config sections a profile may override. Everything else (timeframes, indicators, data) is shared,
+# which is what lets all profiles run on one fetch and one indicator pass.
+PROFILE_SECTIONS = ('strategy', 'risk')
+
+class StrategyProfile:
+    """
+    One named variant of the strategy and risk settings, with its own Telegram chat.
+    The unnamed profile (name None) is the plain config when no profiles are set up.
+    """
+    def __init__(self, name: Optional[str], config: Dict, chat_id: Optional[str] = None,
+                 journal_file: Optional[str] = None):
+        self.name = name
+        self.config = config
+        self.chat_id = chat_id
+        self.journal_file = journal_file or config['strategy'].get('journal_file', 'signal_journal.db')
+        self.min_score = config['strategy']['min_confluence_score']
+        self.risk_manager = RiskManager(config)
+
+
+def build_profiles(config: Dict) -> List[StrategyProfile]:
+    """
+    The profiles from the `profiles` section, each with its dotted-key overrides applied, or the
+    single unnamed profile when the section is empty.
+    """
+    profiles_cfg = config.get('profiles') or {}
+    if not profiles_cfg:
+        return [StrategyProfile(None, config)]
+
+    root, ext = os.path.splitext(config['strategy'].get('journal_file', 'signal_journal.db'))
+    profiles = []
+    for name, spec in profiles_cfg.items():
+        spec = spec or {}
+        overrides = spec.get('overrides') or {}
+        shared = [key for key in overrides if key.split('.')[0] not in PROFILE_SECTIONS]
+        if shared:
+            raise ValueError(f"Profile '{name}' overrides {', '.join(shared)}; profiles may only change "
+                             f"{', '.join(PROFILE_SECTIONS)} settings, the data and indicators are shared.")
+        chat_id = os.getenv(spec['chat_id_env']) if spec.get('chat_id_env') else spec.get('chat_id')
+        profiles.append(StrategyProfile(name, apply_overrides(config, overrides), str(chat_id) if chat_id else None,
+                                        overrides.get('strategy.journal_file', f"{root}_{name}{ext}")))
+    return profiles
+
+
+class ProfileEvaluator:
+    """
+    Evaluates every strategy profile on one analysis. The confluence rules do not depend on profile
+    settings, so scoring runs once at the lowest profile threshold; each profile then only compares
+    the score with its own threshold and runs its own SL/TP and R:R check.
+    """
+    def __init__(self, config: Dict):
+        self.logger = logging.getLogger(__name__)
+        self.profiles = build_profiles(config)
+        scoring = copy.deepcopy(config)
+        scoring['strategy']['min_confluence_score'] = min(p.min_score for p in self.profiles)
+        self.strategy_evaluator = StrategyEvaluator(scoring)
+
+    def finalize(self, trade_signal: Dict, entry_df: pd.DataFrame) -> List[Dict]:
+        """
+        SL/TP per profile whose threshold the scored signal reaches. Signals of named profiles carry
+        a 'profile' key.
+        """
+        signals = []
+        for profile in self.profiles:
+            if trade_signal['score'] < profile.min_score:
+                continue
+            signal = dict(trade_signal) if len(self.profiles) > 1 else trade_signal
+            if profile.name is not None:
+                signal['profile'] = profile.name
+            with METRICS.stage('risk'):
+                final_signal = profile.risk_manager.calculate_sl_tp(signal, entry_df)
+            if final_signal:
+                METRICS.record_signal('risk')
+                signals.append(final_signal)
+        return signals
+
+    def evaluate(self, analysis: Dict, entry_df: pd.DataFrame) -> List[Dict]:
+        """
+        evaluate -> calculate_sl_tp for every profile. Returns the final signals (one per profile at most).
+        """
+        with METRICS.stage('evaluate'):
+            trade_signal = self.strategy_evaluator.evaluate(analysis)
+        if not trade_signal:
+            return []
+        METRICS.record_signal('evaluate')
+        return self.finalize(trade_signal, entry_df)
+
+
+class SignalRouter:
+    """
+    Cooldowns and notification routing per profile. Each named profile keeps its own signal journal
+    (strategy.journal_file with the profile name appended, unless the profile sets its own) and
+    sends to its own chat when it has one; the unnamed profile uses the plain journal and chat.
+    Lives in the process that owns the outbox.
+    """
+    def __init__(self, config: Dict, outbox, journal: Optional[SignalJournal] = None):
+        self.logger = logging.getLogger(__name__)
+        self.outbox = outbox
+        self.profiles = {p.name: p for p in build_profiles(config)}
+        self.journals: Dict[Optional[str], SignalJournal] = {}
+        for name, profile in self.profiles.items():
+            if name is None and journal is not None:
+                self.journals[name] = journal
+            else:
+                self.journals[name] = SignalJournal(profile.config, path=profile.journal_file)
+
+    def is_fully_on_cooldown(self, symbol: str) -> bool:
+        """
+        True when no profile could send a signal for the symbol.
+        """
+        return all(journal.is_fully_on_cooldown(symbol) for journal in self.journals.values())
+
+    def dispatch(self, signal: Dict) -> bool:
+        """
+        Queues the notification and starts the cooldown unless the signal's profile is on cooldown.
+        Returns whether it was queued.
+        """
+        name = signal.get('profile')
+        journal = self.journals[name]
+        label = f"{signal['symbol']}" + (f" [{name}]" if name else "")
+        if journal.is_cooldown_active(signal['symbol'], signal['direction']):
+            self.logger.info(f"Signal for {label} is on cooldown. Skipping notification.")
+            return False
+        self.logger.info(f"✅ Valid signal found for {label}! Queueing notification...")
+        self.outbox.enqueue(signal, chat_id=self.profiles[name].chat_id)
+        journal.record_signal(signal)
+        METRICS.record_signal('notify')
+        return True
+
+    def close(self):
+        for journal in self.journals.values():
+            journal.close()
@@ -0,0 +1,293 @@
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from data_client import DataClient
+from history_archive import HistoryArchive, TimeLike, to_ms
+from notifier import TelegramNotifier
+from profiles import build_profiles
+from resample import base_bars_needed, timeframe_ms
+from synthetic import RecordedExchange
+from utils import setup_logging
+import main as bot
+
+def replay_config(config: Dict) -> Dict:
+    """
+    Copy of config for replays: Telegram is off (signals only go to the trace) and the base
+    timeframe is always set, since the recorded exchange serves every timeframe from it.
+    """
+    config = copy.deepcopy(config)
+    config['telegram']['enabled'] = False
+    data_cfg = config.setdefault('data', {})
+    data_cfg.setdefault('base_timeframe', config['timeframes']['entry'])
+    return config
+
+def warmup_ms(config: Dict) -> int:
+    """
+    How far before the first cycle the recorded series must start: what a cold first cycle fetches,
+    plus two spare buckets of the largest timeframe.
+    """
+    tfs = config['timeframes'].values()
+    base_tf = config['data']['base_timeframe']
+    largest = max(timeframe_ms(tf) for tf in tfs)
+    return base_bars_needed(base_tf, tfs, config['strategy']['data_lookback_bars']) * timeframe_ms(base_tf) + 2 * largest
+
+def load_series(config: Dict, archive: HistoryArchive, symbols: List[str], start_ms: int, end_ms: int) -> Dict[str, pd.DataFrame]:
+    """
+    Recorded base timeframe bars of every symbol from the warm-up before `start_ms` up to the candle
+    that is forming at `end_ms`.
+    """
+    base_tf = config['data']['base_timeframe']
+    series = {}
+    for symbol in symbols:
+        df = archive.slice(symbol, base_tf, start_ms - warmup_ms(config), end_ms + timeframe_ms(base_tf))
+        if df is None or df.empty:
+            raise ValueError(f"No {base_tf} history for {symbol} in {archive.directory}; download it with history_archive.py.")
+        if df.index[0] > pd.Timestamp(start_ms - warmup_ms(config), unit='ms') + pd.Timedelta(days=1):
+            logging.getLogger(__name__).warning(
+                f"{symbol} history starts at {df.index[0]}; early cycles will not have the full lookback.")
+        series[symbol] = df
+    return series
+
+def _plain(value):
+    """
+    JSON-ready copy of a signal value (numpy scalars to Python, timestamps to ISO strings).
+    """
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+class TraceRecorder:
+    """
+    Stands in for SignalRouter as the notifier sink of one replayed cycle: every signal that reaches
+    it is stamped with the simulated time, rendered with TelegramNotifier.format_message and kept for
+    the trace. Cooldowns are left to apply_cooldowns over the finished trace, which keeps cycles
+    independent of each other.
+    """
+    def __init__(self, notifier: TelegramNotifier, now: pd.Timestamp):
+        self.notifier = notifier
+        self.now = now
+        self.signals: List[Dict] = []
+
+    def dispatch(self, signal: Dict) -> bool:
+        signal['timestamp'] = self.now
+        self.signals.append(dict(_plain(signal), message=self.notifier.format_message(signal)))
+        return True
+
+
+class ReplaySession:
+    """
+    Replays cycles of run_bot over recorded series. Each cycle sets the exchange clock, builds fresh
+    components (a cold store, streaming cache and swing index, exactly like a restarted bot) and runs
+    every symbol through DataClient -> indicators -> evaluate -> calculate_sl_tp -> TraceRecorder.
+    A cycle depends only on the recorded data and its clock, so cycles can run in any order or process.
+    """
+    def __init__(self, config: Dict, series: Dict[str, pd.DataFrame]):
+        self.config = config
+        self.symbols = list(series)
+        self.exchange = RecordedExchange(series, config['data']['base_timeframe'], forming='open')
+        self.data_client = DataClient(config['exchange'], exchange=self.exchange)
+        self.notifier = TelegramNotifier(config)
+
+    def cycle(self, index: int, clock_ms: int) -> Dict:
+        self.exchange.set_clock(clock_ms)
+        now = pd.Timestamp(clock_ms, unit='ms', tz='UTC').tz_convert(self.config['telegram']['timezone'])
+        recorder = TraceRecorder(self.notifier, now)
+        store = bot.build_store(self.config)
+        components = bot.BotComponents(self.config, store, bot.build_streaming(self.config, store),
+                                       data_client=self.data_client, router=recorder)
+        failed = [symbol for symbol in self.symbols if bot.run_bot(symbol, self.config, components=components) is None]
+        return {'cycle': index, 'time': now.tz_convert('UTC').isoformat(), 'clock_ms': int(clock_ms),
+                'signals': recorder.signals, 'failed': failed}
+
+
+_WORKER_SESSION: Optional[ReplaySession] = None
+
+def _init_worker(config: Dict, directory: str, symbols: List[str], start_ms: int, end_ms: int, log_level: int):
+    global _WORKER_SESSION
+    setup_logging()
+    logging.getLogger().setLevel(log_level)
+    # Each worker maps the archive itself; only the cycle clocks travel between processes
+    series = load_series(config, HistoryArchive(directory), symbols, start_ms, end_ms)
+    _WORKER_SESSION = ReplaySession(config, series)
+
+def _replay_chunk(cycles: List[Tuple[int, int]]) -> List[Dict]:
+    return [_WORKER_SESSION.cycle(index, clock_ms) for index, clock_ms in cycles]
+
+
+def apply_cooldowns(config: Dict, cycles: List[Dict]):
+    """
+    Marks each traced signal with 'cooldown': whether the profile's signal journal would have held it
+    back (same profile, symbol and direction sent less than signal_cooldown_hours earlier in
+    simulated time). Cycles must be in time order.
+    """
+    cooldown_ms = {p.name: p.config['strategy'].get('signal_cooldown_hours', 3) * 3_600_000
+                   for p in build_profiles(config)}
+    last_sent: Dict[Tuple, int] = {}
+    for cycle in cycles:
+        for signal in cycle['signals']:
+            key = (signal.get('profile'), signal['symbol'], signal['direction'])
+            last = last_sent.get(key)
+            signal['cooldown'] = last is not None and cycle['clock_ms'] < last + cooldown_ms[key[0]]
+            if not signal['cooldown']:
+                last_sent[key] = cycle['clock_ms']
+
+
+def run_replay(config: Dict, symbols: List[str], start: TimeLike, end: TimeLike, interval_minutes: Optional[float] = None,
+               workers: int = 0) -> Tuple[Dict, List[Dict]]:
+    """
+    Replays run_bot every `interval_minutes` (default operation.run_interval_minutes) of simulated
+    time over [start, end) from the history archive. With workers > 0 the cycles are split into
+    contiguous chunks across a process pool. Returns the trace header and the cycles in time order.
+    """
+    logger = logging.getLogger(__name__)
+    config = replay_config(config)
+    interval_minutes = interval_minutes or config['operation'].get('run_interval_minutes', 15)
+    start_ms, end_ms = to_ms(start), to_ms(end)
+    clocks = list(enumerate(range(start_ms, end_ms, int(interval_minutes * 60_000))))
+    directory = config.get('history', {}).get('directory', 'history')
+    header = {'symbols': symbols, 'start': pd.Timestamp(start_ms, unit='ms').isoformat(),
+              'end': pd.Timestamp(end_ms, unit='ms').isoformat(), 'interval_minutes': interval_minutes,
+              'base_timeframe': config['data']['base_timeframe'], 'cycles': len(clocks)}
+
+    started = time.perf_counter()
+    if workers > 0 and len(clocks) > 1:
+        chunks = [chunk.tolist() for chunk in np.array_split(np.asarray(clocks), min(len(clocks), workers * 4))]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(config, directory, symbols, start_ms, end_ms,
+                                           logging.getLogger().getEffectiveLevel())) as pool:
+            cycles = [cycle for chunk in pool.map(_replay_chunk, chunks) for cycle in chunk]
+    else:
+        session = ReplaySession(config, load_series(config, HistoryArchive(directory), symbols, start_ms, end_ms))
+        cycles = [session.cycle(index, clock_ms) for index, clock_ms in clocks]
+    apply_cooldowns(config, cycles)
+
+    elapsed = time.perf_counter() - started
+    simulated = (end_ms - start_ms) / 1000
+    logger.info(f"Replayed {len(clocks)} cycles x {len(symbols)} symbols in {elapsed:.1f}s "
+                f"({simulated / max(elapsed, 1e-9):,.0f}x real time) with {workers} worker(s).")
+    return header, cycles
+
+
+def write_trace(path: str, header: Dict, cycles: List[Dict]):
+    """
+    One JSON line for the header, then one per cycle; keys are sorted so equal traces are equal files.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'replay': header}, sort_keys=True, ensure_ascii=False) + '\n')
+        for cycle in cycles:
+            f.write(json.dumps(cycle, sort_keys=True, ensure_ascii=False) + '\n')
+
+def load_trace(path: str) -> Tuple[Dict, List[Dict]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0]['replay'], lines[1:]
+
+def _same(a, b, rtol: float) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or abs(a - b) <= rtol * max(abs(a), abs(b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k], rtol) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_same(x, y, rtol) for x, y in zip(a, b))
+    return a == b
+
+def diff_traces(a: Tuple[Dict, List[Dict]], b: Tuple[Dict, List[Dict]], rtol: float = 0.0) -> List[str]:
+    """
+    Human-readable differences between two traces, cycle by cycle: signals only in one of them
+    (keyed by profile, symbol and direction), fields that changed, and symbols whose analysis failed
+    in only one. Floats within `rtol` (relative) count as equal. Empty when the traces agree.
+    """
+    (header_a, cycles_a), (header_b, cycles_b) = a, b
+    differences = [f"header {key}: {header_a.get(key)!r} != {header_b.get(key)!r}"
+                   for key in sorted(header_a.keys() | header_b.keys()) if header_a.get(key) != header_b.get(key)]
+    by_time_a, by_time_b = {c['time']: c for c in cycles_a}, {c['time']: c for c in cycles_b}
+    for when in sorted(by_time_a.keys() | by_time_b.keys()):
+        cycle_a, cycle_b = by_time_a.get(when), by_time_b.get(when)
+        if cycle_a is None or cycle_b is None:
+            differences.append(f"{when}: cycle only in {'B' if cycle_a is None else 'A'}")
+            continue
+        signals_a = {(s.get('profile'), s['symbol'], s['direction']): s for s in cycle_a['signals']}
+        signals_b = {(s.get('profile'), s['symbol'], s['direction']): s for s in cycle_b['signals']}
+        for key in sorted(signals_a.keys() | signals_b.keys(), key=str):
+            label = ' '.join(k for k in (key[1], key[2], key[0] and f"[{key[0]}]") if k)
+            if key not in signals_b:
+                differences.append(f"{when}: {label} only in A")
+            elif key not in signals_a:
+                differences.append(f"{when}: {label} only in B")
+            else:
+                changed = [field for field in sorted(signals_a[key].keys() | signals_b[key].keys())
+                           if not _same(signals_a[key].get(field), signals_b[key].get(field), rtol)]
+                if changed:
+                    differences.append(f"{when}: {label} changed: " + ', '.join(
+                        f"{field} {signals_a[key].get(field)!r} -> {signals_b[key].get(field)!r}"
+                        if field != 'message' else field for field in changed))
+        if cycle_a['failed'] != cycle_b['failed']:
+            differences.append(f"{when}: failed {cycle_a['failed']} -> {cycle_b['failed']}")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deterministic replay of run_bot over the history archive, writing a per-cycle signal trace.")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--symbols', default=None, help="Comma-separated pairs (default: exchange.default_symbol).")
+    parser.add_argument('--start', help="First cycle, e.g. 2024-03-01 (UTC).")
+    parser.add_argument('--end', help="End of the replay (exclusive).")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="Minutes of simulated time between cycles (default: operation.run_interval_minutes).")
+    parser.add_argument('--workers', default=None, help="Worker processes, or 'auto' (default: replay.workers).")
+    parser.add_argument('--trace', default=None, help="Trace file to write (default: replay.trace_file).")
+    parser.add_argument('--diff', nargs=2, metavar=('A', 'B'), help="Compare two trace files instead of replaying.")
+    parser.add_argument('--rtol', type=float, default=0.0, help="Relative tolerance for floats in --diff.")
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.getLogger().setLevel(args.log_level.upper())
+    logging.getLogger(__name__).setLevel(logging.INFO)
+
+    if args.diff:
+        differences = diff_traces(load_trace(args.diff[0]), load_trace(args.diff[1]), args.rtol)
+        for line in differences:
+            print(line)
+        print(f"{len(differences)} difference(s)." if differences else "Traces are identical.")
+        sys.exit(1 if differences else 0)
+
+    if not args.start or not args.end:
+        parser.error("--start and --end are required to replay.")
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    replay_cfg = config.get('replay', {})
+    symbols = ([s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols
+               else [config['exchange']['default_symbol']])
+    workers = args.workers if args.workers is not None else replay_cfg.get('workers', 0)
+    workers = (os.cpu_count() or 1) if workers == 'auto' else int(workers or 0)
+
+    header, cycles = run_replay(config, symbols, args.start, args.end, args.interval, workers)
+    trace = args.trace or replay_cfg.get('trace_file', 'replay_trace.jsonl')
+    write_trace(trace, header, cycles)
+    signals = [s for c in cycles for s in c['signals']]
+    print(f"{len(cycles)} cycles, {len(signals)} signals ({sum(not s['cooldown'] for s in signals)} past cooldown), "
+          f"{sum(len(c['failed']) for c in cycles)} failed analyses. Trace written to {trace}.")
+
+
+if __name__ == "__main__":
+    main()
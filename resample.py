@@ -0,0 +1,86 @@
+import logging
+from typing import Dict, Optional
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from data_client import ohlcv_to_dataframe
+
+logger = logging.getLogger(__name__)
+
+def timeframe_ms(timeframe: str) -> int:
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+def resample_ohlcv(base: pd.DataFrame, base_timeframe: str, timeframe: str) -> pd.DataFrame:
+    """
+    Builds `timeframe` candles from a finer `base_timeframe` series.
+
+    Buckets are aligned to the Unix epoch, which is how exchanges align intraday candles (8h buckets
+    open at 00/08/16 UTC). A leading bucket that the base history only partly covers is dropped,
+    since its open/high/low would be wrong. The trailing bucket is kept even when incomplete: it is
+    the in-progress candle, just like the last row returned by fetch_ohlcv.
+    """
+    base_ms, target_ms = timeframe_ms(base_timeframe), timeframe_ms(timeframe)
+    if target_ms % base_ms:
+        raise ValueError(f"{timeframe} is not a multiple of the base timeframe {base_timeframe}.")
+    if timeframe[-1] in ('w', 'M'):
+        raise ValueError(f"{timeframe} candles are not epoch aligned and cannot be derived.")
+    if target_ms == base_ms or base.empty:
+        return base
+
+    ts = base.index.values.astype('datetime64[ms]').astype(np.int64)
+    buckets = ts // target_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    # First bucket is only complete if the base history starts exactly at the bucket open
+    first = 0 if ts[0] == buckets[0] * target_ms else 1
+    starts, ends = starts[first:], ends[first:]
+    if not len(starts):
+        return base.iloc[:0]
+
+    o, h, l, c, v = (base[col].to_numpy() for col in ('open', 'high', 'low', 'close', 'volume'))
+    index = pd.to_datetime(buckets[starts] * target_ms, unit='ms')
+    return pd.DataFrame({
+        'open': o[starts],
+        'high': np.maximum.reduceat(h, starts),
+        'low': np.minimum.reduceat(l, starts),
+        'close': c[ends],
+        'volume': np.add.reduceat(v, starts),
+    }, index=pd.DatetimeIndex(index, name='timestamp'))
+
+def base_bars_needed(base_timeframe: str, timeframes, lookback: int) -> int:
+    """
+    Base bars needed so that every derived timeframe gets `lookback` candles (plus one spare bucket
+    for a partially covered leading bucket).
+    """
+    ratio = max(timeframe_ms(tf) for tf in timeframes) // timeframe_ms(base_timeframe)
+    return (lookback + 1) * ratio
+
+def derive_frames(base: pd.DataFrame, base_timeframe: str, timeframes, lookback: int) -> Dict[str, pd.DataFrame]:
+    """
+    Returns one frame per timeframe, each trimmed to the last `lookback` candles.
+    """
+    return {tf: resample_ohlcv(base, base_timeframe, tf).iloc[-lookback:] for tf in timeframes}
+
+def verify_against_exchange(data_client, symbol: str, base_timeframe: str, timeframe: str,
+                            bars: int = 100, rtol: float = 1e-6) -> Optional[pd.DataFrame]:
+    """
+    Fetches `timeframe` candles from the exchange, derives the same candles from `base_timeframe`
+    and returns the closed candles whose OHLCV differ beyond `rtol` (empty when they all match).
+    """
+    ratio = timeframe_ms(timeframe) // timeframe_ms(base_timeframe)
+    fetched = data_client.fetch_ohlcv(symbol, timeframe, bars)
+    base_rows = data_client.fetch_ohlcv_history(symbol, base_timeframe, (bars + 1) * ratio)
+    if fetched is None or not base_rows:
+        logger.error(f"Could not fetch data to verify {timeframe} resampling for {symbol}.")
+        return None
+
+    derived = resample_ohlcv(ohlcv_to_dataframe(base_rows), base_timeframe, timeframe)
+    # Compare closed candles only; in-progress candles were snapshotted at different instants
+    common = fetched.index[:-1].intersection(derived.index[:-1])
+    a, b = fetched.loc[common], derived.loc[common]
+    mismatch = ~np.isclose(a.to_numpy(), b.to_numpy(), rtol=rtol, atol=0.0).all(axis=1)
+    logger.info(f"{symbol} {timeframe}: compared {len(common)} candles, {int(mismatch.sum())} mismatches.")
+    return a[mismatch].join(b[mismatch], rsuffix='_derived')
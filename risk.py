@@ -1,5 +1,6 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
+import numpy as np
 import pandas as pd
 
 class RiskManager:
@@ -13,9 +14,16 @@ class RiskManager:
         self.atr_multiplier = config['risk']['atr_buffer_multiplier']
         self.atr_col = f"ATRr_{config['indicators']['atr']['length']}"
 
+    def required_columns(self) -> Dict[str, Set[str]]:
+        """
+        The SL buffer reads the entry-timeframe ATR.
+        """
+        return {'entry': {self.atr_col}}
+
     def calculate_sl_tp(self, signal: Dict, entry_df: pd.DataFrame) -> Optional[Dict]:
         """
-        Calculates SL/TP and validates the risk-to-reward ratio.
+        Calculates SL/TP and validates the risk-to-reward ratio, as calculate_sl_tp_arrays does for
+        one row.
         """
         direction = signal['direction']
         entry_price = signal['entry_price']
@@ -25,36 +33,21 @@ class RiskManager:
             self.logger.warning(f"Cannot calculate SL/TP: {fib_levels['error']}")
             return None
 
-        atr_buffer = entry_df.iloc[-1][self.atr_col] * self.atr_multiplier
-        
-        if direction == 'LONG':
-            sl_price = fib_levels['low'] - atr_buffer
-            tp1 = fib_levels['retracement']['0.618']
-            tp2 = fib_levels['high'] # Target the swing high as TP2
-            if entry_price > fib_levels['high']: # Breakout case
-                tp1 = fib_levels['extension']['1.272']
-                tp2 = fib_levels['extension']['1.618']
-        else: # SHORT
-            sl_price = fib_levels['high'] + atr_buffer
-            tp1 = fib_levels['retracement']['0.618']
-            tp2 = fib_levels['low'] # Target the swing low as TP2
-            if entry_price < fib_levels['low']: # Breakdown case
-                tp1 = fib_levels['extension']['1.272']
-                tp2 = fib_levels['extension']['1.618']
+        levels = self.calculate_sl_tp_arrays(
+            np.array([1 if direction == 'LONG' else -1]), np.array([entry_price], dtype=np.float64),
+            np.array([fib_levels['high']], dtype=np.float64), np.array([fib_levels['low']], dtype=np.float64),
+            np.array([fib_levels['trend'] == 'up']), np.array([entry_df.iloc[-1][self.atr_col]], dtype=np.float64))
+        sl_price, tp1, tp2, rr_ratio = (float(levels[key][0]) for key in ('sl_price', 'tp1_price', 'tp2_price', 'rr_ratio'))
 
-        risk = abs(entry_price - sl_price)
-        reward = abs(tp1 - entry_price)
-
-        if risk == 0:
-            self.logger.warning("Risk is zero, cannot calculate R:R. Discarding signal.")
+        if not levels['valid'][0]:
+            if entry_price == sl_price:
+                self.logger.warning("Risk is zero, cannot calculate R:R. Discarding signal.")
+            elif rr_ratio != rr_ratio:
+                self.logger.warning(f"Cannot calculate SL/TP for {signal['symbol']}: ATR or swing levels are NaN.")
+            else:
+                self.logger.info(f"Signal for {signal['symbol']} discarded. R:R ({rr_ratio:.2f}) is below minimum ({self.min_rr}).")
             return None
-            
-        rr_ratio = reward / risk
 
-        if rr_ratio < self.min_rr:
-            self.logger.info(f"Signal for {signal['symbol']} discarded. R:R ({rr_ratio:.2f}) is below minimum ({self.min_rr}).")
-            return None
-        
         self.logger.info(f"Signal R:R is valid ({rr_ratio:.2f}). SL: {sl_price:.4f}, TP1: {tp1:.4f}")
 
         signal['sl_price'] = sl_price
@@ -63,3 +56,30 @@ class RiskManager:
         signal['rr_ratio'] = rr_ratio
         
         return signal
+
+    def calculate_sl_tp_arrays(self, direction: np.ndarray, entry_price: np.ndarray, fib_high: np.ndarray,
+                               fib_low: np.ndarray, trend_up: np.ndarray, atr: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Vectorized version of calculate_sl_tp. `direction` is +1 (LONG) / -1 (SHORT) per row and the
+        fib inputs are the swing high/low in effect for that row (NaN when no levels exist).
+        Returns SL/TP/R:R arrays plus a `valid` mask that applies the same rejections.
+        """
+        diff = fib_high - fib_low
+        long, short = direction == 1, direction == -1
+        atr_buffer = atr * self.atr_multiplier
+        ext_1272 = np.where(trend_up, fib_high + 0.272 * diff, fib_low - 0.272 * diff)
+        ext_1618 = np.where(trend_up, fib_high + 0.618 * diff, fib_low - 0.618 * diff)
+        retr_0618 = fib_high - 0.618 * diff
+
+        breakout = (long & (entry_price > fib_high)) | (short & (entry_price < fib_low))
+        sl_price = np.where(long, fib_low - atr_buffer, fib_high + atr_buffer)
+        tp1 = np.where(breakout, ext_1272, retr_0618)
+        tp2 = np.where(breakout, ext_1618, np.where(long, fib_high, fib_low))
+
+        risk = np.abs(entry_price - sl_price)
+        reward = np.abs(tp1 - entry_price)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rr_ratio = reward / risk
+        valid = (long | short) & (risk > 0) & (rr_ratio >= self.min_rr)
+
+        return {'sl_price': sl_price, 'tp1_price': tp1, 'tp2_price': tp2, 'rr_ratio': rr_ratio, 'valid': valid}
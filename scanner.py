@@ -0,0 +1,211 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from batch_indicators import BatchIndicatorEngine, batch_fibonacci_levels
+from data_client import AsyncDataClient
+from mtf_logic import MTFAnalyzer
+from ohlcv_store import OHLCVStore
+from streaming_indicators import StreamingIndicatorCache
+from sharded_scan import ShardedScanExecutor, scan_workers
+from metrics import METRICS
+from profiles import ProfileEvaluator, SignalRouter
+
+class MarketScanner:
+    """
+    Runs the fetch -> indicators -> evaluate -> SL/TP pipeline for many symbols concurrently.
+    Every strategy profile (profiles.py) is evaluated on the same fetched data and indicators.
+    With a signal router, symbols on cooldown in both directions for every profile are skipped before any fetch.
+    With scanner.batch_evaluate, indicators and scores are computed for all symbols at once
+    (batch_indicators.py, StrategyEvaluator.evaluate_batch) once every symbol has been fetched.
+    With scanner.workers, that compute step runs in a process pool over shared memory (sharded_scan.py).
+    """
+    def __init__(self, data_client: AsyncDataClient, config: Dict, store: Optional[OHLCVStore] = None,
+                 streaming: Optional[StreamingIndicatorCache] = None, router: Optional[SignalRouter] = None):
+        self.logger = logging.getLogger(__name__)
+        self.data_client = data_client
+        self.store = store
+        self.router = router
+        self.config = config
+        self.tfs = config['timeframes']
+        self.lookback = config['strategy']['data_lookback_bars']
+
+        scan_cfg = config.get('scanner', {})
+        self.max_concurrent_requests = scan_cfg.get('max_concurrent_requests', 20)
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        self.mtf_analyzer = MTFAnalyzer(None, config, store=store, streaming=streaming)
+        self.profiles = ProfileEvaluator(config)
+
+        self.batch_engines: Optional[Dict[str, BatchIndicatorEngine]] = None
+        if scan_cfg.get('batch_evaluate', False):
+            plan = self.mtf_analyzer.plan
+            self.batch_engines = {tf: BatchIndicatorEngine(config, plan.columns(tf) if plan is not None else None)
+                                  for tf in dict.fromkeys(self.tfs.values())}
+
+        workers = scan_workers(config)
+        self.sharded: Optional[ShardedScanExecutor] = None
+        if workers:
+            self.sharded = ShardedScanExecutor(config, workers, self.mtf_analyzer.base_tf)
+
+    async def resolve_symbols(self, symbols: Optional[List[str]], top_n: Optional[int]) -> List[str]:
+        """
+        Returns the explicit symbol list, or the top N markets by volume when no list is given.
+        """
+        if symbols:
+            return symbols
+        quote = self.config.get('scanner', {}).get('top_n_quote', 'USDT')
+        return await self.data_client.fetch_top_symbols(top_n, quote=quote)
+
+    async def _fetch(self, symbol: str, timeframe: str):
+        async with self._semaphore:
+            with METRICS.stage('fetch', timeframe=timeframe):
+                if self.store is not None:
+                    return await self.store.update_async(self.data_client, symbol, timeframe)
+                return await self.data_client.fetch_ohlcv(symbol, timeframe, self.lookback)
+
+    async def fetch_raw(self, symbol: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Fetches the timeframes of one symbol concurrently: all of them, or only the base timeframe.
+        """
+        base_tf = self.mtf_analyzer.base_tf
+        tfs = [base_tf] if base_tf else list(dict.fromkeys(self.tfs.values()))
+        results = await asyncio.gather(*(self._fetch(symbol, tf) for tf in tfs))
+        if any(df is None for df in results):
+            self.logger.warning(f"Skipping {symbol}: at least one timeframe could not be fetched.")
+            return None
+        return dict(zip(tfs, results))
+
+    async def fetch_frames(self, symbol: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Fetches all timeframes of one symbol concurrently (or the base timeframe, resampled).
+        """
+        raw = await self.fetch_raw(symbol)
+        if raw is None or not self.mtf_analyzer.base_tf:
+            return raw
+        return self.mtf_analyzer.derive(raw[self.mtf_analyzer.base_tf])
+
+    async def scan_symbol(self, symbol: str) -> List[Dict]:
+        """
+        Fetches all timeframes of one symbol and returns its final signals (one per profile at most).
+        """
+        frames = await self.fetch_frames(symbol)
+        if frames is None:
+            return []
+        return self.evaluate_symbol(symbol, frames)
+
+    def evaluate_symbol(self, symbol: str, frames: Dict[str, pd.DataFrame]) -> List[Dict]:
+        """
+        Indicators, score and SL/TP for one symbol's fetched frames.
+        """
+        try:
+            analysis = self.mtf_analyzer.analyze_frames(symbol, frames)
+            if not analysis.get('is_valid', False):
+                return []
+            return self.profiles.evaluate(analysis, analysis['data'][self.tfs['entry']])
+        except Exception as e:
+            self.logger.error(f"Pipeline failed for {symbol}: {e}", exc_info=True)
+            return []
+
+    async def scan_batch(self, symbols: List[str]) -> List[Dict]:
+        """
+        Fetches every symbol, then computes indicators per timeframe for all of them in one batch pass
+        and scores them with evaluate_batch. Only symbols whose score passes go through SL/TP.
+        """
+        fetched = await asyncio.gather(*(self.fetch_frames(s) for s in symbols))
+        return self.evaluate_batch({s: f for s, f in zip(symbols, fetched) if f is not None})
+
+    def evaluate_batch(self, frames: Mapping[str, Mapping[str, pd.DataFrame]],
+                       stacked: Optional[Dict[str, Dict[str, np.ndarray]]] = None) -> List[Dict]:
+        """
+        Batch indicators, evaluate_batch scoring and SL/TP for {symbol: frames} fetched earlier.
+        `stacked` ({timeframe: stack_frames layout}, rows in the order of `frames`, every symbol with
+        at least 3 bars) skips stacking the frames; only the entry frames of signalling symbols are read.
+        """
+        if stacked is None:
+            frames = {s: f for s, f in frames.items() if all(len(df) >= 3 for df in f.values())}
+        if not frames:
+            return []
+
+        try:
+            results = {}
+            for tf, engine in self.batch_engines.items():
+                with METRICS.stage('indicators', timeframe=tf):
+                    if stacked is not None:
+                        results[tf] = engine.compute_stacked(stacked[tf])
+                    else:
+                        results[tf] = engine.compute({s: f[tf] for s, f in frames.items()})
+            latest = {tf: BatchIndicatorEngine.latest(res) for tf, res in results.items()}
+            entry_tf, bias_tf = self.tfs['entry'], self.tfs['bias']
+            entry = results[entry_tf]
+
+            with METRICS.stage('evaluate'):
+                batch = {
+                    'symbols': list(frames), 'bias': self.mtf_analyzer.bias_array(latest[bias_tf]),
+                    'latest_candles': latest, 'prev_entry': BatchIndicatorEngine.latest(entry, 3),
+                    'current_price': entry['close'][:, -1], 'fib_levels_8h': batch_fibonacci_levels(results[bias_tf]),
+                }
+                trade_signals = self.profiles.strategy_evaluator.evaluate_batch(batch)
+        except Exception as e:
+            self.logger.error(f"Batch pipeline failed: {e}", exc_info=True)
+            return []
+
+        rows = {symbol: row for row, symbol in enumerate(frames)}
+        signals = []
+        for trade_signal in trade_signals:
+            METRICS.record_signal('evaluate')
+            symbol, row = trade_signal['symbol'], rows[trade_signal['symbol']]
+            entry_df = BatchIndicatorEngine.to_frames({symbol: frames[symbol][entry_tf]},
+                                                      {col: values[row:row + 1] for col, values in entry.items()})[symbol]
+            signals.extend(self.profiles.finalize(trade_signal, entry_df))
+        return signals
+
+    def evaluate_frames(self, frames: Dict[str, Dict[str, pd.DataFrame]]) -> List[Dict]:
+        """
+        The CPU-bound part of a scan for already fetched {symbol: frames}, batched or per symbol.
+        Sharded scans run this in the worker processes.
+        """
+        if self.batch_engines is not None:
+            return self.evaluate_batch(frames)
+        return [signal for s, f in frames.items() for signal in self.evaluate_symbol(s, f)]
+
+    async def scan_sharded(self, symbols: List[str]) -> List[Dict]:
+        """
+        Fetches every symbol in this process, then evaluates them across the worker pool.
+        """
+        fetched = await asyncio.gather(*(self.fetch_raw(s) for s in symbols))
+        frames = {s: f for s, f in zip(symbols, fetched) if f is not None}
+        try:
+            with METRICS.stage('sharded_evaluate'):
+                return await self.sharded.evaluate(frames)
+        except Exception as e:
+            self.logger.error(f"Sharded pipeline failed: {e}", exc_info=True)
+            return []
+
+    async def scan(self, symbols: List[str]) -> Dict:
+        """
+        Scans all symbols and returns the signals along with the wall-clock duration of the cycle.
+        """
+        started = time.perf_counter()
+        skipped = {s for s in symbols if self.router is not None and self.router.is_fully_on_cooldown(s)}
+        active = [s for s in symbols if s not in skipped]
+        if self.sharded is not None:
+            signals = await self.scan_sharded(active)
+        elif self.batch_engines is not None:
+            signals = await self.scan_batch(active)
+        else:
+            signals = [signal for r in await asyncio.gather(*(self.scan_symbol(s) for s in active)) for signal in r]
+        elapsed = time.perf_counter() - started
+
+        self.logger.info(f"Scanned {len(active)} symbols in {elapsed:.2f}s "
+                         f"({len(signals)} signal(s), {len(skipped)} skipped on cooldown, entry TF {self.tfs['entry']}).")
+        return {'symbols': len(active), 'skipped_on_cooldown': len(skipped), 'signals': signals,
+                'elapsed_seconds': elapsed}
+
+    def close(self):
+        if self.sharded is not None:
+            self.sharded.close()
@@ -0,0 +1,196 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set
+
+import ccxt
+
+# fetch_ohlcv weight by limit: [max limit (exclusive), weight]; None means any larger limit (Binance)
+DEFAULT_OHLCV_WEIGHTS = [[100, 1], [500, 2], [1000, 5], [None, 10]]
+
+def ohlcv_request_weight(limit: int, weights=DEFAULT_OHLCV_WEIGHTS) -> int:
+    for max_limit, weight in weights:
+        if max_limit is None or limit < max_limit:
+            return weight
+    return weights[-1][1]
+
+class TokenBucket:
+    """
+    Weight budget refilled continuously at `rate` units per second, up to `capacity`.
+    """
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, weight: float) -> float:
+        """
+        Seconds until `weight` tokens are available (0 if they are available now).
+        """
+        self._refill()
+        return 0.0 if self.tokens >= weight else (weight - self.tokens) / self.rate
+
+    def consume(self, weight: float):
+        self._refill()
+        self.tokens -= weight
+
+
+class RequestScheduler:
+    """
+    Central scheduler for exchange requests.
+
+    Requests wait in a priority queue (entry timeframe first, bias timeframe last) and are released
+    against a token bucket sized to the exchange's weight budget. Right after each entry-bar
+    boundary the scheduler holds requests for `boundary_delay_seconds`, so closed candles are final,
+    and then releases them at most every `min_interval_seconds` instead of as one burst. Identical
+    requests that are already queued or in flight share one exchange call.
+    """
+    def __init__(self, config: Dict):
+        self.logger = logging.getLogger(__name__)
+        sched = config.get('scheduler', {})
+        weight_per_minute = sched.get('weight_per_minute', 1200)
+        self.bucket = TokenBucket(sched.get('burst_weight', weight_per_minute / 4), weight_per_minute / 60.0)
+        self.boundary_delay = sched.get('boundary_delay_seconds', 1.0)
+        self.min_interval = sched.get('min_interval_seconds', 0.02)
+        self.ohlcv_weights = sched.get('ohlcv_weights', DEFAULT_OHLCV_WEIGHTS)
+        self.tickers_weight = sched.get('tickers_weight', 40)
+
+        tfs = config['timeframes']
+        self.bar_ms = ccxt.Exchange.parse_timeframe(tfs['entry']) * 1000
+        order = ('entry', 'pattern', 'confirmation', 'bias')
+        self._priorities = {}
+        for rank, role in enumerate(order):
+            self._priorities.setdefault(tfs[role], rank)
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self._last_dispatch = 0.0
+        self._weight_log = deque()
+
+        self.requests = 0
+        self.coalesced = 0
+        self.total_wait = 0.0
+
+    def priority_for(self, timeframe: str) -> int:
+        return self._priorities.get(timeframe, 0)
+
+    def ohlcv_weight(self, limit: int) -> int:
+        return ohlcv_request_weight(limit, self.ohlcv_weights)
+
+    async def submit(self, key: Hashable, weight: float, priority: int,
+                     factory: Callable[[], Awaitable]):
+        """
+        Queues `factory()` and returns its result. A request whose key is already queued or in
+        flight awaits the existing call instead of issuing a new one.
+        """
+        existing = self._inflight.get(key)
+        if existing is not None:
+            self.coalesced += 1
+            return await asyncio.shield(existing)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        heapq.heappush(self._queue, (priority, next(self._seq), time.monotonic(), key, weight, factory))
+
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return await asyncio.shield(future)
+
+    def _boundary_hold(self) -> float:
+        """
+        Seconds to wait if we are inside the settle window just after an entry-bar boundary.
+        """
+        since_boundary = (time.time() * 1000) % self.bar_ms / 1000
+        return max(0.0, self.boundary_delay - since_boundary)
+
+    async def _dispatch(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            _, _, _, _, weight, _ = self._queue[0]
+            delay = max(self._boundary_hold(), self.bucket.wait_time(weight),
+                        self._last_dispatch + self.min_interval - time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, queued_at, key, weight, factory = heapq.heappop(self._queue)
+            self.bucket.consume(weight)
+            now = time.monotonic()
+            self._last_dispatch = now
+            self._weight_log.append((now, weight))
+            self.requests += 1
+            self.total_wait += now - queued_at
+            task = asyncio.create_task(self._run(key, factory))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, key: Hashable, factory: Callable[[], Awaitable]):
+        future = self._inflight[key]
+        try:
+            result = await factory()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        except BaseException:
+            # Cancelled (e.g. by close()): coalesced callers await the shared future, so settle it
+            if not future.done():
+                future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def close(self):
+        """
+        Stops the dispatcher and cancels the requests still queued or in flight.
+        """
+        tasks = [task for task in (self._dispatcher, *self._running) if task is not None and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+
+        for _, _, _, key, _, _ in self._queue:
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.cancel()
+        self._queue.clear()
+
+    def stats(self) -> Dict:
+        """
+        Queue depth, in-flight count and the weight used over the last minute.
+        """
+        cutoff = time.monotonic() - 60
+        while self._weight_log and self._weight_log[0][0] < cutoff:
+            self._weight_log.popleft()
+        return {
+            'queue_depth': len(self._queue),
+            'in_flight': len(self._inflight) - len(self._queue),
+            'weight_last_minute': sum(w for _, w in self._weight_log),
+            'weight_budget_per_minute': self.bucket.rate * 60,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'avg_queue_wait_ms': 1000 * self.total_wait / self.requests if self.requests else 0.0,
+        }
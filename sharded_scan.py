@@ -0,0 +1,230 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ohlcv_store import PRICE_COLUMNS
+from utils import setup_logging
+
+# (shared memory name, rows, width) -- everything a worker needs to attach to a block
+BlockSpec = Tuple[str, int, int]
+
+class SharedOHLCVBlock:
+    """
+    OHLCV of many symbols for one timeframe in a single shared memory segment: per row a right-aligned
+    window of `width` bars (int64 ms timestamps, float64 OHLCV) and the number of valid bars. The main
+    process writes fetched frames into it; pool workers attach by name and read the rows of their
+    shard as zero-copy views, so no DataFrame is pickled between processes.
+    """
+    def __init__(self, rows: int, width: int, name: Optional[str] = None):
+        self.rows, self.width = rows, width
+        size = rows * width * 8 * (1 + len(PRICE_COLUMNS)) + rows * 8
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.owner = name is None
+        buf = self.shm.buf
+        self.ts = np.ndarray((rows, width), dtype=np.int64, buffer=buf)
+        offset = self.ts.nbytes
+        self.values = np.ndarray((rows, width, len(PRICE_COLUMNS)), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.values.nbytes
+        self.lengths = np.ndarray((rows,), dtype=np.int64, buffer=buf, offset=offset)
+
+    @classmethod
+    def attach(cls, spec: BlockSpec) -> 'SharedOHLCVBlock':
+        # Pool workers share the creating process's resource tracker, so attaching only repeats a
+        # registration it already holds; the segment is unlinked by the owner alone.
+        return cls(spec[1], spec[2], name=spec[0])
+
+    @property
+    def spec(self) -> BlockSpec:
+        return self.shm.name, self.rows, self.width
+
+    def write(self, row: int, df: pd.DataFrame):
+        n = min(len(df), self.width)
+        self.lengths[row] = n
+        self.ts[row, :self.width - n] = 0
+        self.values[row, :self.width - n] = np.nan
+        if not n:
+            return
+        self.ts[row, self.width - n:] = df.index.values[-n:].astype('datetime64[ms]').astype(np.int64)
+        # OHLCVStore frames are one float64 block in this column order, so this is a plain view
+        values = df if list(df.columns) == PRICE_COLUMNS else df[PRICE_COLUMNS]
+        self.values[row, self.width - n:] = values.to_numpy(dtype=np.float64)[-n:]
+
+    def frame(self, row: int) -> pd.DataFrame:
+        """
+        Row `row` as a DataFrame (same layout as OHLCVBuffer.frame) sharing memory with the block.
+        """
+        n = int(self.lengths[row])
+        index = pd.DatetimeIndex(pd.to_datetime(self.ts[row, self.width - n:], unit='ms'), name='timestamp')
+        return pd.DataFrame(self.values[row, self.width - n:], index=index, columns=PRICE_COLUMNS, copy=False)
+
+    def stacked(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        The given rows in stack_frames layout (NaN left padding), for BatchIndicatorEngine.compute_stacked.
+        """
+        values = self.values[rows]
+        return {col: values[:, :, i] for i, col in enumerate(PRICE_COLUMNS)}
+
+    def close(self):
+        # Drop the views first; SharedMemory.close() fails while numpy still exports the buffer
+        self.ts = self.values = self.lengths = None
+        self.shm.close()
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+
+class _BlockFrames(Mapping):
+    """
+    {timeframe: frame} of one block row, built on first access; batch scoring only reads the entry
+    frame of symbols that signal.
+    """
+    def __init__(self, blocks: Dict[str, SharedOHLCVBlock], row: int):
+        self.blocks, self.row = blocks, row
+
+    def __getitem__(self, timeframe: str) -> pd.DataFrame:
+        return self.blocks[timeframe].frame(self.row)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+
+_WORKER_SCANNER = None
+_WORKER_BLOCKS: Dict[str, SharedOHLCVBlock] = {}
+
+def _init_worker(config: Dict, base_tf: Optional[str]):
+    global _WORKER_SCANNER
+    from scanner import MarketScanner
+
+    setup_logging()
+    # Workers evaluate in-process; only the main process fans out
+    _WORKER_SCANNER = MarketScanner(None, {**config, 'scanner': {**config.get('scanner', {}), 'workers': 0}})
+    # Workers have no store of their own; derive whenever the main process fetches only the base timeframe
+    _WORKER_SCANNER.mtf_analyzer.base_tf = base_tf
+
+def _worker_block(timeframe: str, spec: BlockSpec) -> SharedOHLCVBlock:
+    block = _WORKER_BLOCKS.get(timeframe)
+    if block is None or block.spec != spec:
+        # The main process replaces a block when it grows; let go of the old one
+        if block is not None:
+            block.close()
+        block = _WORKER_BLOCKS[timeframe] = SharedOHLCVBlock.attach(spec)
+    return block
+
+def _scan_shard(specs: Dict[str, BlockSpec], symbols: List[str], start: int) -> List[Dict]:
+    """
+    Worker entry point: rebuilds the frames of rows start..start+len(symbols) from the shared blocks
+    and runs MarketScanner.evaluate_frames on them.
+    """
+    scanner = _WORKER_SCANNER
+    blocks = {tf: _worker_block(tf, spec) for tf, spec in specs.items()}
+    base_tf = scanner.mtf_analyzer.base_tf
+    if base_tf:
+        frames = {symbol: scanner.mtf_analyzer.derive(blocks[base_tf].frame(row))
+                  for row, symbol in enumerate(symbols, start)}
+        return scanner.evaluate_frames(frames)
+    if scanner.batch_engines is None:
+        return scanner.evaluate_frames({symbol: dict(_BlockFrames(blocks, row))
+                                        for row, symbol in enumerate(symbols, start)})
+
+    # Batch scoring reads the shared rows directly; no per-symbol DataFrames are built
+    rows = np.arange(start, start + len(symbols))
+    rows = rows[np.all([block.lengths[rows] >= 3 for block in blocks.values()], axis=0)]
+    frames = {symbols[row - start]: _BlockFrames(blocks, row) for row in rows}
+    return scanner.evaluate_batch(frames, {tf: block.stacked(rows) for tf, block in blocks.items()})
+
+
+class ShardedScanExecutor:
+    """
+    Process pool that evaluates fetched symbols in contiguous shards. Fetched frames are copied once
+    into one SharedOHLCVBlock per timeframe (reused across scans, replaced when they grow); each task
+    only carries block names, a row range and the shard's symbols. Signals come back to the calling
+    process, which stays the single owner of the outbox and the signal journal.
+    """
+    def __init__(self, config: Dict, workers: int, base_tf: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.workers = workers
+        self.base_tf = base_tf
+        self.shards_per_worker = config.get('scanner', {}).get('shards_per_worker', 2)
+        self.blocks: Dict[str, SharedOHLCVBlock] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _block(self, timeframe: str, rows: int, width: int) -> SharedOHLCVBlock:
+        block = self.blocks.get(timeframe)
+        if block is None or block.rows < rows or block.width < width:
+            if block is not None:
+                block.close()
+                block.unlink()
+            # Head room so a slowly growing universe does not reallocate every scan
+            block = self.blocks[timeframe] = SharedOHLCVBlock(max(rows, int(rows * 1.25)), width)
+        return block
+
+    def _write(self, frames: Dict[str, Dict[str, pd.DataFrame]]) -> Dict[str, BlockSpec]:
+        timeframes = next(iter(frames.values())).keys()
+        specs = {}
+        for tf in timeframes:
+            width = max(len(f[tf]) for f in frames.values())
+            block = self._block(tf, len(frames), width)
+            for row, f in enumerate(frames.values()):
+                block.write(row, f[tf])
+            specs[tf] = block.spec
+        return specs
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Created after the first block, so the resource tracker is already running and workers share it
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.config, self.base_tf))
+            self.logger.info(f"Started {self.workers} scan worker processes.")
+        return self._pool
+
+    async def evaluate(self, frames: Dict[str, Dict[str, pd.DataFrame]]) -> List[Dict]:
+        """
+        Evaluates {symbol: {timeframe: raw frame}} across the pool and returns the signals in symbol order.
+        """
+        if not frames:
+            return []
+        specs = self._write(frames)
+        pool = self._ensure_pool()
+        symbols = list(frames)
+        shards = max(1, min(len(symbols), self.workers * self.shards_per_worker))
+        bounds = np.linspace(0, len(symbols), shards + 1).astype(int)
+        futures = [asyncio.wrap_future(pool.submit(_scan_shard, specs, symbols[lo:hi], int(lo)))
+                   for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+        signals = []
+        for shard in await asyncio.gather(*futures):
+            signals.extend(shard)
+        return signals
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+def scan_workers(config: Dict) -> int:
+    """
+    Number of scan worker processes from scanner.workers (0 = evaluate in-process, 'auto' = one per core).
+    """
+    workers = config.get('scanner', {}).get('workers', 0)
+    if workers == 'auto':
+        workers = os.cpu_count() or 1
+    return int(workers or 0)
@@ -0,0 +1,105 @@
+import json
+import time
+import sqlite3
+import logging
+from typing import Dict, List, Optional, Tuple
+
+DIRECTIONS = ('LONG', 'SHORT')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    emitted_at REAL NOT NULL,
+    score REAL,
+    entry_price REAL,
+    sl_price REAL,
+    tp1_price REAL,
+    tp2_price REAL,
+    rr_ratio REAL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_signals_symbol_direction_time ON signals (symbol, direction, emitted_at);
+CREATE TABLE IF NOT EXISTS cooldowns (
+    symbol TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    last_signal_at REAL NOT NULL,
+    PRIMARY KEY (symbol, direction)
+) WITHOUT ROWID;
+"""
+
+class SignalJournal:
+    """
+    Persistent cooldown state and a journal of every emitted signal, kept in SQLite.
+
+    The cooldown table is mirrored in a dict at start-up, so cooldown checks are a dict lookup no
+    matter how many pairs are tracked; writes go to both in one step.
+    """
+    def __init__(self, config: Dict, path: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        strategy_cfg = config.get('strategy', {})
+        self.cooldown_seconds = strategy_cfg.get('signal_cooldown_hours', 3) * 3600
+        self.path = path or strategy_cfg.get('journal_file', 'signal_journal.db')
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self._last_signal: Dict[Tuple[str, str], float] = {
+            (symbol, direction): at
+            for symbol, direction, at in self.conn.execute("SELECT symbol, direction, last_signal_at FROM cooldowns")
+        }
+        self.logger.info(f"Signal journal {self.path} loaded with {len(self._last_signal)} cooldown entries.")
+
+    def is_cooldown_active(self, symbol: str, direction: str, now: Optional[float] = None) -> bool:
+        last = self._last_signal.get((symbol, direction))
+        if last is None:
+            return False
+        return (now if now is not None else time.time()) < last + self.cooldown_seconds
+
+    def is_fully_on_cooldown(self, symbol: str, now: Optional[float] = None) -> bool:
+        """
+        True when both directions are on cooldown, i.e. no signal for the symbol could be sent.
+        """
+        now = now if now is not None else time.time()
+        return all(self.is_cooldown_active(symbol, d, now) for d in DIRECTIONS)
+
+    def record_signal(self, signal: Dict, now: Optional[float] = None):
+        """
+        Journals an emitted signal and starts its cooldown.
+        """
+        now = now if now is not None else time.time()
+        symbol, direction = signal['symbol'], signal['direction']
+        payload = json.dumps(signal, default=str)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO signals (symbol, direction, emitted_at, score, entry_price, sl_price, tp1_price, "
+                "tp2_price, rr_ratio, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (symbol, direction, now, signal.get('score'), signal.get('entry_price'), signal.get('sl_price'),
+                 signal.get('tp1_price'), signal.get('tp2_price'), signal.get('rr_ratio'), payload))
+            self.conn.execute(
+                "INSERT INTO cooldowns (symbol, direction, last_signal_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (symbol, direction) DO UPDATE SET last_signal_at = excluded.last_signal_at",
+                (symbol, direction, now))
+        self._last_signal[(symbol, direction)] = now
+        self.logger.info(f"Cooldown timer started for {symbol}_{direction}.")
+
+    def signals(self, symbol: Optional[str] = None, since: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """
+        Most recent journaled signals, newest first.
+        """
+        query, args = "SELECT payload, emitted_at FROM signals WHERE 1=1", []
+        if symbol is not None:
+            query += " AND symbol = ?"
+            args.append(symbol)
+        if since is not None:
+            query += " AND emitted_at >= ?"
+            args.append(since)
+        query += " ORDER BY emitted_at DESC LIMIT ?"
+        args.append(limit)
+        return [dict(json.loads(payload), emitted_at=at) for payload, at in self.conn.execute(query, args)]
+
+    def close(self):
+        self.conn.close()
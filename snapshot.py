@@ -0,0 +1,68 @@
+import os
+import gzip
+import json
+import pickle
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from ohlcv_store import OHLCVStore
+from streaming_indicators import StreamingIndicatorCache
+from swing_index import SwingIndexCache
+
+SNAPSHOT_VERSION = 1
+
+def state_fingerprint(config: Dict) -> str:
+    """
+    Hash of the settings the saved state depends on; a snapshot taken under other settings is ignored.
+    """
+    relevant = {'timeframes': config['timeframes'], 'indicators': config['indicators'],
+                'data': config.get('data', {}), 'lookback': config['strategy']['data_lookback_bars'],
+                'exchange': [config['exchange'].get('id'), config['exchange'].get('market_type')]}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def save_snapshot(path: str, config: Dict, store: Optional[OHLCVStore], streaming: Optional[StreamingIndicatorCache],
+                  swings: Optional[SwingIndexCache]):
+    """
+    Writes the OHLCV buffers, streaming indicator engines and swing indexes to a gzipped pickle, so the
+    next one-shot run continues from them instead of refetching the full lookback.
+    """
+    state = {'version': SNAPSHOT_VERSION, 'fingerprint': state_fingerprint(config),
+             'store': store.state() if store is not None else {},
+             'streaming': streaming.state() if streaming is not None else {},
+             'swings': swings.state() if swings is not None else {}}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, 'wb', compresslevel=3) as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str, config: Dict, store: Optional[OHLCVStore], streaming: Optional[StreamingIndicatorCache],
+                  swings: Optional[SwingIndexCache]) -> bool:
+    """
+    Restores state written by save_snapshot. Returns False (leaving everything empty) when there is no
+    usable snapshot. Only load snapshots this bot wrote itself: they are pickles.
+    """
+    logger = logging.getLogger(__name__)
+    if not os.path.exists(path):
+        return False
+    try:
+        with gzip.open(path, 'rb') as f:
+            state = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return False
+    if state.get('version') != SNAPSHOT_VERSION or state.get('fingerprint') != state_fingerprint(config):
+        logger.info(f"Snapshot {path} was taken with other settings; starting from scratch.")
+        return False
+
+    if store is not None:
+        store.load_state(state['store'])
+    if streaming is not None:
+        streaming.load_state(state['streaming'])
+    if swings is not None:
+        swings.load_state(state['swings'])
+    logger.info(f"Restored {len(state['store'])} OHLCV buffers and {len(state['streaming'])} indicator engines "
+                f"from {path}.")
+    return True
@@ -1,5 +1,6 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set
+import numpy as np
 import pandas as pd
 
 class StrategyEvaluator:
@@ -25,77 +26,128 @@ class StrategyEvaluator:
             'stoch_d': f"STOCHd_{p['stochastic']['k']}_{p['stochastic']['d']}_{p['stochastic']['smooth_k']}",
         }
 
+    def required_columns(self) -> Dict[str, Set[str]]:
+        """
+        Columns the scoring rules read, per timeframe role (see indicator_plan.IndicatorPlan).
+        """
+        cols = self._get_col_names()
+        return {
+            'bias': {'close', cols['ema_fast'], cols['ema_slow'], cols['smma']},
+            'confirmation': {'open', 'high', 'low', 'close', cols['macd'], cols['macds']},
+            'pattern': {'open', 'close'},
+            'entry': {cols['stoch_k'], cols['stoch_d'], cols['macd'], cols['macds']},
+        }
+
     def evaluate(self, analysis: Dict) -> Optional[Dict]:
         """
-        Main evaluation function.
+        Main evaluation function. Scores the analysis as a single row of rule_arrays, so live
+        scoring, the batch scan and the backtest all run the same rules.
         """
         bias = analysis['bias_8h']
         if bias == 'NEUTRAL':
             self.logger.info("Evaluation skipped: 8H bias is NEUTRAL.")
             return None
 
-        score = 0.0
-        confluence_points = []
-        cols = self._get_col_names()
-        latest = analysis['latest_candles']
-        
-        # 1. Score 8H Bias (Max 4 points)
-        bias_8h_data = latest[self.tfs['bias']]
-        if bias == 'BULLISH':
-            score += 2.0; confluence_points.append("8H Bias: Bullish")
-            if bias_8h_data[cols['ema_fast']] > bias_8h_data[cols['ema_slow']]:
-                score += 1.0; confluence_points.append("8H EMA 50/200: Golden")
-            if bias_8h_data['close'] > bias_8h_data[cols['smma']]:
-                score += 1.0; confluence_points.append("8H Price > SMMA28")
-        elif bias == 'BEARISH':
-            score += 2.0; confluence_points.append("8H Bias: Bearish")
-            if bias_8h_data[cols['ema_fast']] < bias_8h_data[cols['ema_slow']]:
-                score += 1.0; confluence_points.append("8H EMA 50/200: Death")
-            if bias_8h_data['close'] < bias_8h_data[cols['smma']]:
-                score += 1.0; confluence_points.append("8H Price < SMMA28")
-
-        # 2. Score 4H Confirmation (Max 3 points)
-        conf_4h_data = latest[self.tfs['confirmation']]
-        if bias == 'BULLISH' and (conf_4h_data['close'] - conf_4h_data['low']) > 0.6 * (conf_4h_data['high'] - conf_4h_data['low']):
-            score += 2.0; confluence_points.append("4H Rejection: Bullish Wick")
-        elif bias == 'BEARISH' and (conf_4h_data['high'] - conf_4h_data['close']) > 0.6 * (conf_4h_data['high'] - conf_4h_data['low']):
-            score += 2.0; confluence_points.append("4H Rejection: Bearish Wick")
-        
-        if bias == 'BULLISH' and conf_4h_data[cols['macd']] > conf_4h_data[cols['macds']]:
-            score += 1.0; confluence_points.append("4H MACD: Bullish")
-        elif bias == 'BEARISH' and conf_4h_data[cols['macd']] < conf_4h_data[cols['macds']]:
-            score += 1.0; confluence_points.append("4H MACD: Bearish")
-            
-        # 3. Score 1H Pattern (Max 1 point) - Simplified
-        pattern_1h_data = latest[self.tfs['pattern']]
-        if (bias == 'BULLISH' and pattern_1h_data['close'] > pattern_1h_data['open']) or \
-           (bias == 'BEARISH' and pattern_1h_data['close'] < pattern_1h_data['open']):
-             score += 1.0; confluence_points.append(f"1H Pattern: {bias.title()} Candle")
-
-        # 4. Score 15m Entry Trigger (Max 2 points)
-        entry_15m_data = latest[self.tfs['entry']]
-        prev_15m_data = analysis['data'][self.tfs['entry']].iloc[-3]
-        
-        is_bull_trigger = (entry_15m_data[cols['stoch_k']] > entry_15m_data[cols['stoch_d']] and
-                           prev_15m_data[cols['stoch_k']] <= prev_15m_data[cols['stoch_d']] and
-                           entry_15m_data[cols['macd']] > entry_15m_data[cols['macds']])
-                           
-        is_bear_trigger = (entry_15m_data[cols['stoch_k']] < entry_15m_data[cols['stoch_d']] and
-                           prev_15m_data[cols['stoch_k']] >= prev_15m_data[cols['stoch_d']] and
-                           entry_15m_data[cols['macd']] < entry_15m_data[cols['macds']])
-
-        if (bias == 'BULLISH' and is_bull_trigger) or (bias == 'BEARISH' and is_bear_trigger):
-            score += 2.0; confluence_points.append(f"15m Trigger: Stoch & MACD {bias.title()} Cross")
+        latest = {tf: self._row(candle) for tf, candle in analysis['latest_candles'].items()}
+        prev_entry = self._row(analysis['data'][self.tfs['entry']].iloc[-3])
+        rules = self.rule_arrays(np.array([1 if bias == 'BULLISH' else -1]), latest, prev_entry)
+        score = float(self._total(rules, 1)[0])
 
         self.logger.info(f"Final confluence score for {analysis['symbol']} ({bias}): {score:.2f}/10")
 
         if score >= self.min_score:
-            direction = "LONG" if bias == "BULLISH" else "SHORT"
-            self.logger.info(f"Score threshold met! Generating {direction} signal.")
-            return {
-                'symbol': analysis['symbol'], 'direction': direction,
-                'entry_price': analysis['current_price'], 'score': score,
-                'confluence_points': confluence_points, 'fib_levels': analysis['fib_levels_8h'],
-                'timestamp': pd.Timestamp.now(tz=self.config['telegram']['timezone'])
-            }
+            self.logger.info(f"Score threshold met! Generating {'LONG' if bias == 'BULLISH' else 'SHORT'} signal.")
+            return self._signal(analysis['symbol'], bias == 'BULLISH', analysis['current_price'], score,
+                                rules, 0, analysis['fib_levels_8h'],
+                                pd.Timestamp.now(tz=self.config['telegram']['timezone']))
         return None
+
+    @staticmethod
+    def _row(candle: pd.Series) -> Dict[str, np.ndarray]:
+        return {col: np.array([value]) for col, value in candle.items()}
+
+    def _signal(self, symbol: str, bullish: bool, entry_price: float, score: float, rules: Dict[str, np.ndarray],
+                row: int, fib_levels: Dict, now: pd.Timestamp) -> Dict:
+        """
+        Signal dict for one row of rule_arrays; the confluence text lists the rules that hold, in RULES order.
+        """
+        return {
+            'symbol': symbol, 'direction': "LONG" if bullish else "SHORT",
+            'entry_price': float(entry_price), 'score': score,
+            'confluence_points': [bull_text if bullish else bear_text
+                                  for name, _, bull_text, bear_text in self.RULES if rules[name][row]],
+            'fib_levels': fib_levels, 'timestamp': now,
+        }
+
+    # Confluence rules as (name, points, bullish text, bearish text); rule_arrays defines each one
+    RULES = (
+        ('bias', 2.0, "8H Bias: Bullish", "8H Bias: Bearish"),
+        ('ema', 1.0, "8H EMA 50/200: Golden", "8H EMA 50/200: Death"),
+        ('smma', 1.0, "8H Price > SMMA28", "8H Price < SMMA28"),
+        ('wick', 2.0, "4H Rejection: Bullish Wick", "4H Rejection: Bearish Wick"),
+        ('macd', 1.0, "4H MACD: Bullish", "4H MACD: Bearish"),
+        ('pattern', 1.0, "1H Pattern: Bullish Candle", "1H Pattern: Bearish Candle"),
+        ('trigger', 2.0, "15m Trigger: Stoch & MACD Bullish Cross", "15m Trigger: Stoch & MACD Bearish Cross"),
+    )
+
+    def rule_arrays(self, bias: np.ndarray, latest: Dict[str, Dict[str, np.ndarray]],
+                    prev_entry: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        The scoring rules: for each rule in RULES, whether it holds per row in the direction of that
+        row's bias. evaluate(), evaluate_batch() and the backtester all score through this.
+        `bias` holds +1 (BULLISH), -1 (BEARISH) or 0 (NEUTRAL) per row, `latest[tf][col]` holds the
+        latest closed candle values per row and `prev_entry[col]` the entry candle before it.
+        """
+        cols = self._get_col_names()
+        bull, bear = bias == 1, bias == -1
+        b8, c4, p1, e15 = (latest[self.tfs[k]] for k in ('bias', 'confirmation', 'pattern', 'entry'))
+        rng_4h = c4['high'] - c4['low']
+        k, d = cols['stoch_k'], cols['stoch_d']
+        bull_trigger = ((e15[k] > e15[d]) & (prev_entry[k] <= prev_entry[d]) &
+                        (e15[cols['macd']] > e15[cols['macds']]))
+        bear_trigger = ((e15[k] < e15[d]) & (prev_entry[k] >= prev_entry[d]) &
+                        (e15[cols['macd']] < e15[cols['macds']]))
+        return {
+            'bias': bull | bear,
+            'ema': (bull & (b8[cols['ema_fast']] > b8[cols['ema_slow']])) |
+                   (bear & (b8[cols['ema_fast']] < b8[cols['ema_slow']])),
+            'smma': (bull & (b8['close'] > b8[cols['smma']])) | (bear & (b8['close'] < b8[cols['smma']])),
+            'wick': (bull & ((c4['close'] - c4['low']) > 0.6 * rng_4h)) |
+                    (bear & ((c4['high'] - c4['close']) > 0.6 * rng_4h)),
+            'macd': (bull & (c4[cols['macd']] > c4[cols['macds']])) | (bear & (c4[cols['macd']] < c4[cols['macds']])),
+            'pattern': (bull & (p1['close'] > p1['open'])) | (bear & (p1['close'] < p1['open'])),
+            'trigger': (bull & bull_trigger) | (bear & bear_trigger),
+        }
+
+    def score_arrays(self, bias: np.ndarray, latest: Dict[str, Dict[str, np.ndarray]],
+                     prev_entry: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Sum of the points of the rules that hold (rule_arrays), per row.
+        Returns the confluence score per row (0 where the bias is NEUTRAL).
+        """
+        return self._total(self.rule_arrays(bias, latest, prev_entry), len(bias))
+
+    def _total(self, rules: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        score = np.zeros(n)
+        for name, points, _, _ in self.RULES:
+            score += points * rules[name]
+        return score
+
+    def evaluate_batch(self, batch: Dict) -> List[Dict]:
+        """
+        evaluate() for many symbols at once. `batch` holds, one entry per row:
+        'symbols', 'bias' (+1/-1/0 as from MTFAnalyzer.bias_array), 'latest_candles' ({tf: {col: array}}),
+        'prev_entry' ({col: array}), 'current_price' (array) and 'fib_levels_8h' (list of dicts).
+        Scores are computed as vectors; signal dicts and confluence text are only built for the rows
+        that reach min_confluence_score.
+        """
+        bias = np.asarray(batch['bias'])
+        rules = self.rule_arrays(bias, batch['latest_candles'], batch['prev_entry'])
+        score = self._total(rules, len(bias))
+
+        passed = np.flatnonzero(score >= self.min_score)
+        self.logger.info(f"Batch evaluation: {len(passed)}/{len(bias)} symbols reached the score threshold "
+                         f"({int((bias == 0).sum())} with NEUTRAL bias).")
+        now = pd.Timestamp.now(tz=self.config['telegram']['timezone'])
+        return [self._signal(batch['symbols'][row], bias[row] == 1, batch['current_price'][row], float(score[row]),
+                             rules, row, batch['fib_levels_8h'][row], now) for row in passed]
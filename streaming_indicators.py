@@ -0,0 +1,343 @@
+import sys
+import logging
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+NaN = float('nan')
+
+class EMA:
+    """
+    pandas_ta EMA: seeded with the SMA of the first `length` values, then alpha = 2 / (length + 1).
+    Leading NaN inputs are skipped so it can run on series that warm up late (e.g. the MACD line).
+    """
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.value = NaN
+        self._seed_sum = 0.0
+        self._seed_count = 0
+
+    def update(self, x: float) -> float:
+        if x != x:
+            return self.value
+        if self._seed_count < self.length:
+            self._seed_sum += x
+            self._seed_count += 1
+            if self._seed_count == self.length:
+                self.value = self._seed_sum / self.length
+            return self.value
+        self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    def peek(self, x: float) -> float:
+        """
+        What update(x) would return, without changing the state.
+        """
+        if x != x:
+            return self.value
+        if self._seed_count < self.length:
+            return (self._seed_sum + x) / self.length if self._seed_count + 1 == self.length else self.value
+        return self.alpha * x + (1.0 - self.alpha) * self.value
+
+
+class SMMA:
+    """
+    Smoothed moving average: SMA seed, then (prev * (length - 1) + x) / length.
+    """
+    def __init__(self, length: int):
+        self.length = length
+        self.value = NaN
+        self._seed_sum = 0.0
+        self._seed_count = 0
+
+    def update(self, x: float) -> float:
+        if self._seed_count < self.length:
+            self._seed_sum += x
+            self._seed_count += 1
+            if self._seed_count == self.length:
+                self.value = self._seed_sum / self.length
+            return self.value
+        self.value = (self.value * (self.length - 1) + x) / self.length
+        return self.value
+
+    def peek(self, x: float) -> float:
+        if self._seed_count < self.length:
+            return (self._seed_sum + x) / self.length if self._seed_count + 1 == self.length else self.value
+        return (self.value * (self.length - 1) + x) / self.length
+
+
+class RMA:
+    """
+    pandas_ta RMA, i.e. Series.ewm(alpha=1/length, min_periods=length).mean() with adjust=True.
+    """
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self._num = 0.0
+        self._den = 0.0
+        self._count = 0
+
+    def update(self, x: float) -> float:
+        if x != x:
+            return self._num / self._den if self._count >= self.length else NaN
+        self._num = x + self.decay * self._num
+        self._den = 1.0 + self.decay * self._den
+        self._count += 1
+        return self._num / self._den if self._count >= self.length else NaN
+
+    def peek(self, x: float) -> float:
+        if x != x:
+            return self._num / self._den if self._count >= self.length else NaN
+        if self._count + 1 < self.length:
+            return NaN
+        return (x + self.decay * self._num) / (1.0 + self.decay * self._den)
+
+
+class SMA:
+    """
+    Rolling mean over the last `length` non-NaN inputs (NaN until the window is full).
+    """
+    def __init__(self, length: int):
+        self.length = length
+        self._window = deque(maxlen=length)
+        self._sum = 0.0
+
+    def update(self, x: float) -> float:
+        if x != x:
+            return NaN
+        if len(self._window) == self.length:
+            self._sum -= self._window[0]
+        self._window.append(x)
+        self._sum += x
+        return self._sum / self.length if len(self._window) == self.length else NaN
+
+    def peek(self, x: float) -> float:
+        if x != x:
+            return NaN
+        if len(self._window) == self.length:
+            return (self._sum - self._window[0] + x) / self.length
+        return (self._sum + x) / self.length if len(self._window) + 1 == self.length else NaN
+
+
+class MACD:
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.fast, self.slow = EMA(fast), EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        macd = self.fast.update(close) - self.slow.update(close)
+        signal = self.signal.update(macd)
+        return macd, macd - signal, signal
+
+    def peek(self, close: float) -> Tuple[float, float, float]:
+        macd = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.peek(macd)
+        return macd, macd - signal, signal
+
+
+class Stochastic:
+    """
+    pandas_ta stoch: raw %K over a `k` bar high/low window, smoothed by SMA(smooth_k), %D = SMA(d) of %K.
+    """
+    def __init__(self, k: int, d: int, smooth_k: int):
+        self._highs = deque(maxlen=k)
+        self._lows = deque(maxlen=k)
+        self.smooth_k = SMA(smooth_k)
+        self.smooth_d = SMA(d)
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        self._highs.append(high)
+        self._lows.append(low)
+        if len(self._highs) < self._highs.maxlen:
+            return NaN, NaN
+        highest, lowest = max(self._highs), min(self._lows)
+        price_range = highest - lowest
+        if price_range == 0:
+            price_range = sys.float_info.epsilon
+        k = self.smooth_k.update(100.0 * (close - lowest) / price_range)
+        return k, self.smooth_d.update(k)
+
+    def peek(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        full = len(self._highs) == self._highs.maxlen
+        if len(self._highs) + 1 < self._highs.maxlen:
+            return NaN, NaN
+        # The window as update() would see it: the oldest bar drops out when it is full
+        highs, lows = list(self._highs)[full:], list(self._lows)[full:]
+        highest, lowest = max(highs + [high]), min(lows + [low])
+        price_range = highest - lowest
+        if price_range == 0:
+            price_range = sys.float_info.epsilon
+        k = self.smooth_k.peek(100.0 * (close - lowest) / price_range)
+        return k, self.smooth_d.peek(k)
+
+
+class ATR:
+    """
+    pandas_ta ATR with the default RMA smoothing of the true range (column ATRr_<length>).
+    """
+    def __init__(self, length: int):
+        self.rma = RMA(length)
+        self._prev_close = NaN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        prev_close, self._prev_close = self._prev_close, close
+        if prev_close != prev_close:
+            return NaN
+        true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        return self.rma.update(true_range)
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        prev_close = self._prev_close
+        if prev_close != prev_close:
+            return NaN
+        return self.rma.peek(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+
+
+class StreamingIndicatorEngine:
+    """
+    Running indicator state for one (symbol, timeframe). Each closed bar is folded in with O(1) work
+    and produces the same column names as calculate_indicators (StochRSI is not streamed since no
+    rule reads it). `columns` restricts the engine to the indicators an IndicatorPlan asks for.
+    """
+    def __init__(self, config: Dict, history: int = 5, columns: Optional[Set[str]] = None):
+        p = config['indicators']
+        m, st = p['macd'], p['stochastic']
+        self.macd_suffix = f"{m['fast']}_{m['slow']}_{m['signal']}"
+        self.stoch_suffix = f"{st['k']}_{st['d']}_{st['smooth_k']}"
+
+        # With `columns`, only the indicators producing one of them are kept
+        def wanted(*names: str) -> bool:
+            return columns is None or any(name in columns for name in names)
+
+        self.macd = (MACD(m['fast'], m['slow'], m['signal'])
+                     if wanted(*(f"MACD{x}_{self.macd_suffix}" for x in ('', 'h', 's'))) else None)
+        self.stoch = (Stochastic(st['k'], st['d'], st['smooth_k'])
+                      if wanted(f"STOCHk_{self.stoch_suffix}", f"STOCHd_{self.stoch_suffix}") else None)
+        self.smma = (f"SMMA_{p['smma']['length']}", SMMA(p['smma']['length']))
+        emas = dict.fromkeys(p[name]['length'] for name in ('ema_fast', 'ema_slow', 'ema_trend_short', 'ema_trend_long'))
+        self.emas = [(f"EMA_{length}", EMA(length)) for length in emas if wanted(f"EMA_{length}")]
+        self.atr = (f"ATRr_{p['atr']['length']}", ATR(p['atr']['length']))
+        if not wanted(self.smma[0]):
+            self.smma = None
+        if not wanted(self.atr[0]):
+            self.atr = None
+
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self.history = deque(maxlen=history)
+
+    def update(self, timestamp: pd.Timestamp, high: float, low: float, close: float) -> Dict[str, float]:
+        """
+        Folds a closed bar into the running state and returns its indicator values.
+        """
+        row = {}
+        if self.macd is not None:
+            macd, hist, signal = self.macd.update(close)
+            row[f"MACD_{self.macd_suffix}"] = macd
+            row[f"MACDh_{self.macd_suffix}"] = hist
+            row[f"MACDs_{self.macd_suffix}"] = signal
+        if self.stoch is not None:
+            row[f"STOCHk_{self.stoch_suffix}"], row[f"STOCHd_{self.stoch_suffix}"] = self.stoch.update(high, low, close)
+        if self.smma is not None:
+            row[self.smma[0]] = self.smma[1].update(close)
+        if self.atr is not None:
+            row[self.atr[0]] = self.atr[1].update(high, low, close)
+        for col, ema in self.emas:
+            row[col] = ema.update(close)
+
+        self.last_timestamp = timestamp
+        self.history.append((timestamp, row))
+        return row
+
+    def peek(self, timestamp: pd.Timestamp, high: float, low: float, close: float) -> Dict[str, float]:
+        """
+        Returns indicator values for an in-progress bar without touching the committed state.
+        Each indicator computes its next value from its scalar state, so this is O(1) like update().
+        """
+        row = {}
+        if self.macd is not None:
+            macd, hist, signal = self.macd.peek(close)
+            row[f"MACD_{self.macd_suffix}"] = macd
+            row[f"MACDh_{self.macd_suffix}"] = hist
+            row[f"MACDs_{self.macd_suffix}"] = signal
+        if self.stoch is not None:
+            row[f"STOCHk_{self.stoch_suffix}"], row[f"STOCHd_{self.stoch_suffix}"] = self.stoch.peek(high, low, close)
+        if self.smma is not None:
+            row[self.smma[0]] = self.smma[1].peek(close)
+        if self.atr is not None:
+            row[self.atr[0]] = self.atr[1].peek(high, low, close)
+        for col, ema in self.emas:
+            row[col] = ema.peek(close)
+        return row
+
+
+class StreamingIndicatorCache:
+    """
+    Keeps one StreamingIndicatorEngine per (symbol, timeframe) and fills indicator columns on frames
+    coming out of the OHLCV store. Only bars that closed since the last call are folded in.
+    """
+    def __init__(self, config: Dict, history: int = 5):
+        self.logger = logging.getLogger(__name__)
+        self.config = config
+        self.history = history
+        self._engines: Dict[Tuple[str, str], StreamingIndicatorEngine] = {}
+
+    def apply(self, symbol: str, timeframe: str, df: pd.DataFrame, columns: Optional[Set[str]] = None) -> pd.DataFrame:
+        """
+        Updates the engine with the closed bars of `df` (all but the last row) and returns `df` with
+        indicator columns for the last `history` closed bars plus the in-progress bar. Older rows are NaN.
+        `columns` (fixed per timeframe) limits the indicators the engine maintains.
+        """
+        key = (symbol, timeframe)
+        engine = self._engines.get(key)
+        closed = df.iloc[:-1]
+
+        if engine is None or engine.last_timestamp is None or engine.last_timestamp not in closed.index:
+            self.logger.debug(f"Bootstrapping streaming indicators for {symbol} {timeframe}.")
+            engine = StreamingIndicatorEngine(self.config, history=self.history, columns=columns)
+            self._engines[key] = engine
+            new_bars = closed
+        else:
+            new_bars = closed.loc[closed.index > engine.last_timestamp]
+
+        highs, lows, closes = (new_bars[c].to_numpy() for c in ('high', 'low', 'close'))
+        for i, ts in enumerate(new_bars.index):
+            engine.update(ts, highs[i], lows[i], closes[i])
+
+        last = df.iloc[-1]
+        rows = list(engine.history) + [(df.index[-1], engine.peek(df.index[-1], last['high'], last['low'], last['close']))]
+        rows = rows[-len(df):]
+        values = np.full((len(df), len(rows[-1][1])), np.nan)
+        values[len(df) - len(rows):] = [list(row.values()) for _, row in rows]
+        columns = pd.DataFrame(values, index=df.index, columns=list(rows[-1][1]))
+        return pd.concat([df.drop(columns=columns.columns, errors='ignore'), columns], axis=1)
+
+
+    def state(self) -> Dict[Tuple[str, str], StreamingIndicatorEngine]:
+        return dict(self._engines)
+
+    def load_state(self, engines: Dict[Tuple[str, str], StreamingIndicatorEngine]):
+        self._engines.update(engines)
+
+
+def check_parity(df: pd.DataFrame, config: Dict) -> Dict[str, float]:
+    """
+    Runs the streaming engine over every bar of `df` and returns the max absolute difference per
+    column against calculate_indicators (pandas_ta). Used to validate the engine on real data.
+    """
+    from indicators import calculate_indicators
+
+    reference = calculate_indicators(df[['open', 'high', 'low', 'close', 'volume']].copy(), config)
+    engine = StreamingIndicatorEngine(config)
+    rows = [engine.update(ts, h, l, c) for ts, h, l, c in zip(df.index, df['high'], df['low'], df['close'])]
+    streamed = pd.DataFrame(rows, index=df.index)
+
+    diffs = {}
+    for col in streamed.columns:
+        a, b = streamed[col].to_numpy(), reference[col].to_numpy()
+        both = ~np.isnan(a) & ~np.isnan(b)
+        nan_mismatch = np.isnan(a) != np.isnan(b)
+        diffs[col] = float('inf') if nan_mismatch.any() else float(np.max(np.abs(a[both] - b[both]), initial=0.0))
+    return diffs
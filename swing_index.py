@@ -0,0 +1,131 @@
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import fractal_mask, fibonacci_levels
+
+def index_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Index timestamps as int64 nanoseconds, whatever the index resolution.
+    """
+    return index.values.astype('datetime64[ns]').astype(np.int64)
+
+class SwingIndex:
+    """
+    Incrementally maintained fractal swing points of one OHLCV series.
+
+    A bar becomes a swing high (low) once the `width` bars on each side of it have closed and all of
+    them are strictly lower (higher). Every confirmed swing is kept, in order, with its bar time, its
+    price and the open time of the bar that confirmed it, so the latest swings and the Fibonacci
+    levels are O(1) lookups and backtests can replay the full history without rescanning.
+    Times are int64 nanoseconds (see index_ns).
+    """
+    def __init__(self, width: int = 2):
+        self.width = width
+        self._window = deque(maxlen=2 * width)
+        self.last_timestamp: Optional[int] = None
+        self._swings = {kind: {'time': [], 'price': [], 'confirmed': []} for kind in ('high', 'low')}
+
+    def extend(self, times: np.ndarray, highs: np.ndarray, lows: np.ndarray):
+        """
+        Folds in closed bars (in time order, all newer than last_timestamp).
+        """
+        if not len(times):
+            return
+        w = self.width
+        # The previous 2*width bars: left context plus the centers still waiting for right-hand bars
+        tail = list(self._window)
+        ts = np.concatenate([np.array([t for t, _, _ in tail], dtype=np.int64), np.asarray(times, dtype=np.int64)])
+        combined = {}
+        for kind, new_values, pos in (('high', highs, 1), ('low', lows, 2)):
+            values = np.concatenate([np.array([row[pos] for row in tail], dtype=np.float64),
+                                     np.asarray(new_values, dtype=np.float64)])
+            combined[kind] = values
+            centers = np.flatnonzero(fractal_mask(values, w, kind))
+            swings = self._swings[kind]
+            swings['time'].extend(ts[centers].tolist())
+            swings['price'].extend(values[centers].tolist())
+            swings['confirmed'].extend(ts[centers + w].tolist())
+
+        keep = slice(-2 * w, None)
+        self._window.clear()
+        self._window.extend(zip(ts[keep].tolist(), combined['high'][keep].tolist(), combined['low'][keep].tolist()))
+        self.last_timestamp = int(ts[-1])
+
+    def update(self, timestamp: int, high: float, low: float):
+        """
+        Folds in one closed bar.
+        """
+        self.extend(np.array([timestamp]), np.array([high]), np.array([low]))
+
+    def last(self, kind: str, n: int = 1) -> List[Tuple[int, float]]:
+        """
+        The last `n` swing highs or lows as (time, price), oldest first.
+        """
+        swings = self._swings[kind]
+        return list(zip(swings['time'][-n:], swings['price'][-n:]))
+
+    def fibonacci_levels(self) -> Dict:
+        """
+        Same result as indicators.get_fibonacci_levels on the latest confirmed swings.
+        """
+        highs, lows = self._swings['high'], self._swings['low']
+        if not highs['time'] or not lows['time']:
+            return {'error': 'Not enough swing points to determine Fibonacci levels.'}
+        return fibonacci_levels(highs['price'][-1], highs['time'][-1], lows['price'][-1], lows['time'][-1])
+
+    def arrays(self, kind: str) -> Dict[str, np.ndarray]:
+        """
+        Full swing history of one kind as arrays: time, price and confirmed (open time of the
+        confirming bar).
+        """
+        return {key: np.asarray(values, dtype=np.float64 if key == 'price' else np.int64)
+                for key, values in self._swings[kind].items()}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, width: int = 2) -> 'SwingIndex':
+        index = cls(width)
+        index.extend(index_ns(df.index), df['high'].to_numpy(), df['low'].to_numpy())
+        return index
+
+
+class SwingIndexCache:
+    """
+    One SwingIndex per (symbol, timeframe), fed the closed bars of frames coming out of the OHLCV store.
+    """
+    def __init__(self, config: Dict):
+        self.logger = logging.getLogger(__name__)
+        self.width = config['indicators'].get('swing', {}).get('width', 2)
+        self._indexes: Dict[Tuple[str, str], SwingIndex] = {}
+
+    def apply(self, symbol: str, timeframe: str, df: pd.DataFrame) -> SwingIndex:
+        """
+        Updates the index with the closed bars of `df` (all but the last row) and returns it.
+        """
+        key = (symbol, timeframe)
+        index = self._indexes.get(key)
+        closed = df.iloc[:-1]
+        times = index_ns(closed.index)
+
+        if index is None or index.last_timestamp is None or index.last_timestamp not in times:
+            self.logger.debug(f"Building swing index for {symbol} {timeframe}.")
+            index = SwingIndex(self.width)
+            self._indexes[key] = index
+            start = 0
+        else:
+            start = int(np.searchsorted(times, index.last_timestamp, side='right'))
+
+        index.extend(times[start:], closed['high'].to_numpy()[start:], closed['low'].to_numpy()[start:])
+        return index
+
+    def get(self, symbol: str, timeframe: str) -> Optional[SwingIndex]:
+        return self._indexes.get((symbol, timeframe))
+
+    def state(self) -> Dict[Tuple[str, str], SwingIndex]:
+        return dict(self._indexes)
+
+    def load_state(self, indexes: Dict[Tuple[str, str], SwingIndex]):
+        self._indexes.update(indexes)
@@ -0,0 +1,191 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import ccxt
+import numpy as np
+import pandas as pd
+
+from data_client import ohlcv_to_dataframe
+from ohlcv_store import PRICE_COLUMNS
+from resample import resample_ohlcv, timeframe_ms
+
+REGIMES = ('trending', 'ranging', 'gapped')
+
+def symbol_seed(seed: int, symbol: str) -> int:
+    """
+    Stable per-symbol seed (independent of PYTHONHASHSEED).
+    """
+    return (seed * 1_000_003 + zlib.crc32(symbol.encode())) % 2**32
+
+def _regime_moves(rng: np.random.Generator, n: int, regime: str, vol: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (gap, body) log moves per bar: gap from the previous close to the open, body from open to close.
+    """
+    gap = np.zeros(n)
+    if regime == 'trending':
+        body = rng.choice([-1, 1]) * vol * 0.15 + rng.normal(0, vol, n)
+    elif regime == 'ranging':
+        # Ornstein-Uhlenbeck log price around the segment start
+        level = np.empty(n)
+        x = 0.0
+        shocks = rng.normal(0, vol, n)
+        for i in range(n):
+            x += -0.05 * x + shocks[i]
+            level[i] = x
+        body = np.diff(level, prepend=0.0)
+    elif regime == 'gapped':
+        body = rng.choice([-1, 1]) * vol * 0.1 + rng.normal(0, vol, n)
+        jumps = rng.random(n) < 0.01
+        gap[jumps] = rng.normal(0, vol * 10, jumps.sum())
+    else:
+        raise ValueError(f"Unknown regime '{regime}'.")
+    return gap, body
+
+def synthetic_ohlcv(bars: int, timeframe: str = '15m', regime: str = 'mixed', seed: int = 0,
+                    start: str = '2024-01-01', price: float = 100.0, vol: float = 0.004) -> pd.DataFrame:
+    """
+    Seeded synthetic OHLCV in the layout of ohlcv_to_dataframe.
+
+    `regime` is 'trending', 'ranging', 'gapped' (price jumps between close and next open, plus a few
+    missing bars as during exchange downtime) or 'mixed' (alternating segments of all three).
+    """
+    rng = np.random.default_rng(seed)
+    if regime == 'mixed':
+        gaps, bodies, left = [], [], bars
+        while left > 0:
+            n = min(left, int(rng.integers(200, 800)))
+            gap, body = _regime_moves(rng, n, REGIMES[len(gaps) % len(REGIMES)], vol)
+            gaps.append(gap)
+            bodies.append(body)
+            left -= n
+        gap, body = np.concatenate(gaps), np.concatenate(bodies)
+    else:
+        gap, body = _regime_moves(rng, bars, regime, vol)
+
+    log_close = np.log(price) + np.cumsum(gap + body)
+    close = np.exp(log_close)
+    open_ = np.exp(log_close - body)
+    wick = np.exp(np.abs(rng.normal(0, vol * 0.5, (2, bars))))
+    high = np.maximum(open_, close) * wick[0]
+    low = np.minimum(open_, close) / wick[1]
+    volume = rng.lognormal(3.0, 0.5, bars) * (1 + np.abs(body) / vol)
+
+    step = timeframe_ms(timeframe)
+    first = pd.Timestamp(start).value // 10**6 // step * step
+    ts = first + np.arange(bars, dtype=np.int64) * step
+    keep = np.ones(bars, dtype=bool)
+    if regime in ('gapped', 'mixed'):
+        keep[1:-1] = rng.random(bars - 2) >= 0.001
+
+    rows = np.column_stack([ts, open_, high, low, close, volume])[keep]
+    return ohlcv_to_dataframe(rows.tolist())
+
+
+class RecordedExchange:
+    """
+    In-process stand-in for a CCXT exchange, for DataClient(config, exchange=...), serving fixed
+    base timeframe series per symbol up to a simulated clock (milliseconds()).
+
+    The candle containing the clock is the in-progress one, as on a real exchange. With
+    `forming='open'` it only shows its open (a candle that has just opened), so nothing after the
+    clock leaks into it; with 'full' it is served as recorded. Other timeframes are resampled from
+    the base, over only the buckets a request can return.
+    """
+    id = 'recorded'
+    has = {'fetchOHLCV': True, 'fetchTicker': True, 'fetchTickers': True}
+    parse_timeframe = staticmethod(ccxt.Exchange.parse_timeframe)
+
+    def __init__(self, series: Dict[str, pd.DataFrame], base_timeframe: str = '15m', clock_ms: Optional[int] = None,
+                 forming: str = 'full'):
+        self.base_timeframe = base_timeframe
+        self.base_ms = timeframe_ms(base_timeframe)
+        self.forming = forming
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for symbol, df in series.items():
+            ts = df.index.values.astype('datetime64[ms]').astype(np.int64)
+            self._series[symbol] = (ts, df[PRICE_COLUMNS].to_numpy(dtype=np.float64))
+        self.clock_ms = clock_ms if clock_ms is not None else max(ts[-1] for ts, _ in self._series.values())
+        self._resampled: Dict[Tuple[str, str], Tuple[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]] = {}
+        self.calls = 0
+
+    def milliseconds(self) -> int:
+        return self.clock_ms
+
+    def set_clock(self, clock_ms: int):
+        self.clock_ms = int(clock_ms)
+
+    def advance(self, bars: int = 1):
+        self.clock_ms += bars * self.base_ms
+
+    def _base_rows(self, symbol: str, start_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+        ts, values = self._series[symbol]
+        lo = int(np.searchsorted(ts, start_ms))
+        end = int(np.searchsorted(ts, self.clock_ms, side='right'))
+        ts, values = ts[lo:end], values[lo:end]
+        if self.forming == 'open' and len(ts) and ts[-1] + self.base_ms > self.clock_ms:
+            values = values.copy()
+            values[-1, 1:4] = values[-1, 0]
+            values[-1, 4] = 0.0
+        return ts, values
+
+    def _rows(self, symbol: str, timeframe: str, start_ms: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        if timeframe == self.base_timeframe:
+            return self._base_rows(symbol, start_ms)
+        cached = self._resampled.get((symbol, timeframe))
+        if cached is None or cached[0] != (self.clock_ms, start_ms):
+            ts, values = self._base_rows(symbol, start_ms)
+            base = pd.DataFrame(values, columns=PRICE_COLUMNS, index=pd.to_datetime(ts, unit='ms'))
+            df = resample_ohlcv(base, self.base_timeframe, timeframe)
+            cached = ((self.clock_ms, start_ms), (df.index.values.astype('datetime64[ms]').astype(np.int64), df.to_numpy()))
+            self._resampled[(symbol, timeframe)] = cached
+        return cached[1]
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: Optional[int] = None,
+                    limit: Optional[int] = None, params: Optional[Dict] = None) -> List[List]:
+        self.calls += 1
+        limit = limit or 500
+        tf_ms = timeframe_ms(timeframe)
+        # Only the buckets this request can return, plus a spare one in front in case the leading bucket
+        # is partial. Counted in base rows (a bucket holds at most tf/base of them), so gaps in the
+        # series do not shorten the result; the window starts on an epoch aligned bucket open.
+        all_ts, ratio = self._series[symbol][0], tf_ms // self.base_ms
+        if since is not None:
+            first = int(np.searchsorted(all_ts, since)) - ratio
+        else:
+            first = int(np.searchsorted(all_ts, self.clock_ms, side='right')) - (limit + 2) * ratio
+        start_ms = int(all_ts[max(0, first)]) // tf_ms * tf_ms if len(all_ts) else 0
+        ts, values = self._rows(symbol, timeframe, start_ms)
+        if since is not None:
+            start = int(np.searchsorted(ts, since))
+            ts, values = ts[start:start + limit], values[start:start + limit]
+        else:
+            ts, values = ts[-limit:], values[-limit:]
+        return [[int(t), *row] for t, row in zip(ts.tolist(), values.tolist())]
+
+    def fetch_ticker(self, symbol: str) -> Dict:
+        self.calls += 1
+        _, values = self._base_rows(symbol, 0)
+        return {'symbol': symbol, 'last': float(values[-1, 3]), 'quoteVolume': float(values[-96:, 4].sum())}
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, Dict]:
+        return {s: self.fetch_ticker(s) for s in (symbols or self._series)}
+
+    def load_markets(self) -> Dict[str, Dict]:
+        return {s: {'symbol': s, 'quote': s.split('/')[-1], 'type': 'swap', 'active': True} for s in self._series}
+
+
+class FakeExchange(RecordedExchange):
+    """
+    RecordedExchange over seeded synthetic base series, one per symbol. The clock starts inside the
+    candle after `history` bars, so the last returned candle is the in-progress one; advance() moves
+    it forward by whole base bars, through up to `future` more bars.
+    """
+    id = 'fake'
+
+    def __init__(self, symbols: List[str], history: int, future: int = 100, base_timeframe: str = '15m',
+                 regime: str = 'mixed', seed: int = 0):
+        series = {symbol: synthetic_ohlcv(history + future, base_timeframe, regime, symbol_seed(seed, symbol))
+                  for symbol in symbols}
+        super().__init__(series, base_timeframe)
+        first = min(ts[0] for ts, _ in self._series.values())
+        self.clock_ms = int(first + history * self.base_ms - self.base_ms // 2)
@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from data_client import ohlcv_to_dataframe
+from resample import derive_frames, resample_ohlcv, verify_against_exchange
+
+SLOT_MS = 15 * 60 * 1000
+DAY_MS = pd.Timestamp('2024-01-01').value // 10**6
+
+
+def rows(slots):
+    """
+    Exchange-shaped 15m rows; slot k opens at 2024-01-01 00:00 UTC + k * 15m with open=k,
+    high=k+2, low=k-1, close=k+1 and volume=1, so every derived 8h value is easy to spell out.
+    """
+    return [[DAY_MS + k * SLOT_MS, float(k), k + 2.0, k - 1.0, k + 1.0, 1.0] for k in slots]
+
+
+# From 06:00 to 2024-01-02 00:45, with 10:00-10:45 missing as during exchange downtime
+BASE_SLOTS = [k for k in range(24, 100) if not 40 <= k <= 43]
+
+EXPECTED_8H = pd.DataFrame({
+    'open': [32.0, 64.0, 96.0],
+    'high': [65.0, 97.0, 101.0],
+    'low': [31.0, 63.0, 95.0],
+    'close': [64.0, 96.0, 100.0],
+    'volume': [28.0, 32.0, 4.0],
+}, index=pd.DatetimeIndex(pd.to_datetime(['2024-01-01 08:00', '2024-01-01 16:00', '2024-01-02 00:00']),
+                          name='timestamp'))
+
+
+@pytest.fixture
+def base():
+    return ohlcv_to_dataframe(rows(BASE_SLOTS))
+
+
+def test_8h_buckets_open_at_00_08_16_utc(base):
+    derived = resample_ohlcv(base, '15m', '8h')
+    assert [ts.hour for ts in derived.index] == [8, 16, 0]
+    pd.testing.assert_frame_equal(derived, EXPECTED_8H, check_index_type=False)
+
+
+def test_partial_leading_bucket_is_dropped_and_a_complete_one_kept(base):
+    # The 00:00 bucket only has bars from 06:00 on
+    assert resample_ohlcv(base, '15m', '8h').index[0] == pd.Timestamp('2024-01-01 08:00')
+    from_open = ohlcv_to_dataframe(rows(range(32, 100)))
+    assert resample_ohlcv(from_open, '15m', '8h').index[0] == pd.Timestamp('2024-01-01 08:00')
+    assert resample_ohlcv(ohlcv_to_dataframe(rows(range(24, 30))), '15m', '8h').empty
+
+
+def test_in_progress_trailing_bucket_is_kept(base):
+    last = resample_ohlcv(base, '15m', '8h').iloc[-1]
+    # Only the first four 15m bars of the 2024-01-02 00:00 candle exist so far
+    assert last.name == pd.Timestamp('2024-01-02 00:00')
+    assert (last['open'], last['close'], last['volume']) == (96.0, 100.0, 4.0)
+
+
+def test_gap_in_base_series(base):
+    derived = resample_ohlcv(base, '15m', '4h')
+    # 08:00-12:00 misses its 10:00-10:45 bars but still opens at the first bar it has
+    assert derived.loc['2024-01-01 08:00'].tolist() == [32.0, 49.0, 31.0, 48.0, 12.0]
+    assert derived.loc['2024-01-01 12:00'].tolist() == [48.0, 65.0, 47.0, 64.0, 16.0]
+    # A whole bucket missing from the base series produces no candle for it
+    hole = ohlcv_to_dataframe(rows([k for k in range(32, 100) if not 64 <= k <= 79]))
+    assert pd.Timestamp('2024-01-01 16:00') not in resample_ohlcv(hole, '15m', '4h').index
+
+
+def test_derive_frames_trims_each_timeframe(base):
+    frames = derive_frames(base, '15m', ['15m', '1h', '8h'], lookback=2)
+    assert frames['15m'].index.tolist() == base.index[-2:].tolist()
+    assert frames['1h'].index.tolist() == pd.to_datetime(['2024-01-01 23:00', '2024-01-02 00:00']).tolist()
+    pd.testing.assert_frame_equal(frames['8h'], EXPECTED_8H.iloc[-2:], check_index_type=False)
+
+
+def test_rejects_timeframes_that_cannot_be_derived(base):
+    with pytest.raises(ValueError):
+        resample_ohlcv(base, '15m', '20m')
+    with pytest.raises(ValueError):
+        resample_ohlcv(base, '15m', '1w')
+
+
+class StubDataClient:
+    """
+    Serves fixed 8h candles and 15m history in the shapes DataClient returns.
+    """
+    def __init__(self, candles: pd.DataFrame, base_rows):
+        self.candles, self.base_rows = candles, base_rows
+
+    def fetch_ohlcv(self, symbol, timeframe, limit):
+        return self.candles
+
+    def fetch_ohlcv_history(self, symbol, timeframe, total):
+        return self.base_rows
+
+
+def test_verify_against_exchange_offline():
+    base_rows = rows(range(24, 100))
+    exchange = resample_ohlcv(ohlcv_to_dataframe(base_rows), '15m', '8h')
+    client = StubDataClient(exchange, base_rows)
+    assert verify_against_exchange(client, 'AAA/USDT', '15m', '8h').empty
+
+    # A differing closed candle is reported; the in-progress one is never compared
+    drifted = exchange.copy()
+    drifted.iloc[0, drifted.columns.get_loc('high')] += 1.0
+    drifted.iloc[-1, drifted.columns.get_loc('close')] += 1.0
+    mismatches = verify_against_exchange(StubDataClient(drifted, base_rows), 'AAA/USDT', '15m', '8h')
+    assert mismatches.index.tolist() == [pd.Timestamp('2024-01-01 08:00')]
+    assert mismatches.loc['2024-01-01 08:00', ['high', 'high_derived']].tolist() == [66.0, 65.0]
+
+    assert verify_against_exchange(StubDataClient(None, base_rows), 'AAA/USDT', '15m', '8h') is None
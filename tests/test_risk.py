@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import Backtester, timeframe_delta
+from indicators import fibonacci_levels
+from resample import resample_ohlcv
+from risk import RiskManager
+from streaming_indicators import StreamingIndicatorEngine
+from synthetic import synthetic_ohlcv
+
+
+def with_indicators(df, config):
+    """
+    Indicator columns from the streaming engine, which matches calculate_indicators without pandas_ta.
+    """
+    engine = StreamingIndicatorEngine(config)
+    rows = [engine.update(ts, h, l, c) for ts, h, l, c in zip(df.index, df['high'], df['low'], df['close'])]
+    return pd.concat([df, pd.DataFrame(rows, index=df.index)], axis=1)
+
+
+def long_signal(entry_price, high=110.0, low=100.0):
+    return {'symbol': 'AAA/USDT', 'direction': 'LONG', 'entry_price': entry_price,
+            'fib_levels': fibonacci_levels(high, 2, low, 1)}
+
+
+def atr_frame(config, atr):
+    return pd.DataFrame({f"ATRr_{config['indicators']['atr']['length']}": [atr]})
+
+
+def test_backtest_levels_match_calculate_sl_tp(config):
+    config['strategy']['min_confluence_score'] = 4.0
+    base = synthetic_ohlcv(12000, '15m', regime='mixed', seed=11)
+    tfs = config['timeframes']
+    data = {tf: with_indicators(resample_ohlcv(base, '15m', tf), config) for tf in set(tfs.values())}
+
+    backtester = Backtester(config)
+    trades = backtester.run(data, prepared=True)['trades']
+    assert len(trades) > 0
+
+    entry = data[tfs['entry']]
+    swings = backtester._swing_levels(data[tfs['bias']], pd.Index(trades['time']))
+    for i, trade in enumerate(trades.itertuples()):
+        signal = {'symbol': 'AAA/USDT', 'direction': trade.direction, 'entry_price': trade.entry_price,
+                  'fib_levels': fibonacci_levels(swings['swing_high'][i], swings['swing_high_time'][i],
+                                                 swings['swing_low'][i], swings['swing_low_time'][i])}
+        # The decision at `time` is taken on the entry bar that closed then
+        entry_df = entry.loc[:trade.time - timeframe_delta(tfs['entry'])]
+        result = backtester.risk_manager.calculate_sl_tp(signal, entry_df)
+        assert result is not None
+        for key in ('sl_price', 'tp1_price', 'tp2_price', 'rr_ratio'):
+            assert result[key] == pytest.approx(getattr(trade, key), rel=1e-12), key
+
+
+def test_calculate_sl_tp_long_levels(config):
+    risk = RiskManager(config)
+    signal = risk.calculate_sl_tp(long_signal(101.0), atr_frame(config, 1.0))
+    buffer = config['risk']['atr_buffer_multiplier']
+    assert signal['sl_price'] == pytest.approx(100.0 - buffer)
+    assert signal['tp1_price'] == pytest.approx(110.0 - 0.618 * 10.0)
+    assert signal['tp2_price'] == 110.0
+    assert signal['rr_ratio'] == pytest.approx((110.0 - 0.618 * 10.0 - 101.0) / (1.0 + buffer))
+
+
+def test_calculate_sl_tp_rejections(config):
+    risk = RiskManager(config)
+    assert risk.calculate_sl_tp({'symbol': 'AAA/USDT', 'direction': 'LONG', 'entry_price': 1.0,
+                                 'fib_levels': {'error': 'no swings'}}, atr_frame(config, 1.0)) is None
+    # Entry right at the stop
+    assert risk.calculate_sl_tp(long_signal(100.0), atr_frame(config, 0.0)) is None
+    # TP1 too close for min_rr_ratio
+    assert risk.calculate_sl_tp(long_signal(103.8), atr_frame(config, 1.0)) is None
+    assert risk.calculate_sl_tp(long_signal(101.0), atr_frame(config, np.nan)) is None
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from scheduler import RequestScheduler
+
+
+@pytest.fixture
+def scheduler(config):
+    config['scheduler'] = {'boundary_delay_seconds': 0.0, 'min_interval_seconds': 0.0}
+    return RequestScheduler(config)
+
+
+def test_coalesced_callers_share_one_call(scheduler):
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'rows'
+
+    async def go():
+        results = await asyncio.gather(*(scheduler.submit('key', 1, 0, request) for _ in range(3)))
+        await scheduler.close()
+        return results
+
+    assert asyncio.run(go()) == ['rows'] * 3
+    assert len(calls) == 1 and scheduler.coalesced == 2
+
+
+def test_errors_reach_every_caller(scheduler):
+    async def request():
+        await asyncio.sleep(0.01)
+        raise ValueError('exchange error')
+
+    async def go():
+        results = await asyncio.gather(*(scheduler.submit('key', 1, 0, request) for _ in range(2)),
+                                       return_exceptions=True)
+        await scheduler.close()
+        return results
+
+    assert [type(r) for r in asyncio.run(go())] == [ValueError, ValueError]
+
+
+def test_close_releases_in_flight_and_queued_callers(scheduler):
+    async def go():
+        running = asyncio.Event()
+
+        async def slow():
+            running.set()
+            await asyncio.sleep(3600)
+
+        callers = [asyncio.create_task(scheduler.submit('slow', 1, 0, slow)) for _ in range(2)]
+        await running.wait()
+        # Budget exhausted: this one stays queued behind the token bucket
+        scheduler.bucket.tokens = 0.0
+        queued = asyncio.create_task(scheduler.submit('queued', scheduler.bucket.capacity, 0, slow))
+        await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(scheduler.close(), 1.0)
+        results = await asyncio.wait_for(asyncio.gather(*callers, queued, return_exceptions=True), 1.0)
+        return results
+
+    results = asyncio.run(go())
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert scheduler.stats()['queue_depth'] == 0 and scheduler._inflight == {}
+    assert scheduler._dispatcher is None
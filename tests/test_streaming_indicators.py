@@ -0,0 +1,61 @@
+import copy
+import re
+
+import numpy as np
+import pytest
+
+from streaming_indicators import StreamingIndicatorCache, StreamingIndicatorEngine, check_parity
+from synthetic import synthetic_ohlcv
+
+STREAMED = re.compile(r'^(EMA_|SMMA_|MACD|STOCH[kd]_|ATRr_)')
+TOLERANCE = 1e-6
+
+
+def reference(df, config):
+    pytest.importorskip('pandas_ta')
+    from indicators import calculate_indicators
+    return calculate_indicators(df[['open', 'high', 'low', 'close', 'volume']].copy(), config)
+
+
+def assert_close(actual, expected, cols):
+    for col in cols:
+        a, b = np.asarray(actual[col], dtype=float), np.asarray(expected[col], dtype=float)
+        assert np.array_equal(np.isnan(a), np.isnan(b)), col
+        both = ~np.isnan(a)
+        assert np.max(np.abs(a[both] - b[both]), initial=0.0) <= TOLERANCE, col
+
+
+def test_engine_matches_calculate_indicators(config):
+    pytest.importorskip('pandas_ta')
+    df = synthetic_ohlcv(600, '15m', regime='mixed', seed=3)
+    diffs = check_parity(df, config)
+    assert diffs and all(STREAMED.match(col) for col in diffs)
+    assert {col: d for col, d in diffs.items() if d > TOLERANCE} == {}
+
+
+def test_cache_apply_incremental_matches_calculate_indicators(config):
+    df = synthetic_ohlcv(700, '15m', regime='mixed', seed=5)
+    cache = StreamingIndicatorCache(config, history=5)
+    # A bootstrap call followed by several incremental ones, each seeing a few newly closed bars
+    for end in (400, 401, 405, 460, 700):
+        window = df.iloc[:end]
+        out = cache.apply('AAA/USDT', '15m', window)
+        expected = reference(window, config)
+        cols = [col for col in out.columns if STREAMED.match(col)]
+        assert cols
+        # The last `history` closed bars plus the in-progress bar are filled, older rows are NaN
+        assert out[cols].iloc[:-6].isna().all().all()
+        assert_close(out[cols].iloc[-6:], expected[cols].iloc[-6:], cols)
+
+
+def test_peek_does_not_change_state(config):
+    df = synthetic_ohlcv(300, '15m', regime='gapped', seed=7)
+    engine = StreamingIndicatorEngine(config)
+    for ts, h, l, c in zip(df.index, df['high'], df['low'], df['close']):
+        peeked = engine.peek(ts, h, l, c)
+        updated = copy.deepcopy(engine).update(ts, h, l, c)
+        assert list(peeked) == list(updated)
+        np.testing.assert_array_equal(list(peeked.values()), list(updated.values()))
+        engine.update(ts, h, l, c)
+    assert engine.last_timestamp == df.index[-1]
+    assert len(engine.history) == engine.history.maxlen
@@ -1,5 +1,7 @@
+import copy
 import logging
 import sys
+from typing import Dict
 
 def setup_logging():
     """
@@ -17,3 +19,16 @@ def setup_logging():
     # Suppress verbose logging from third-party libraries
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("telegram").setLevel(logging.WARNING)
+
+def apply_overrides(config: Dict, params: Dict) -> Dict:
+    """
+    Returns a deep copy of config with dotted-key overrides applied (e.g. 'indicators.macd.fast').
+    """
+    config = copy.deepcopy(config)
+    for dotted, value in params.items():
+        node = config
+        *parents, leaf = dotted.split('.')
+        for key in parents:
+            node = node[key]
+        node[leaf] = value
+    return config